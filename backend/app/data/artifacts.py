@@ -0,0 +1,206 @@
+"""
+Columnar Artifact Store
+
+Typed Arrow IPC artifacts for the processed data tables. Processors write
+them next to the CSV/JSON outputs; loaders memory-map them instead of
+re-parsing text on every cold start.
+
+Every artifact is recorded in processed/manifest.json:
+    {"condition_costs": {"file": "condition_costs.arrow", "schema_version": 1,
+                         "sha256": "...", "rows": 520, "columns": {...}}}
+
+A loader refuses an artifact whose schema version differs from the one this
+code was written against, or whose content no longer matches its hash —
+serving stale or truncated cost tables is worse than failing to start.
+"""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import pandas as pd
+import pyarrow as pa
+from pathlib import Path
+
+_DATA_DIR = Path(__file__).resolve().parent / "processed"
+
+MANIFEST_NAME = "manifest.json"
+
+# Bump the version of an artifact whenever its columns or their meaning change.
+SCHEMA_VERSIONS: dict[str, int] = {
+    "condition_costs": 1,
+    "icd_mapping": 1,
+    "comorbidity_network": 1,
+    "icd_adjacency": 1,
+    "rate_index": 2,
+    "family_rate_index": 1,
+    "benefits_index": 1,
+}
+
+
+class ArtifactVersionError(RuntimeError):
+    """An on-disk artifact does not match the schema this code expects."""
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(data_dir: Path | None = None) -> dict:
+    """Return the artifact manifest, or {} if no artifacts have been written."""
+    path = Path(data_dir or _DATA_DIR) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+@contextlib.contextmanager
+def _manifest_lock(data_dir: Path):
+    """Serialise manifest read-modify-write across processors running in parallel."""
+    with open(data_dir / f".{MANIFEST_NAME}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _save_manifest(manifest: dict, data_dir: Path):
+    path = data_dir / MANIFEST_NAME
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def write_table(
+    df: pd.DataFrame,
+    name: str,
+    output_dir: str | Path | None = None,
+    dictionary_columns: tuple[str, ...] = (),
+    dtypes: dict | None = None,
+    metadata: dict | None = None,
+) -> Path:
+    """
+    Write a DataFrame as an uncompressed Arrow IPC file and record it in the manifest.
+
+    Columns in `dictionary_columns` are dictionary-encoded; `dtypes` narrows
+    other columns (e.g. {"n": "int32"}) before writing. `metadata` values are
+    JSON-encoded into the schema metadata (see table_metadata()).
+    """
+    if name not in SCHEMA_VERSIONS:
+        raise KeyError(f"Unknown artifact {name!r}; add it to SCHEMA_VERSIONS")
+
+    data_dir = Path(output_dir or _DATA_DIR)
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    df = df.copy()
+    for col, dtype in (dtypes or {}).items():
+        df[col] = df[col].astype(dtype)
+    for col in dictionary_columns:
+        df[col] = df[col].astype("category")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {key: json.dumps(value, sort_keys=True) for key, value in (metadata or {}).items()}
+    )
+
+    path = data_dir / f"{name}.arrow"
+    tmp = path.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+    with _manifest_lock(data_dir):
+        manifest = load_manifest(data_dir)
+        manifest[name] = {
+            "file": path.name,
+            "schema_version": SCHEMA_VERSIONS[name],
+            "sha256": _sha256(path),
+            "rows": table.num_rows,
+            "columns": {field.name: str(field.type) for field in table.schema},
+        }
+        _save_manifest(manifest, data_dir)
+    return path
+
+
+def has_artifact(name: str, data_dir: str | Path | None = None) -> bool:
+    """Whether the manifest lists an artifact with this name."""
+    return name in load_manifest(Path(data_dir or _DATA_DIR))
+
+
+def _check_entry(name: str, entry: dict, data_dir: Path, verify_hash: bool) -> Path:
+    expected = SCHEMA_VERSIONS.get(name)
+    if entry.get("schema_version") != expected:
+        raise ArtifactVersionError(
+            f"Artifact {name!r} has schema version {entry.get('schema_version')}, "
+            f"expected {expected}. Re-run its processor to rebuild it."
+        )
+
+    path = data_dir / entry["file"]
+    if not path.exists():
+        raise ArtifactVersionError(f"Artifact {name!r} listed in manifest but {path} is missing")
+
+    if verify_hash and _sha256(path) != entry["sha256"]:
+        raise ArtifactVersionError(
+            f"Artifact {name!r} content hash does not match the manifest ({path})"
+        )
+    return path
+
+
+def check_manifest(data_dir: str | Path | None = None, verify_hash: bool = True) -> dict:
+    """
+    Validate every artifact in the manifest against SCHEMA_VERSIONS.
+
+    Raises ArtifactVersionError on the first mismatch; returns the manifest.
+    """
+    data_dir = Path(data_dir or _DATA_DIR)
+    manifest = load_manifest(data_dir)
+    for name, entry in manifest.items():
+        _check_entry(name, entry, data_dir, verify_hash)
+    return manifest
+
+
+def read_table(
+    name: str,
+    data_dir: str | Path | None = None,
+    verify_hash: bool = True,
+) -> pa.Table:
+    """
+    Memory-map an artifact and return it as an Arrow table (zero-copy).
+
+    Raises FileNotFoundError if the artifact was never written and
+    ArtifactVersionError if it does not match this code's schema.
+    """
+    data_dir = Path(data_dir or _DATA_DIR)
+    entry = load_manifest(data_dir).get(name)
+    if entry is None:
+        raise FileNotFoundError(f"Artifact {name!r} not found in {data_dir / MANIFEST_NAME}")
+
+    path = _check_entry(name, entry, data_dir, verify_hash)
+    source = pa.memory_map(str(path), "r")
+    return pa.ipc.open_file(source).read_all()
+
+
+def table_metadata(table: pa.Table) -> dict:
+    """Decode the metadata passed to write_table() back into Python values."""
+    return {
+        key.decode(): json.loads(value)
+        for key, value in (table.schema.metadata or {}).items()
+    }
+
+
+def read_frame(
+    name: str,
+    data_dir: str | Path | None = None,
+    verify_hash: bool = True,
+) -> pd.DataFrame:
+    """read_table() converted to pandas; dictionary columns become categoricals."""
+    return read_table(name, data_dir, verify_hash).to_pandas()
@@ -0,0 +1,238 @@
+"""
+CMS Benefits & Cost Sharing PUF Loader
+
+Benefits_Cost_Sharing_PUF.csv lists the cost sharing of every benefit of
+every plan variant — tens of millions of rows nationwide. It is streamed
+once into a compact plan × service table of parsed in-network copays and
+coinsurance, cached as the benefits_index Arrow artifact in data/puf_cache/
+(rebuilt only when the CSV's content changes, like the rate index) and
+held by the current data snapshot as dense numpy matrices.
+
+estimate_service_oop() uses it to price a cost by service mix: the spend
+is split across services (visits, drugs, ER, inpatient, ...), each priced
+with the plan's own copay / coinsurance and deductible rules, and the
+total capped at the plan's out-of-pocket maximum.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from app.data import puf_loader, snapshot
+from app.data.artifacts import write_table
+
+_BENEFITS_PATH = puf_loader._DATA_DIR / "Benefits_Cost_Sharing_PUF.csv"
+
+# Service key → PUF BenefitName, in matrix column order
+SERVICES: dict[str, str] = {
+    "primary_care": "Primary Care Visit to Treat an Injury or Illness",
+    "specialist": "Specialist Visit",
+    "generic_drugs": "Generic Drugs",
+    "brand_drugs": "Preferred Brand Drugs",
+    "specialty_drugs": "Specialty Drugs",
+    "emergency": "Emergency Room Services",
+    "inpatient": "Inpatient Hospital Services (e.g., Hospital Stay)",
+    "outpatient": "Outpatient Facility Fee (e.g.,  Ambulatory Surgery Center)",
+    "lab": "Laboratory Outpatient and Professional Services",
+    "imaging": "X-rays and Diagnostic Imaging",
+}
+SERVICE_KEYS = list(SERVICES)
+_SERVICE_OF = {name: i for i, name in enumerate(SERVICES.values())}
+
+# Typical allowed amount per unit of service (visit, fill, stay, scan), used
+# to turn a dollar spend into a number of copays
+UNIT_COST = np.array([150, 250, 30, 350, 3500, 2200, 15000, 3000, 120, 400], dtype=np.float64)
+
+# Share of spending by service, from the MEPS distribution of expenditures
+# by type of service for people with chronic conditions
+CONDITION_MIX = np.array([0.15, 0.13, 0.10, 0.12, 0.05, 0.05, 0.20, 0.10, 0.05, 0.05])
+HIGH_COST_MIX = np.array([0.03, 0.10, 0.02, 0.05, 0.10, 0.08, 0.45, 0.12, 0.03, 0.02])
+DRUG_MIX = np.array([0.0, 0.0, 0.60, 0.30, 0.10, 0.0, 0.0, 0.0, 0.0, 0.0])
+
+# flags bits
+COVERED = 1
+COPAY_AFTER_DEDUCTIBLE = 2
+COINS_AFTER_DEDUCTIBLE = 4
+
+_AMOUNT_RE = re.compile(r"\$([\d,]+(?:\.\d+)?)")
+_PERCENT_RE = re.compile(r"([\d.]+)%")
+_DEDUCTIBLE_RE = re.compile(r"(?:after|with) deductible", re.IGNORECASE)
+
+
+def _parse_copay(text) -> tuple[float, bool]:
+    """'$50.00 Copay after deductible' → (50.0, True); 'No Charge' → (0.0, False); else NaN."""
+    if not isinstance(text, str):
+        return np.nan, False
+    after = bool(_DEDUCTIBLE_RE.search(text))
+    if text.startswith("No Charge"):
+        return 0.0, after
+    m = _AMOUNT_RE.search(text)
+    return (float(m.group(1).replace(",", "")), after) if m else (np.nan, False)
+
+
+def _parse_coins(text) -> tuple[float, bool]:
+    """'35.00% Coinsurance after deductible' → (0.35, True); 'No Charge' → (0.0, False); else NaN."""
+    if not isinstance(text, str):
+        return np.nan, False
+    after = bool(_DEDUCTIBLE_RE.search(text))
+    if text.startswith("No Charge"):
+        return 0.0, after
+    m = _PERCENT_RE.search(text)
+    return (float(m.group(1)) / 100, after) if m else (np.nan, False)
+
+
+def _parse_column(values: pd.Series, parse, cache: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Parse a cost-sharing column once per distinct string (there are only a few hundred)."""
+    for text in values.unique():
+        if text not in cache:
+            cache[text] = parse(text)
+    parsed = values.map(cache)
+    return (np.array([p[0] for p in parsed], dtype=np.float32),
+            np.array([p[1] for p in parsed], dtype=bool))
+
+
+def _aggregate_benefits(path: Path) -> pd.DataFrame:
+    """
+    Stream the Benefits & Cost Sharing PUF in chunks and return one row per
+    (plan, service) for the standard (non-CSR) variant of each plan:
+    plan_id, service (SERVICES index), copay, coinsurance, flags.
+    """
+    cols = ["StandardComponentId", "PlanId", "BenefitName",
+            "CopayInnTier1", "CoinsInnTier1", "IsCovered"]
+    copay_cache, coins_cache = {}, {}
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=cols, dtype=str,
+                             chunksize=500_000, encoding="utf-8-sig"):
+        chunk = chunk[chunk["BenefitName"].isin(_SERVICE_OF)]
+        # -00 is the off-exchange and -01 the on-exchange standard variant
+        chunk = chunk[chunk["PlanId"].str[-3:].isin(("-00", "-01"))]
+        if chunk.empty:
+            continue
+
+        copay, copay_after = _parse_column(chunk["CopayInnTier1"], _parse_copay, copay_cache)
+        coins, coins_after = _parse_column(chunk["CoinsInnTier1"], _parse_coins, coins_cache)
+        flags = ((chunk["IsCovered"] == "Covered").to_numpy() * COVERED
+                 | copay_after * COPAY_AFTER_DEDUCTIBLE
+                 | coins_after * COINS_AFTER_DEDUCTIBLE)
+        chunks.append(pd.DataFrame({
+            "plan_id": chunk["StandardComponentId"].to_numpy(),
+            "service": chunk["BenefitName"].map(_SERVICE_OF).to_numpy(dtype=np.int8),
+            "copay": copay,
+            "coinsurance": coins,
+            "flags": flags.astype(np.uint8),
+        }))
+
+    if not chunks:
+        return pd.DataFrame({"plan_id": pd.Series(dtype=str), "service": pd.Series(dtype=np.int8),
+                             "copay": pd.Series(dtype=np.float32),
+                             "coinsurance": pd.Series(dtype=np.float32),
+                             "flags": pd.Series(dtype=np.uint8)})
+    df = pd.concat(chunks, ignore_index=True)
+    return df.drop_duplicates(["plan_id", "service"], keep="first").reset_index(drop=True)
+
+
+def build_benefits_index(path: Path | None = None, cache_dir: Path | None = None) -> Path:
+    """Aggregate the Benefits & Cost Sharing PUF and write the benefits_index artifact."""
+    path = Path(path or _BENEFITS_PATH)
+    source = puf_loader._source_info(path)
+    return write_table(
+        _aggregate_benefits(path),
+        "benefits_index",
+        cache_dir or puf_loader._CACHE_DIR,
+        dictionary_columns=("plan_id",),
+        metadata={"source": source, "services": SERVICE_KEYS},
+    )
+
+
+class BenefitsIndex:
+    """
+    Dense (plan × service) matrices of copay, coinsurance and flags, with
+    NaN copay and coinsurance where a plan does not list the benefit.
+    """
+
+    def __init__(self, benefits: pd.DataFrame):
+        plan_ids = benefits["plan_id"].astype(object)
+        self.plan_ids = pd.unique(plan_ids)
+        self.row_of = {plan_id: i for i, plan_id in enumerate(self.plan_ids)}
+        rows = plan_ids.map(self.row_of).to_numpy(dtype=np.int64)
+        cols = benefits["service"].to_numpy(dtype=np.int64)
+
+        shape = (len(self.plan_ids), len(SERVICES))
+        self.copay = np.full(shape, np.nan, dtype=np.float32)
+        self.coinsurance = np.full(shape, np.nan, dtype=np.float32)
+        self.flags = np.zeros(shape, dtype=np.uint8)
+        self.copay[rows, cols] = benefits["copay"].to_numpy()
+        self.coinsurance[rows, cols] = benefits["coinsurance"].to_numpy()
+        self.flags[rows, cols] = benefits["flags"].to_numpy()
+
+        # Derived per-cell rules, so a lookup is a row slice and arithmetic.
+        # Benefits a plan does not list fall back to deductible + plan coinsurance.
+        self.listed = ~(np.isnan(self.copay) & np.isnan(self.coinsurance))
+        self.covered = ~self.listed | (self.flags & COVERED).astype(bool)
+        self.after_deductible = ~self.listed | (
+            self.flags & (COPAY_AFTER_DEDUCTIBLE | COINS_AFTER_DEDUCTIBLE)
+        ).astype(bool)
+        self.copay_per_dollar = np.nan_to_num(self.copay) / UNIT_COST
+        self.coinsurance_or_zero = np.nan_to_num(self.coinsurance)
+
+    def __len__(self) -> int:
+        return len(self.plan_ids)
+
+
+def _load() -> dict:
+    """Load the cached benefits index (building it if stale); None without the PUF."""
+    if not _BENEFITS_PATH.exists():
+        return {"index": None}
+    benefits = puf_loader._read_cached("benefits_index", _BENEFITS_PATH)
+    if benefits is None:
+        build_benefits_index()
+        benefits = puf_loader._read_cached("benefits_index", _BENEFITS_PATH)
+    return {"index": BenefitsIndex(benefits)}
+
+
+def _sources() -> list[Path]:
+    return [_BENEFITS_PATH]
+
+
+snapshot.register("benefits", _load, _sources)
+
+
+def _index() -> BenefitsIndex | None:
+    return snapshot.get("benefits")["index"]
+
+
+def estimate_service_oop(plan_id: str, total_cost: float, mix: np.ndarray,
+                         deductible: float, coinsurance: float, oop_max: float) -> float | None:
+    """
+    Out-of-pocket cost of `total_cost` spread over services by `mix`, under
+    the plan's per-service cost sharing. Returns None if the plan (or the
+    Benefits PUF) is not available, so callers can fall back.
+
+    Per service: uncovered spend is paid in full and outside the OOP
+    maximum; services whose copay or coinsurance applies "after deductible"
+    (and services the plan does not list) first draw down the deductible,
+    in SERVICES order; the rest is charged copay × units (at UNIT_COST
+    per unit) plus coinsurance, never more than the spend itself.
+    """
+    index = _index()
+    row = index.row_of.get(plan_id) if index is not None else None
+    if row is None:
+        return None
+
+    listed, covered = index.listed[row], index.covered[row]
+
+    spend = total_cost * np.asarray(mix, dtype=np.float64)
+    toward_deductible = np.where(covered & index.after_deductible[row], spend, 0.0)
+    before = np.cumsum(toward_deductible) - toward_deductible
+    deductible_paid = np.clip(deductible - before, 0.0, toward_deductible)
+
+    remaining = spend - deductible_paid
+    share = np.where(
+        listed,
+        (index.copay_per_dollar[row] + index.coinsurance_or_zero[row]) * remaining,
+        coinsurance * remaining,
+    )
+    in_network = np.where(covered, deductible_paid + np.minimum(share, remaining), 0.0)
+    uncovered = np.where(covered, 0.0, spend)
+    return float(min(in_network.sum(), oop_max) + uncovered.sum())
@@ -0,0 +1,391 @@
+"""
+Incremental Data Build
+
+Rebuilds the processed data artifacts with one command. Each processor is a
+stage with declared input and output files; stages form a DAG (a stage
+depends on whichever stage produces one of its inputs). A stage is skipped
+when the content hashes of its inputs and its processor source are the same
+as at its last successful build and its outputs are untouched. Independent
+stages run in parallel worker processes.
+
+Build state (per-stage input/output hashes) is kept in
+processed/.build_state.json.
+
+Usage:
+    cd backend && python -m app.data.build                 # build what changed
+    cd backend && python -m app.data.build meps --force    # force one stage
+    cd backend && python -m app.data.build --dry-run       # show the plan
+"""
+
+import argparse
+import contextlib
+import hashlib
+import importlib
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+_APP_DATA_DIR = Path(__file__).resolve().parent
+_PROCESSED_DIR = _APP_DATA_DIR / "processed"
+_PROJECT_ROOT = _APP_DATA_DIR.parent.parent.parent
+_STATE_PATH = _PROCESSED_DIR / ".build_state.json"
+
+_GEXF_DIR = _PROJECT_ROOT / "data/ComorbidityNetworksData/4.Graphs-gexffiles"
+_ADJ_DIR = _PROJECT_ROOT / "data/AdjacencyMatrixUnified"
+_PUF_CACHE_DIR = _PROJECT_ROOT / "data/puf_cache"
+
+
+class Stage:
+    """
+    One build step.
+
+    inputs  — callable returning the input paths (may raise FileNotFoundError
+              when raw data is not present on this machine)
+    outputs — paths the stage writes
+    run     — (module or script path, function name) executed in a worker
+    code    — source files whose edits should force a rebuild
+    """
+
+    def __init__(self, name, inputs, outputs, run, code):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = [Path(p) for p in outputs]
+        self.run = run
+        self.code = [Path(p) for p in code]
+
+
+def _meps_inputs() -> list[Path]:
+    from app.data.meps_processor import _find_data_file
+    return [Path(_find_data_file())]
+
+
+def _h239_inputs() -> list[Path]:
+    from app.data.drug_cost_processor import _find_data_file
+    return [Path(_find_data_file())]
+
+
+def _icd_inputs() -> list[Path]:
+    from app.data.icd_processor import _REFERENCE_FILE
+    return [_GEXF_DIR / _REFERENCE_FILE]
+
+
+def _chronic_gexf_inputs() -> list[Path]:
+    return [
+        _GEXF_DIR / f"Graph_{sex}_Chronic_Age_{age}.gexf"
+        for sex in ("Male", "Female")
+        for age in range(1, 9)
+    ]
+
+
+def _icd_gexf_inputs() -> list[Path]:
+    return [
+        _GEXF_DIR / f"Graph_{sex}_ICD_Age_{age}.gexf"
+        for sex in ("Male", "Female")
+        for age in range(1, 9)
+    ]
+
+
+def _rate_inputs() -> list[Path]:
+    return [_PROJECT_ROOT / "data/Rate_PUF.csv"]
+
+
+def _benefits_inputs() -> list[Path]:
+    return [_PROJECT_ROOT / "data/Benefits_Cost_Sharing_PUF.csv"]
+
+
+def _adjacency_inputs() -> list[Path]:
+    return [
+        _ADJ_DIR / "3.AdjacencyMatrices" / f"Adj_Matrix_{sex}_ICD_age_{age}.csv"
+        for sex in ("Male", "Female")
+        for age in range(1, 9)
+    ]
+
+
+STAGES: dict[str, Stage] = {
+    stage.name: stage
+    for stage in [
+        Stage(
+            "meps",
+            _meps_inputs,
+            [_PROCESSED_DIR / f for f in (
+                "condition_costs.csv", "condition_costs.arrow",
+                "condition_summary.json", "comorbidity_costs.json",
+            )],
+            ("app.data.meps_processor", "process_and_save"),
+            [_APP_DATA_DIR / "meps_processor.py", _APP_DATA_DIR / "artifacts.py"],
+        ),
+        Stage(
+            "drug_costs",
+            _h239_inputs,
+            [_PROCESSED_DIR / "drug_costs_by_condition.json",
+             _PROCESSED_DIR / "intervention_drug_costs.json"],
+            ("app.data.drug_cost_processor", "process_and_save"),
+            [_APP_DATA_DIR / "drug_cost_processor.py"],
+        ),
+        Stage(
+            "icd_mapping",
+            _icd_inputs,
+            [_PROCESSED_DIR / "icd_mapping.json", _PROCESSED_DIR / "icd_mapping.arrow"],
+            ("app.data.icd_processor", "main"),
+            [_APP_DATA_DIR / "icd_processor.py", _APP_DATA_DIR / "comorbidity_processor.py",
+             _APP_DATA_DIR / "artifacts.py"],
+        ),
+        Stage(
+            "comorbidity_network",
+            _chronic_gexf_inputs,
+            [_PROCESSED_DIR / "comorbidity_network.arrow"],
+            ("app.data.comorbidity_processor", "process_chronic_and_save"),
+            [_APP_DATA_DIR / "comorbidity_processor.py", _APP_DATA_DIR / "artifacts.py"],
+        ),
+        Stage(
+            "icd_adjacency",
+            _icd_gexf_inputs,
+            [_PROCESSED_DIR / "icd_adjacency.arrow"],
+            ("app.data.comorbidity_processor", "process_icd_and_save"),
+            [_APP_DATA_DIR / "comorbidity_processor.py", _APP_DATA_DIR / "artifacts.py"],
+        ),
+        Stage(
+            "rate_index",
+            _rate_inputs,
+            [_PUF_CACHE_DIR / "rate_index.arrow", _PUF_CACHE_DIR / "family_rate_index.arrow"],
+            ("app.data.puf_loader", "build_rate_index"),
+            [_APP_DATA_DIR / "puf_loader.py", _APP_DATA_DIR / "artifacts.py"],
+        ),
+        Stage(
+            "benefits_index",
+            _benefits_inputs,
+            [_PUF_CACHE_DIR / "benefits_index.arrow"],
+            ("app.data.benefits_loader", "build_benefits_index"),
+            [_APP_DATA_DIR / "benefits_loader.py", _APP_DATA_DIR / "artifacts.py"],
+        ),
+        Stage(
+            "adjacency",
+            _adjacency_inputs,
+            [_ADJ_DIR / "combined_adjacency_ICD.csv"],
+            (str(_ADJ_DIR / "unifier.py"), "main"),
+            [_ADJ_DIR / "unifier.py"],
+        ),
+    ]
+}
+
+
+# ── Hashing ──
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _HashCache:
+    """
+    Content hashes keyed by (path, size, mtime_ns).
+
+    Large raw inputs are only re-hashed when their stat changes; a touched
+    file with identical content still hashes equal and does not rebuild.
+    """
+
+    def __init__(self, entries: dict):
+        self.entries = entries
+
+    def hash(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path)
+        cached = self.entries.get(key)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["sha256"]
+        digest = _sha256(path)
+        self.entries[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+
+def _load_state() -> dict:
+    if not _STATE_PATH.exists():
+        return {"stages": {}, "hashes": {}}
+    with open(_STATE_PATH) as f:
+        return json.load(f)
+
+
+def _save_state(state: dict):
+    _STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _STATE_PATH.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, _STATE_PATH)
+
+
+# ── Planning ──
+
+def _dependencies(stages: dict[str, Stage], resolved_inputs: dict[str, list[Path]]) -> dict[str, set[str]]:
+    """Stage → names of the stages producing any of its inputs."""
+    producers = {out: s.name for s in stages.values() for out in s.outputs}
+    deps = {}
+    for name, inputs in resolved_inputs.items():
+        deps[name] = {producers[p] for p in inputs if p in producers and producers[p] != name}
+    return deps
+
+
+def _fingerprint(stage: Stage, inputs: list[Path], hashes: _HashCache) -> dict:
+    return {
+        "inputs": {str(p): hashes.hash(p) for p in inputs},
+        "code": {str(p): hashes.hash(p) for p in stage.code if p.exists()},
+    }
+
+
+def _is_up_to_date(stage: Stage, fingerprint: dict, record: dict | None, hashes: _HashCache) -> bool:
+    if record is None:
+        return False
+    if record.get("inputs") != fingerprint["inputs"] or record.get("code") != fingerprint["code"]:
+        return False
+    for out in stage.outputs:
+        if not out.exists() or hashes.hash(out) != record.get("outputs", {}).get(str(out)):
+            return False
+    return True
+
+
+# ── Execution ──
+
+def _run_stage(name: str) -> tuple[float, str]:
+    """Worker entry point: run one stage, return (seconds, captured output)."""
+    target, func_name = STAGES[name].run
+    if target.endswith(".py"):
+        spec = importlib.util.spec_from_file_location(Path(target).stem, target)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+
+    log = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log):
+        getattr(module, func_name)()
+    return time.perf_counter() - start, log.getvalue()
+
+
+def build(
+    names: list[str] | None = None,
+    force: bool = False,
+    jobs: int | None = None,
+    dry_run: bool = False,
+    verbose: bool = False,
+) -> dict[str, dict]:
+    """
+    Build the selected stages (default: all), skipping up-to-date ones.
+
+    Returns {stage: {"status": ..., "seconds": ...}} where status is one of
+    "built", "up-to-date", "missing-input", "failed" or "planned".
+    """
+    selected = {n: STAGES[n] for n in (names or STAGES)}
+    state = _load_state()
+    hashes = _HashCache(state.setdefault("hashes", {}))
+    report: dict[str, dict] = {}
+
+    # Resolve inputs; stages whose raw data isn't on this machine are reported, not run
+    resolved: dict[str, list[Path]] = {}
+    for name, stage in selected.items():
+        try:
+            inputs = stage.inputs()
+            missing = [p for p in inputs if not p.exists()]
+        except FileNotFoundError as e:
+            inputs, missing = [], [str(e)]
+        if missing:
+            report[name] = {"status": "missing-input", "seconds": 0.0, "detail": str(missing[0])}
+        else:
+            resolved[name] = inputs
+
+    deps = _dependencies(selected, resolved)
+    pending = set(resolved)
+    running: dict = {}
+    max_workers = jobs or min(len(pending), os.cpu_count() or 1) or 1
+
+    def _ready(name: str) -> bool:
+        return all(d not in pending and d not in running.values() for d in deps[name])
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name in sorted(n for n in pending if _ready(n)):
+                pending.discard(name)
+                stage = selected[name]
+                if any(report.get(d, {}).get("status") == "failed" for d in deps[name]):
+                    report[name] = {"status": "failed", "seconds": 0.0, "detail": "upstream stage failed"}
+                    continue
+
+                fingerprint = _fingerprint(stage, resolved[name], hashes)
+                if not force and _is_up_to_date(stage, fingerprint, state["stages"].get(name), hashes):
+                    report[name] = {"status": "up-to-date", "seconds": 0.0}
+                    continue
+                if dry_run:
+                    report[name] = {"status": "planned", "seconds": 0.0}
+                    continue
+
+                future = pool.submit(_run_stage, name)
+                future.fingerprint = fingerprint
+                running[future] = name
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    seconds, log = future.result()
+                except Exception as e:
+                    report[name] = {"status": "failed", "seconds": 0.0, "detail": repr(e)}
+                    continue
+                if verbose and log:
+                    print(f"── {name} ──\n{log}")
+                state["stages"][name] = {
+                    **future.fingerprint,
+                    "outputs": {
+                        str(p): hashes.hash(p) for p in selected[name].outputs if p.exists()
+                    },
+                }
+                _save_state(state)
+                report[name] = {"status": "built", "seconds": round(seconds, 2)}
+
+    if not dry_run:
+        _save_state(state)
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.data.build", description=__doc__.split("\n\n")[1])
+    parser.add_argument("stages", nargs="*", metavar="stage",
+                        help=f"stages to build (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--force", action="store_true", help="rebuild even if inputs are unchanged")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="parallel worker processes")
+    parser.add_argument("--dry-run", action="store_true", help="show what would be rebuilt")
+    parser.add_argument("--verbose", "-v", action="store_true", help="print each processor's output")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    start = time.perf_counter()
+    report = build(args.stages or None, force=args.force, jobs=args.jobs,
+                   dry_run=args.dry_run, verbose=args.verbose)
+
+    print(f"{'stage':22s} {'status':14s} {'time':>8s}")
+    for name in STAGES:
+        if name not in report:
+            continue
+        r = report[name]
+        line = f"{name:22s} {r['status']:14s} {r['seconds']:>7.2f}s"
+        if r.get("detail"):
+            line += f"  ({r['detail']})"
+        print(line)
+    print(f"\nTotal: {time.perf_counter() - start:.2f}s")
+
+    return 1 if any(r["status"] == "failed" for r in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
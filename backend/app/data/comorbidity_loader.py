@@ -1,30 +1,34 @@
 """
 Comorbidity Network Loader (ICD-level)
 
-Loads the combined ICD adjacency matrix (combined_adjacency_ICD.csv) and the
-ICD mapping (icd_mapping.json) to provide comorbidity queries at the ICD-10
-code level, aggregated back to engine condition keys.
-
-The CSV contains 1080×1080 odds-ratio matrices for 16 sex/age strata.
+Loads the ICD adjacency matrices and the ICD mapping (icd_mapping.json) to
+provide comorbidity queries at the ICD-10 code level, aggregated back to
+engine condition keys.
+
+There are 1080×1080 odds-ratio matrices for 16 sex/age strata, read from
+the icd_adjacency edge table when comorbidity_processor has built it, else
+from the combined adjacency CSV (combined_adjacency_ICD.csv).
+Loaded on first access and held by the current data snapshot (snapshot.py).
 """
 
+import bisect
 import json
+import re
 import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from app.data import snapshot
+from app.data.artifacts import has_artifact, read_table
+from app.data.text_index import TextIndex
+
 _DATA_DIR = Path(__file__).resolve().parent / "processed"
 _CSV_PATH = (
     Path(__file__).resolve().parent.parent.parent.parent
     / "data/AdjacencyMatrixUnified/combined_adjacency_ICD.csv"
 )
 
-# --- Loaded data (lazy) ---
-_icd_mapping: list[dict] | None = None
-_icd_code_to_idx: dict[str, int] | None = None
-_icd_idx_to_code: dict[int, str] | None = None
-_icd_idx_to_desc: dict[int, str] | None = None
-_matrices: dict[str, np.ndarray] | None = None  # "M_6" → (1080, 1080) array
+_MAPPING_PATH = _DATA_DIR / "icd_mapping.json"
 
 # ── Condition key ↔ ICD code mapping ──
 
@@ -144,44 +148,158 @@ _CONDITION_LABELS: dict[str, str] = {
 }
 
 
-def _ensure_loaded():
-    """Lazy-load ICD mapping and adjacency CSV on first access."""
-    global _icd_mapping, _icd_code_to_idx, _icd_idx_to_code, _icd_idx_to_desc, _matrices
+def _read_icd_mapping() -> list[dict]:
+    """[{"index", "icd_code", "description"}, ...] from the Arrow artifact if present, else JSON."""
+    if has_artifact("icd_mapping", _DATA_DIR):
+        return read_table("icd_mapping", _DATA_DIR).to_pylist()
+    if _MAPPING_PATH.exists():
+        with open(_MAPPING_PATH) as f:
+            return json.load(f)
+    raise FileNotFoundError(
+        f"ICD mapping not found at {_MAPPING_PATH}. "
+        "Run: cd backend && python3 -m app.data.icd_processor"
+    )
 
-    if _matrices is not None:
-        return
 
-    # Load ICD mapping
-    mapping_path = _DATA_DIR / "icd_mapping.json"
-    if not mapping_path.exists():
-        raise FileNotFoundError(
-            f"ICD mapping not found at {mapping_path}. "
-            "Run: cd backend && python3 -m app.data.icd_processor"
-        )
+_N_ICD_CODES = 1080
 
-    with open(mapping_path) as f:
-        _icd_mapping = json.load(f)
 
-    _icd_code_to_idx = {m["icd_code"]: m["index"] for m in _icd_mapping}
-    _icd_idx_to_code = {m["index"]: m["icd_code"] for m in _icd_mapping}
-    _icd_idx_to_desc = {m["index"]: m["description"] for m in _icd_mapping}
+def _read_matrices() -> dict[str, np.ndarray]:
+    """
+    Odds-ratio matrices keyed by "M_6", "F_3" etc., each (1080, 1080).
+    Scattered from the icd_adjacency edge table (comorbidity_processor)
+    if it has been built, else parsed from the combined adjacency CSV.
+    """
+    matrices = {}
+    if has_artifact("icd_adjacency", _DATA_DIR):
+        df = read_table("icd_adjacency", _DATA_DIR).to_pandas()
+        for (sex, age), group in df.groupby(["sex", "age"], observed=True):
+            arr = np.zeros((_N_ICD_CODES, _N_ICD_CODES), dtype=np.float64)
+            arr[group["source"].to_numpy(), group["target"].to_numpy()] = group["weight"].to_numpy()
+            matrices[f"{sex}_{age}"] = arr
+        return matrices
 
-    # Load adjacency CSV
     if not _CSV_PATH.exists():
         raise FileNotFoundError(
-            f"ICD adjacency CSV not found at {_CSV_PATH}."
+            f"ICD adjacency not found: no icd_adjacency artifact and no CSV at {_CSV_PATH}. "
+            "Run: cd backend && python3 -m app.data.comorbidity_processor icd"
         )
 
     df = pd.read_csv(_CSV_PATH)
-    col_indices = [str(i) for i in range(1080)]
+    col_indices = [str(i) for i in range(_N_ICD_CODES)]
 
     # Pre-split into numpy arrays keyed by "M_6", "F_3" etc.
-    _matrices = {}
     sex_map = {"Male": "M", "Female": "F"}
     for (sex, age), group in df.groupby(["sex", "age"]):
         key = f"{sex_map.get(sex, sex)}_{age}"
         arr = group[col_indices].to_numpy(dtype=np.float64)
-        _matrices[key] = arr
+        matrices[key] = arr
+    return matrices
+
+
+def _load() -> dict:
+    """Load the ICD mapping and adjacency matrices into a fresh dict (one snapshot's worth)."""
+    icd_mapping = _read_icd_mapping()
+    matrices = _read_matrices()
+
+    return {
+        "icd_code_to_idx": {m["icd_code"]: m["index"] for m in icd_mapping},
+        "icd_idx_to_code": {m["index"]: m["icd_code"] for m in icd_mapping},
+        "icd_idx_to_desc": {m["index"]: m["description"] for m in icd_mapping},
+        "matrices": matrices,  # "M_6" → (1080, 1080) array
+    }
+
+
+def _sources() -> list[Path]:
+    return [_MAPPING_PATH, _DATA_DIR / "icd_mapping.arrow", _DATA_DIR / "icd_adjacency.arrow", _CSV_PATH]
+
+
+snapshot.register("comorbidity", _load, _sources)
+
+
+def _load_icd_mapping() -> dict:
+    """The ICD mapping on its own, for text lookups that do not need the matrices."""
+    return {"entries": _read_icd_mapping()}
+
+
+snapshot.register("icd_mapping", _load_icd_mapping,
+                  lambda: [_MAPPING_PATH, _DATA_DIR / "icd_mapping.arrow"])
+
+
+# ── Free-text ICD search ──
+
+# A query that looks like (the start of) a 3-character ICD-10 code: "E", "E1", "E11"
+_ICD_CODE_QUERY_RE = re.compile(r"^[A-Za-z]\d{0,2}$")
+# Words in most ICD descriptions, which say little about which code is meant
+_ICD_GENERIC_WORDS = frozenset("""
+other unspecified specified disease diseases disorder disorders condition conditions
+classd classified elswhr elsewhere
+""".split())
+ICD_SEARCH_MIN_SCORE = 0.3
+
+
+def _load_icd_search() -> dict:
+    """
+    TextIndex over each ICD description (plus the label of the condition
+    it maps to, so "lung cancer" finds C34), and the codes sorted for
+    prefix lookup.
+    """
+    entries = snapshot.get("icd_mapping")["entries"]
+    docs = []
+    for e in entries:
+        condition = _ICD_TO_CONDITION.get(e["icd_code"])
+        docs.append(f"{e['description']} {_CONDITION_LABELS[condition]}" if condition else e["description"])
+    return {
+        "entries": entries,
+        "index": TextIndex(docs, generic_words=_ICD_GENERIC_WORDS),
+        "sorted_codes": sorted((e["icd_code"], i) for i, e in enumerate(entries)),
+    }
+
+
+snapshot.register("icd_search", _load_icd_search,
+                  lambda: [_MAPPING_PATH, _DATA_DIR / "icd_mapping.arrow"])
+
+
+def search_icd(query: str, limit: int = 10) -> list[dict]:
+    """
+    Rank ICD-10 codes for free text ("type 2 diabetes", "diabetis", "E11").
+
+    Code-like queries list the codes they prefix first; words are matched
+    against the descriptions with prefix and typo tolerance, so partial
+    input works for type-ahead.
+
+    Returns list of dicts sorted by score (descending):
+        [{"icd_code": "E11", "description": "Type 2 diabetes mellitus",
+          "condition": "diabetes", "index": 161, "score": 1.0}, ...]
+    """
+    data = snapshot.get("icd_search")
+    entries = data["entries"]
+    query = query.strip()
+
+    hits: dict[int, float] = {}
+    if _ICD_CODE_QUERY_RE.match(query):
+        prefix = query.upper()
+        codes = data["sorted_codes"]
+        for code, entry_id in codes[bisect.bisect_left(codes, (prefix,)):]:
+            if not code.startswith(prefix) or len(hits) >= limit:
+                break
+            hits[entry_id] = 1.0
+    for entry_id, score in data["index"].search(query, limit, min_score=ICD_SEARCH_MIN_SCORE):
+        if len(hits) >= limit:
+            break
+        hits.setdefault(entry_id, score)
+
+    result = []
+    for entry_id, score in hits.items():
+        entry = entries[entry_id]
+        result.append({
+            "icd_code": entry["icd_code"],
+            "description": entry["description"],
+            "condition": _ICD_TO_CONDITION.get(entry["icd_code"]),
+            "index": entry["index"],
+            "score": round(score, 4),
+        })
+    return result
 
 
 def _age_to_group(age: int) -> int:
@@ -225,14 +343,17 @@ def get_comorbid_conditions(
     Returns list of dicts sorted by weight (descending):
         [{"condition": "diabetes", "weight": 7.23, "label": "Diabetes Mellitus"}, ...]
     """
-    _ensure_loaded()
+    data = snapshot.get("comorbidity")
+    icd_code_to_idx = data["icd_code_to_idx"]
+    icd_idx_to_code = data["icd_idx_to_code"]
+    matrices = data["matrices"]
 
     # Resolve condition → ICD indices
     icd_codes = CONDITION_TO_ICD.get(condition, [])
     if not icd_codes:
         return []
 
-    source_indices = [_icd_code_to_idx[c] for c in icd_codes if c in _icd_code_to_idx]
+    source_indices = [icd_code_to_idx[c] for c in icd_codes if c in icd_code_to_idx]
     if not source_indices:
         return []
 
@@ -241,12 +362,12 @@ def get_comorbid_conditions(
     age_group = _age_to_group(age)
     matrix_key = f"{sex_code}_{age_group}"
 
-    matrix = _matrices.get(matrix_key)
+    matrix = matrices.get(matrix_key)
     if matrix is None:
         # Fallback to nearest age group
         for offset in [1, -1, 2, -2]:
             fallback = f"{sex_code}_{max(1, min(8, age_group + offset))}"
-            matrix = _matrices.get(fallback)
+            matrix = matrices.get(fallback)
             if matrix is not None:
                 break
 
@@ -263,7 +384,7 @@ def get_comorbid_conditions(
         for tgt_idx in nonzero:
             tgt_idx = int(tgt_idx)
             weight = float(row[tgt_idx])
-            tgt_code = _icd_idx_to_code.get(tgt_idx)
+            tgt_code = icd_idx_to_code.get(tgt_idx)
             if tgt_code is None:
                 continue
 
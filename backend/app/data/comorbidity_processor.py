@@ -1,24 +1,35 @@
 """
 Comorbidity Network Processor
 
-Parses all 16 Chronic GEXF files (8 age groups x 2 sexes) from
-ComorbidityNetworksData into a single JSON file for the simulation engine.
+Parses the 16 GEXF strata (8 age groups x 2 sexes) from
+ComorbidityNetworksData into compact binary edge tables:
+
+- processed/comorbidity_network.arrow — Chronic networks (46 conditions)
+- processed/icd_adjacency.arrow — ICD-level networks (1080 codes), read by
+  comorbidity_loader in place of the combined adjacency CSV
+
+GEXF files are streamed with iterparse and cleared element by element, so
+memory is bounded by the edge arrays rather than the XML tree, and the
+strata are parsed concurrently in a process pool.
 
 Usage:
-    cd backend && python -m app.data.comorbidity_processor
+    cd backend && python -m app.data.comorbidity_processor [chronic|icd|all]
 """
 
-import json
+import sys
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 from pathlib import Path
 
+from app.data.artifacts import write_table
+
 _GEXF_DIR = Path(__file__).resolve().parent.parent.parent.parent / (
     "data/ComorbidityNetworksData/4.Graphs-gexffiles"
 )
 _OUTPUT_DIR = Path(__file__).resolve().parent / "processed"
 
-# GEXF namespace
-_NS = {"gexf": "http://www.gexf.net/1.3"}
 
 # Map GEXF node labels → internal condition keys
 LABEL_TO_KEY = {
@@ -126,103 +137,245 @@ KEY_TO_LABEL.update({
 SEX_MAP = {"M": "Male", "F": "Female"}
 
 
+def _local(tag: str) -> str:
+    """Strip the XML namespace from a tag ("{http://www.gexf.net/1.3}node" → "node")."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_gexf(filepath: Path):
+    """
+    Stream a GEXF file, yielding one tuple per node and edge:
+        ("node", node_id, label, {attvalue "for" → value})
+        ("edge", source_id, target_id, weight)
+
+    Each element is discarded as soon as it has been yielded, so even the
+    ICD-level graphs never materialise as a full tree.
+    """
+    container = None
+    for event, elem in ET.iterparse(filepath, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "start":
+            if tag in ("nodes", "edges"):
+                container = elem
+            continue
+
+        if tag == "node":
+            atts = {
+                av.get("for"): av.get("value", "")
+                for av in elem.iter()
+                if _local(av.tag) == "attvalue"
+            }
+            yield "node", elem.get("id"), elem.get("label"), atts
+            container.clear()
+        elif tag == "edge":
+            yield "edge", elem.get("source"), elem.get("target"), float(elem.get("weight", "1.0"))
+            container.clear()
+
+
 def parse_gexf(filepath: Path) -> dict:
     """
-    Parse a single GEXF file and return:
+    Parse a single Chronic GEXF file and return:
         {"nodes": {node_id: {"label": ..., "icd": ...}},
          "edges": [(source_key, target_key, weight), ...]}
     """
-    tree = ET.parse(filepath)
-    root = tree.getroot()
-
-    graph = root.find("gexf:graph", _NS)
-    nodes_el = graph.find("gexf:nodes", _NS)
-    edges_el = graph.find("gexf:edges", _NS)
-
-    # Parse nodes: id -> {label, icd_code}
     id_to_info = {}
-    for node in nodes_el.findall("gexf:node", _NS):
-        node_id = node.get("id")
-        label = node.get("label")
-        icd_code = ""
-        attvalues = node.find("gexf:attvalues", _NS)
-        if attvalues is not None:
-            for av in attvalues.findall("gexf:attvalue", _NS):
-                if av.get("for") == "att2":
-                    icd_code = av.get("value", "")
-        id_to_info[node_id] = {"label": label, "icd": icd_code}
-
-    # Parse edges: source_id, target_id, weight
     edges = []
-    for edge in edges_el.findall("gexf:edge", _NS):
-        source_id = edge.get("source")
-        target_id = edge.get("target")
-        weight = float(edge.get("weight", "1.0"))
-
-        source_label = id_to_info.get(source_id, {}).get("label")
-        target_label = id_to_info.get(target_id, {}).get("label")
-
-        source_key = LABEL_TO_KEY.get(source_label)
-        target_key = LABEL_TO_KEY.get(target_label)
-
+    for kind, a, b, c in iter_gexf(filepath):
+        if kind == "node":
+            # att2 holds the ICD range of the chronic condition
+            id_to_info[a] = {"label": b, "icd": c.get("att2", "")}
+            continue
+
+        source_key = LABEL_TO_KEY.get(id_to_info.get(a, {}).get("label"))
+        target_key = LABEL_TO_KEY.get(id_to_info.get(b, {}).get("label"))
         if source_key and target_key:
-            edges.append((source_key, target_key, weight))
+            edges.append((source_key, target_key, c))
 
     return {"nodes": id_to_info, "edges": edges}
 
 
-def process_all() -> dict:
+def _parse_chronic_stratum(filepath: Path) -> tuple[dict, dict]:
+    """Worker: parse one Chronic file into (conditions metadata, bidirectional adjacency)."""
+    result = parse_gexf(filepath)
+
+    conditions = {}
+    for node_info in result["nodes"].values():
+        label = node_info["label"]
+        key = LABEL_TO_KEY.get(label)
+        if key:
+            conditions[key] = {
+                "label": KEY_TO_LABEL.get(key, label),
+                "icd": node_info["icd"],
+            }
+
+    adj = {}
+    for source_key, target_key, weight in result["edges"]:
+        if source_key not in adj:
+            adj[source_key] = {}
+        adj[source_key][target_key] = round(weight, 4)
+
+        # Ensure bidirectional (undirected graph)
+        if target_key not in adj:
+            adj[target_key] = {}
+        if source_key not in adj[target_key]:
+            adj[target_key][source_key] = round(weight, 4)
+
+    return conditions, adj
+
+
+def parse_icd_gexf(filepath: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Process all 16 Chronic GEXF files and build the combined JSON structure.
+    Parse an ICD-level GEXF file into symmetric edge arrays
+    (source index int16, target index int16, odds ratio float32).
+
+    GEXF node ids are 1-based; indices are 0-based to match icd_mapping.
+    """
+    sources, targets, weights = [], [], []
+    for kind, a, b, c in iter_gexf(filepath):
+        if kind == "edge":
+            sources.append(int(a) - 1)
+            targets.append(int(b) - 1)
+            weights.append(c)
+
+    src = np.asarray(sources, dtype=np.int16)
+    tgt = np.asarray(targets, dtype=np.int16)
+    w = np.asarray(weights, dtype=np.float32)
+
+    # Undirected graph: add reverse edges, keeping the stated direction's
+    # weight when both directions are present in the file
+    all_src = np.concatenate([src, tgt])
+    all_tgt = np.concatenate([tgt, src])
+    all_w = np.concatenate([w, w])
+    keys = all_src.astype(np.int32) * 65536 + all_tgt.astype(np.int32)
+    _, first = np.unique(keys, return_index=True)
+    return all_src[first], all_tgt[first], all_w[first]
+
+
+def _strata_files(kind: str) -> list[tuple[str, int, Path]]:
+    return [
+        (sex_code, age_group, _GEXF_DIR / f"Graph_{sex_name}_{kind}_Age_{age_group}.gexf")
+        for sex_code, sex_name in SEX_MAP.items()
+        for age_group in range(1, 9)
+    ]
+
+
+def process_all(max_workers: int | None = None) -> dict:
+    """
+    Process all 16 Chronic GEXF files and build the combined structure:
+        {"conditions": {key: {label, icd}}, "networks": {"M_1": {src: {tgt: weight}}}}
     """
     # Collect condition metadata from any file (they all have the same 46 nodes)
     conditions = {}
     networks = {}
 
-    for sex_code, sex_name in SEX_MAP.items():
-        for age_group in range(1, 9):
-            filename = f"Graph_{sex_name}_Chronic_Age_{age_group}.gexf"
-            filepath = _GEXF_DIR / filename
-
-            if not filepath.exists():
-                print(f"  WARNING: {filename} not found, skipping")
-                continue
-
-            result = parse_gexf(filepath)
+    strata = []
+    for sex_code, age_group, filepath in _strata_files("Chronic"):
+        if not filepath.exists():
+            print(f"  WARNING: {filepath.name} not found, skipping")
+            continue
+        strata.append((sex_code, age_group, filepath))
 
-            # Build conditions metadata (from first file parsed)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        parsed = pool.map(_parse_chronic_stratum, [f for _, _, f in strata])
+        for (sex_code, age_group, filepath), (file_conditions, adj) in zip(strata, parsed):
             if not conditions:
-                for node_info in result["nodes"].values():
-                    label = node_info["label"]
-                    key = LABEL_TO_KEY.get(label)
-                    if key:
-                        conditions[key] = {
-                            "label": KEY_TO_LABEL.get(key, label),
-                            "icd": node_info["icd"],
-                        }
-
-            # Build adjacency dict for this sex + age_group
-            network_key = f"{sex_code}_{age_group}"
-            adj = {}
-            for source_key, target_key, weight in result["edges"]:
-                if source_key not in adj:
-                    adj[source_key] = {}
-                adj[source_key][target_key] = round(weight, 4)
-
-                # Ensure bidirectional (undirected graph)
-                if target_key not in adj:
-                    adj[target_key] = {}
-                if source_key not in adj[target_key]:
-                    adj[target_key][source_key] = round(weight, 4)
-
-            networks[network_key] = adj
-            edge_count = len(result["edges"])
-            print(f"  Parsed {filename}: {edge_count} edges")
+                conditions = file_conditions
+            networks[f"{sex_code}_{age_group}"] = adj
+            edge_count = sum(len(t) for t in adj.values()) // 2
+            print(f"  Parsed {filepath.name}: ~{edge_count} edges")
 
     return {"conditions": conditions, "networks": networks}
 
 
-def main():
+def network_to_table(data: dict) -> pd.DataFrame:
+    """Flatten {"networks": {"M_1": {src: {tgt: w}}}} into one edge row per entry."""
+    rows = []
+    for network_key, adj in data["networks"].items():
+        sex, age = network_key.split("_")
+        for source_key, targets in adj.items():
+            for target_key, weight in targets.items():
+                rows.append((sex, int(age), source_key, target_key, weight))
+    return pd.DataFrame(rows, columns=["sex", "age", "source", "target", "weight"])
+
+
+def save_network_artifact(data: dict, output_dir: Path | None = None) -> Path:
+    """
+    Write the Chronic networks as a dictionary-encoded edge table.
+
+    Condition metadata (label, ICD range) travels in the schema metadata.
+    """
+    return write_table(
+        network_to_table(data),
+        "comorbidity_network",
+        output_dir or _OUTPUT_DIR,
+        dictionary_columns=("sex", "source", "target"),
+        dtypes={"age": "int8", "weight": "float32"},
+        metadata={"conditions": data["conditions"]},
+    )
+
+
+def process_icd(max_workers: int | None = None) -> pd.DataFrame:
+    """
+    Parse the 16 ICD-level GEXF strata concurrently into one edge table
+    sorted by (sex, age, source) — the layout comorbidity_loader slices
+    into per-stratum CSR rows.
+    """
+    strata = []
+    for sex_code, age_group, filepath in _strata_files("ICD"):
+        if not filepath.exists():
+            print(f"  WARNING: {filepath.name} not found, skipping")
+            continue
+        strata.append((sex_code, age_group, filepath))
+
+    frames = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        parsed = pool.map(parse_icd_gexf, [f for _, _, f in strata])
+        for (sex_code, age_group, filepath), (src, tgt, w) in zip(strata, parsed):
+            frames.append(pd.DataFrame({
+                "sex": sex_code,
+                "age": np.int8(age_group),
+                "source": src,
+                "target": tgt,
+                "weight": w,
+            }))
+            print(f"  Parsed {filepath.name}: {len(src) // 2} edges")
+
+    if not frames:
+        return pd.DataFrame(columns=["sex", "age", "source", "target", "weight"])
+    df = pd.concat(frames, ignore_index=True)
+    return df.sort_values(["sex", "age", "source", "target"], kind="stable").reset_index(drop=True)
+
+
+def save_icd_artifact(df: pd.DataFrame, output_dir: Path | None = None) -> Path:
+    """Write the ICD-level edge table (int16 indices, float32 odds ratios)."""
+    return write_table(
+        df,
+        "icd_adjacency",
+        output_dir or _OUTPUT_DIR,
+        dictionary_columns=("sex",),
+        dtypes={"age": "int8", "source": "int16", "target": "int16", "weight": "float32"},
+    )
+
+
+def process_chronic_and_save():
+    """Build processed/comorbidity_network.arrow from the Chronic GEXF files."""
+    data = process_all()
+    output_path = save_network_artifact(data)
+    print(f"\nDone! {len(data['conditions'])} conditions, {len(data['networks'])} networks")
+    print(f"Output: {output_path}")
+
+
+def process_icd_and_save():
+    """Build processed/icd_adjacency.arrow from the ICD-level GEXF files."""
+    df = process_icd()
+    output_path = save_icd_artifact(df)
+    print(f"\nDone! {len(df)} directed ICD edges across {df.groupby(['sex', 'age']).ngroups} strata")
+    print(f"Output: {output_path}")
+
+
+def main(argv: list[str] | None = None):
+    level = (argv if argv is not None else sys.argv[1:] or ["all"])[0]
+
     print("Comorbidity Network Processor")
     print(f"  GEXF directory: {_GEXF_DIR}")
     print(f"  Output directory: {_OUTPUT_DIR}")
@@ -234,16 +387,10 @@ def main():
 
     _OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    data = process_all()
-
-    output_path = _OUTPUT_DIR / "comorbidity_network.json"
-    with open(output_path, "w") as f:
-        json.dump(data, f, indent=2)
-
-    n_conditions = len(data["conditions"])
-    n_networks = len(data["networks"])
-    print(f"\nDone! {n_conditions} conditions, {n_networks} networks")
-    print(f"Output: {output_path}")
+    if level in ("chronic", "all"):
+        process_chronic_and_save()
+    if level in ("icd", "all"):
+        process_icd_and_save()
 
 
 if __name__ == "__main__":
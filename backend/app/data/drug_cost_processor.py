@@ -12,6 +12,10 @@ The H239 file contains individual prescription fill records with:
 - PERWT22F — survey weight for population-level estimates
 - RXDRGNAM — drug name
 
+The file is streamed in chunks and reduced to running per-person totals, so
+multi-year extracts can be processed with bounded memory. Intervention fills
+are classified in the same pass by matching each distinct drug name once.
+
 This processor builds two artifacts:
 1. drug_costs_by_condition.json — per-condition drug cost statistics
 2. intervention_drug_costs.json — per-intervention (specific drug) cost statistics
@@ -102,6 +106,62 @@ INTERVENTION_PATTERNS = {
 
 USE_COLS = ["DUPERSID", "TC1S1", "RXSF22X", "RXXP22X", "PERWT22F", "RXDRGNAM"]
 
+# Drug names repeat heavily across fills, so reading RXDRGNAM as a categorical
+# keeps each chunk small and lets intervention matching run over unique names.
+H239_DTYPES = {
+    "RXDRGNAM": "category",
+    "RXSF22X": "float64",
+    "RXXP22X": "float64",
+    "PERWT22F": "float64",
+}
+
+# Rows per chunk for the streaming reader
+CHUNK_SIZE = 100_000
+
+
+class InterventionMatcher:
+    """
+    Classify RXDRGNAM drug names into intervention keys.
+
+    All INTERVENTION_PATTERNS are compiled into one alternation with a named
+    group per intervention, so each distinct drug name is scanned once.
+    Results are memoised per name — H239 has a few thousand distinct names
+    against hundreds of thousands of fills.
+    """
+
+    def __init__(self, patterns: dict[str, list[str]] | None = None):
+        if patterns is None:
+            patterns = INTERVENTION_PATTERNS
+        self.keys = list(patterns)
+        self._regex = re.compile(
+            "|".join(f"(?P<{key}>{'|'.join(p)})" for key, p in patterns.items()),
+            re.IGNORECASE,
+        )
+        self._memo: dict[str, frozenset[str]] = {}
+
+    def match(self, name) -> frozenset[str]:
+        """Return the set of intervention keys a drug name belongs to."""
+        if not isinstance(name, str):
+            return frozenset()
+        hit = self._memo.get(name)
+        if hit is None:
+            hit = frozenset(m.lastgroup for m in self._regex.finditer(name))
+            self._memo[name] = hit
+        return hit
+
+    def category_masks(self, categories) -> dict[str, np.ndarray]:
+        """
+        Build one boolean lookup per intervention over a categorical's categories.
+
+        Each mask has one extra trailing False so that indexing with the
+        categorical codes maps missing names (code -1) to "no match".
+        """
+        masks = {key: np.zeros(len(categories) + 1, dtype=bool) for key in self.keys}
+        for i, name in enumerate(categories):
+            for key in self.match(name):
+                masks[key][i] = True
+        return masks
+
 
 def _find_data_file() -> str:
     """Locate the H239 prescribed medicines CSV."""
@@ -118,13 +178,8 @@ def _find_data_file() -> str:
     )
 
 
-def load_raw_h239(path: str | None = None) -> pd.DataFrame:
-    """Load the raw H239 CSV with only the columns we need."""
-    if path is None:
-        path = _find_data_file()
-
-    df = pd.read_csv(path, usecols=USE_COLS)
-
+def _clean_fills(df: pd.DataFrame) -> pd.DataFrame:
+    """Clip missing-value cost codes and keep fills with mapped TC1S1 codes."""
     # Clean cost columns: negative values mean missing/inapplicable in MEPS
     for col in ["RXSF22X", "RXXP22X"]:
         df[col] = df[col].clip(lower=0)
@@ -138,6 +193,131 @@ def load_raw_h239(path: str | None = None) -> pd.DataFrame:
     return df
 
 
+def load_raw_h239(path: str | None = None) -> pd.DataFrame:
+    """Load the raw H239 CSV with only the columns we need."""
+    if path is None:
+        path = _find_data_file()
+
+    df = pd.read_csv(path, usecols=USE_COLS)
+    return _clean_fills(df)
+
+
+def iter_h239_chunks(path: str | None = None, chunksize: int = CHUNK_SIZE):
+    """
+    Stream the raw H239 CSV in chunks of cleaned, condition-mapped fills.
+
+    Only one chunk is held in memory at a time.
+    """
+    if path is None:
+        path = _find_data_file()
+
+    for chunk in pd.read_csv(path, usecols=USE_COLS, dtype=H239_DTYPES,
+                             chunksize=chunksize):
+        yield _clean_fills(chunk)
+
+
+def _person_costs(fills: pd.DataFrame, by: list, cost_col: str, oop_col: str) -> pd.DataFrame:
+    """Sum fills into annual per-person costs, keeping the person-level weight."""
+    return fills.groupby(by, observed=True).agg(
+        **{
+            cost_col: ("RXXP22X", "sum"),
+            oop_col: ("RXSF22X", "sum"),
+        },
+        weight=("PERWT22F", "first"),  # weight is person-level, same across fills
+    )
+
+
+class _RunningPersonCosts:
+    """
+    Running per-person cost totals across chunks.
+
+    Partial sums are buffered and folded together every few chunks, so memory
+    is bounded by the number of persons rather than the number of fills.
+    """
+
+    def __init__(self, compact_every: int = 8):
+        self._parts: list[pd.DataFrame] = []
+        self._compact_every = compact_every
+
+    def add(self, part: pd.DataFrame):
+        if len(part):
+            self._parts.append(part)
+        if len(self._parts) >= self._compact_every:
+            self._parts = [self._fold()]
+
+    def _fold(self) -> pd.DataFrame:
+        combined = pd.concat(self._parts)
+        agg = {col: "sum" for col in combined.columns if col != "weight"}
+        agg["weight"] = "first"
+        return combined.groupby(level=list(range(combined.index.nlevels))).agg(agg)
+
+    def result(self) -> pd.DataFrame | None:
+        if not self._parts:
+            return None
+        return self._fold().reset_index()
+
+
+def aggregate_h239(
+    path: str | None = None,
+    chunksize: int = CHUNK_SIZE,
+    matcher: InterventionMatcher | None = None,
+) -> dict:
+    """
+    Single streaming pass over H239 producing per-person annual aggregates.
+
+    Each fill is attributed to its condition (via TC1S1) and to any
+    intervention its drug name matches, in the same pass.
+
+    Returns dict with keys:
+        person_condition — DUPERSID, condition, annual_drug_cost, annual_drug_oop, weight
+        person_intervention — DUPERSID, intervention, annual_cost, annual_oop, weight
+        n_fills — number of mapped prescription fills seen
+    """
+    if matcher is None:
+        matcher = InterventionMatcher()
+
+    by_condition = _RunningPersonCosts()
+    by_intervention = _RunningPersonCosts()
+    n_fills = 0
+
+    for chunk in iter_h239_chunks(path, chunksize):
+        n_fills += len(chunk)
+        by_condition.add(
+            _person_costs(chunk, ["DUPERSID", "condition"], "annual_drug_cost", "annual_drug_oop")
+        )
+
+        names = chunk["RXDRGNAM"]
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype("category")
+        codes = names.cat.codes.to_numpy()
+        for intervention, mask in matcher.category_masks(names.cat.categories).items():
+            fills = chunk[mask[codes]]
+            if len(fills) == 0:
+                continue
+            part = _person_costs(fills, ["DUPERSID"], "annual_cost", "annual_oop")
+            part.index = pd.MultiIndex.from_arrays(
+                [part.index, [intervention] * len(part)], names=["DUPERSID", "intervention"]
+            )
+            by_intervention.add(part)
+
+    person_condition = by_condition.result()
+    if person_condition is None:
+        person_condition = pd.DataFrame(
+            columns=["DUPERSID", "condition", "annual_drug_cost", "annual_drug_oop", "weight"]
+        )
+    person_intervention = by_intervention.result()
+    if person_intervention is None:
+        person_intervention = pd.DataFrame(
+            columns=["DUPERSID", "intervention", "annual_cost", "annual_oop", "weight"]
+        )
+
+    return {
+        "person_condition": person_condition,
+        "person_intervention": person_intervention,
+        "n_fills": n_fills,
+    }
+
+
 def build_drug_costs_by_condition(df: pd.DataFrame) -> dict:
     """
     For each condition, compute population-weighted annual drug cost statistics.
@@ -147,16 +327,14 @@ def build_drug_costs_by_condition(df: pd.DataFrame) -> dict:
     2. Compute weighted statistics across persons
     """
     # Sum costs per person per condition (annual total across all fills)
-    person_condition = (
-        df.groupby(["DUPERSID", "condition"])
-        .agg(
-            annual_drug_cost=("RXXP22X", "sum"),
-            annual_drug_oop=("RXSF22X", "sum"),
-            weight=("PERWT22F", "first"),  # weight is person-level, same across fills
-        )
-        .reset_index()
-    )
+    person_condition = _person_costs(
+        df, ["DUPERSID", "condition"], "annual_drug_cost", "annual_drug_oop"
+    ).reset_index()
+    return summarise_condition_costs(person_condition)
+
 
+def summarise_condition_costs(person_condition: pd.DataFrame) -> dict:
+    """Weighted per-condition drug cost statistics from per-person totals."""
     result = {}
     for condition, group in person_condition.groupby("condition"):
         weights = group["weight"].values
@@ -191,27 +369,36 @@ def build_intervention_drug_costs(df: pd.DataFrame) -> dict:
 
     Uses RXDRGNAM substring matching to identify fills for each intervention.
     """
-    result = {}
-
-    for intervention, patterns in INTERVENTION_PATTERNS.items():
-        # Build regex pattern for this intervention
-        combined_pattern = "|".join(patterns)
-        mask = df["RXDRGNAM"].str.contains(combined_pattern, case=False, na=False)
-        intervention_fills = df[mask]
+    matcher = InterventionMatcher()
+    names = df["RXDRGNAM"].astype("category")
+    codes = names.cat.codes.to_numpy()
 
+    parts = []
+    for intervention, mask in matcher.category_masks(names.cat.categories).items():
+        intervention_fills = df[mask[codes]]
         if len(intervention_fills) == 0:
             continue
 
         # Sum costs per person (annual total)
-        person_costs = (
-            intervention_fills.groupby("DUPERSID")
-            .agg(
-                annual_cost=("RXXP22X", "sum"),
-                annual_oop=("RXSF22X", "sum"),
-                weight=("PERWT22F", "first"),
-            )
-            .reset_index()
-        )
+        person_costs = _person_costs(
+            intervention_fills, ["DUPERSID"], "annual_cost", "annual_oop"
+        ).reset_index()
+        person_costs["intervention"] = intervention
+        parts.append(person_costs)
+
+    if not parts:
+        return summarise_intervention_costs(pd.DataFrame(columns=["intervention"]))
+    return summarise_intervention_costs(pd.concat(parts, ignore_index=True))
+
+
+def summarise_intervention_costs(person_intervention: pd.DataFrame) -> dict:
+    """Weighted per-intervention drug cost statistics from per-person totals."""
+    result = {}
+
+    for intervention in INTERVENTION_PATTERNS:
+        person_costs = person_intervention[person_intervention["intervention"] == intervention]
+        if len(person_costs) == 0:
+            continue
 
         weights = person_costs["weight"].values
         costs = person_costs["annual_cost"].values
@@ -246,14 +433,15 @@ def process_and_save(csv_path: str | None = None, output_dir: str | None = None)
 
     os.makedirs(output_dir, exist_ok=True)
 
-    print("Loading H239 prescribed medicines data...")
-    df = load_raw_h239(csv_path)
-    print(f"  {len(df)} prescription fills after filtering to mapped TC1S1 codes")
-    print(f"  {df['DUPERSID'].nunique()} unique persons")
-    print(f"  {df['condition'].nunique()} conditions mapped")
+    print("Streaming H239 prescribed medicines data...")
+    aggregates = aggregate_h239(csv_path)
+    person_condition = aggregates["person_condition"]
+    print(f"  {aggregates['n_fills']} prescription fills after filtering to mapped TC1S1 codes")
+    print(f"  {person_condition['DUPERSID'].nunique()} unique persons")
+    print(f"  {person_condition['condition'].nunique()} conditions mapped")
 
     print("\nBuilding drug costs by condition...")
-    drug_costs = build_drug_costs_by_condition(df)
+    drug_costs = summarise_condition_costs(person_condition)
     drug_costs_path = os.path.join(output_dir, "drug_costs_by_condition.json")
     with open(drug_costs_path, "w") as f:
         json.dump(drug_costs, f, indent=2)
@@ -262,7 +450,7 @@ def process_and_save(csv_path: str | None = None, output_dir: str | None = None)
         print(f"    {cond:30s}  mean=${data['mean_drug_cost']:>8,.0f}  oop=${data['mean_drug_oop']:>6,.0f}  n={data['n_persons']}")
 
     print("\nBuilding intervention drug costs...")
-    intervention_costs = build_intervention_drug_costs(df)
+    intervention_costs = summarise_intervention_costs(aggregates["person_intervention"])
     intervention_path = os.path.join(output_dir, "intervention_drug_costs.json")
     with open(intervention_path, "w") as f:
         json.dump(intervention_costs, f, indent=2)
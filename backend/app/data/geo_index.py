@@ -0,0 +1,197 @@
+"""
+Geographic Index for Marketplace Rating
+
+Maps a ZIP code to the county, rating area and plan service areas that
+determine an exact marketplace premium. Built from three files in data/:
+
+- zip_county.csv      HUD USPS ZIP–county crosswalk (ZIP, COUNTY,
+                      USPS_ZIP_PREF_STATE, RES_RATIO); a ZIP split across
+                      counties is assigned to its majority-residential one
+- rating_areas.csv    CMS state rating-area definitions (StateCode, County,
+                      Zip3, RatingAreaId); most states define areas by county
+                      FIPS, a few by three-digit ZIP prefix (Zip3)
+- ServiceArea_PUF.csv CMS Service Area PUF (IssuerId, ServiceAreaId,
+                      StateCode, CoverEntireState, County, PartialCounty,
+                      ZipCodes)
+
+Everything is held as sorted integer arrays and resolved with binary
+search, so lookups are O(log n) and the index is a few MB nationwide.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+ZIP_COUNTY_FILE = "zip_county.csv"
+RATING_AREA_FILE = "rating_areas.csv"
+SERVICE_AREA_FILE = "ServiceArea_PUF.csv"
+
+
+def normalise_zip(zip_code: str) -> int:
+    """'02139' / '02139-4307' → 2139. Raises ValueError for anything else."""
+    m = re.fullmatch(r"\s*(\d{5})(?:-\d{4})?\s*", str(zip_code))
+    if not m:
+        raise ValueError(f"Invalid ZIP code: {zip_code!r}")
+    return int(m.group(1))
+
+
+def _rating_area_number(values: pd.Series) -> pd.Series:
+    """'Rating Area 12' → 12 (int16)."""
+    return values.astype(str).str.extract(r"(\d+)", expand=False).astype("int16")
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray, query, missing=-1):
+    """Binary-search `query` (scalar or array) in sorted `keys`; `missing` where absent."""
+    query = np.asarray(query, dtype=keys.dtype)
+    pos = np.searchsorted(keys, query)
+    pos = np.minimum(pos, max(len(keys) - 1, 0))
+    found = (keys[pos] == query) if len(keys) else np.zeros(query.shape, dtype=bool)
+    return np.where(found, values[pos] if len(keys) else missing, missing)
+
+
+def _contains(keys: np.ndarray, query: np.ndarray) -> np.ndarray:
+    if not len(keys):
+        return np.zeros(len(query), dtype=bool)
+    pos = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    return keys[pos] == query
+
+
+class GeoIndex:
+    """ZIP → (state, county, rating area) and service-area coverage lookups."""
+
+    def __init__(self, zip_county: pd.DataFrame, rating_areas: pd.DataFrame,
+                 service_areas: pd.DataFrame | None = None):
+        # ── ZIP → county / state ──
+        zc = zip_county.sort_values("RES_RATIO", ascending=False, kind="stable")
+        zc = zc.drop_duplicates("ZIP").sort_values("ZIP")
+        self.states = sorted(zc["USPS_ZIP_PREF_STATE"].dropna().unique().tolist())
+        state_code = {s: i for i, s in enumerate(self.states)}
+        self.zip_keys = zc["ZIP"].to_numpy(dtype=np.int32)
+        self.zip_county = zc["COUNTY"].to_numpy(dtype=np.int32)
+        self.zip_state = zc["USPS_ZIP_PREF_STATE"].map(state_code).to_numpy(dtype=np.int16)
+
+        # ── county / ZIP3 → rating area ──
+        ra = rating_areas.copy()
+        ra["area"] = _rating_area_number(ra["RatingAreaId"])
+        by_county = ra[ra["County"].notna()].drop_duplicates("County").sort_values("County")
+        self.county_keys = by_county["County"].to_numpy(dtype=np.int32)
+        self.county_area = by_county["area"].to_numpy(dtype=np.int16)
+        by_zip3 = ra[ra["Zip3"].notna()]
+        # Key by (state, zip3): prefixes are unique nationally, but keeping the
+        # state in the key guards against overlapping entries in hand-built files
+        zip3_keys = (by_zip3["StateCode"].map(state_code).fillna(-1).astype(np.int64) * 1000
+                     + by_zip3["Zip3"].astype(np.int64))
+        order = np.argsort(zip3_keys.to_numpy(), kind="stable")
+        self.zip3_keys = zip3_keys.to_numpy()[order]
+        self.zip3_area = by_zip3["area"].to_numpy(dtype=np.int16)[order]
+        self.zip3_states = set(by_zip3["StateCode"])
+
+        # ── service-area coverage ──
+        self.service_area_code: dict[tuple[str, str], int] = {}
+        self.whole_state_areas = np.zeros(0, dtype=np.int32)
+        self.county_cover = np.zeros(0, dtype=np.int64)
+        self.zip_cover = np.zeros(0, dtype=np.int64)
+        self.has_service_areas = service_areas is not None and not service_areas.empty
+        if self.has_service_areas:
+            self._index_service_areas(service_areas)
+
+    def _index_service_areas(self, sa: pd.DataFrame):
+        keys = list(zip(sa["IssuerId"].astype(str), sa["ServiceAreaId"].astype(str)))
+        for key in keys:
+            self.service_area_code.setdefault(key, len(self.service_area_code))
+        codes = np.array([self.service_area_code[k] for k in keys], dtype=np.int64)
+
+        whole = (sa["CoverEntireState"] == "Yes").to_numpy()
+        self.whole_state_areas = np.unique(codes[whole]).astype(np.int32)
+
+        county = pd.to_numeric(sa["County"], errors="coerce").to_numpy()
+        partial = (sa["PartialCounty"] == "Yes").to_numpy()
+        full_county = ~whole & ~partial & ~np.isnan(county)
+        self.county_cover = np.unique(codes[full_county] * 100_000 + county[full_county].astype(np.int64))
+
+        zip_pairs = []
+        for code, zips in zip(codes[partial], sa.loc[partial, "ZipCodes"]):
+            for z in re.findall(r"\d{5}", str(zips)):
+                zip_pairs.append(code * 100_000 + int(z))
+        self.zip_cover = np.unique(np.array(zip_pairs, dtype=np.int64))
+
+    def resolve(self, zip_code: str) -> dict | None:
+        """ZIP → {"zip", "state", "county", "rating_area"}, or None if unknown."""
+        z = normalise_zip(zip_code)
+        i = int(_lookup(self.zip_keys, np.arange(len(self.zip_keys)), z))
+        if i < 0:
+            return None
+        # Python int: an int16 state code times 1000 overflows from code 33
+        state_code = int(self.zip_state[i])
+        state = self.states[state_code]
+        county = int(self.zip_county[i])
+
+        if state in self.zip3_states:
+            area = int(_lookup(self.zip3_keys, self.zip3_area, state_code * 1000 + z // 100))
+        else:
+            area = int(_lookup(self.county_keys, self.county_area, county))
+        return {
+            "zip": f"{z:05d}",
+            "state": state,
+            "county": f"{county:05d}",
+            "rating_area": area if area >= 0 else None,
+        }
+
+    def service_area_codes(self, issuer_ids, service_area_ids) -> np.ndarray:
+        """Service-area code per plan (-1 when the pair is not in the Service Area PUF)."""
+        return np.array(
+            [self.service_area_code.get((str(i), str(s)), -1)
+             for i, s in zip(issuer_ids, service_area_ids)],
+            dtype=np.int32,
+        )
+
+    def covers(self, area_codes: np.ndarray, location: dict) -> np.ndarray:
+        """
+        Which plans (by service-area code) are offered at `location`.
+
+        Without a Service Area PUF, or for plans missing from it, every plan
+        is treated as available rather than hidden.
+        """
+        if not self.has_service_areas:
+            return np.ones(len(area_codes), dtype=bool)
+        codes = area_codes.astype(np.int64)
+        county, z = int(location["county"]), int(location["zip"])
+        return (
+            (area_codes < 0)
+            | _contains(self.whole_state_areas.astype(np.int64), codes)
+            | _contains(self.county_cover, codes * 100_000 + county)
+            | _contains(self.zip_cover, codes * 100_000 + z)
+        )
+
+
+def load_geo_index(data_dir: Path) -> GeoIndex | None:
+    """Build the index from data_dir, or None if the ZIP/rating-area files are absent."""
+    zip_path = data_dir / ZIP_COUNTY_FILE
+    area_path = data_dir / RATING_AREA_FILE
+    if not zip_path.exists() or not area_path.exists():
+        return None
+
+    zip_county = pd.read_csv(
+        zip_path, usecols=["ZIP", "COUNTY", "USPS_ZIP_PREF_STATE", "RES_RATIO"],
+        dtype={"ZIP": "int32", "COUNTY": "int32", "USPS_ZIP_PREF_STATE": "category",
+               "RES_RATIO": "float32"},
+    )
+    rating_areas = pd.read_csv(area_path, dtype=str)
+    for col in ("County", "Zip3"):
+        rating_areas[col] = pd.to_numeric(rating_areas.get(col), errors="coerce")
+
+    service_areas = None
+    sa_path = data_dir / SERVICE_AREA_FILE
+    if sa_path.exists():
+        service_areas = pd.read_csv(
+            sa_path, dtype=str, encoding="utf-8-sig",
+            usecols=["IssuerId", "ServiceAreaId", "StateCode", "CoverEntireState",
+                     "County", "PartialCounty", "ZipCodes", "MarketCoverage", "DentalOnlyPlan"],
+        )
+        service_areas = service_areas[
+            (service_areas["MarketCoverage"] == "Individual")
+            & (service_areas["DentalOnlyPlan"] == "No")
+        ]
+
+    return GeoIndex(zip_county, rating_areas, service_areas)
@@ -2,23 +2,25 @@
 ICD Mapping Processor
 
 Parses an ICD GEXF file to extract the mapping from matrix index (0-1079)
-to ICD-10 code and description.  Saves as processed/icd_mapping.json.
+to ICD-10 code and description.  Saves as processed/icd_mapping.json and
+a typed processed/icd_mapping.arrow artifact.
 
 Usage:
     cd backend && python -m app.data.icd_processor
 """
 
 import json
-import xml.etree.ElementTree as ET
+import pandas as pd
 from pathlib import Path
 
+from app.data.artifacts import write_table
+from app.data.comorbidity_processor import iter_gexf
+
 _GEXF_DIR = Path(__file__).resolve().parent.parent.parent.parent / (
     "data/ComorbidityNetworksData/4.Graphs-gexffiles"
 )
 _OUTPUT_DIR = Path(__file__).resolve().parent / "processed"
 
-_NS = {"gexf": "http://www.gexf.net/1.3"}
-
 # Use any ICD GEXF file — they all have the same 1080 nodes
 _REFERENCE_FILE = "Graph_Female_ICD_Age_1.gexf"
 
@@ -28,19 +30,17 @@ def extract_icd_mapping() -> list[dict]:
     Parse an ICD GEXF file and return a list of 1080 entries:
         [{"index": 0, "icd_code": "A00", "description": "Cholera"}, ...]
     Sorted by index (0-based, matching CSV column order).
+
+    The file is streamed and parsing stops at the first edge — the node list
+    precedes the (much larger) edge list in GEXF.
     """
     filepath = _GEXF_DIR / _REFERENCE_FILE
-    tree = ET.parse(filepath)
-    root = tree.getroot()
 
-    nodes = root.findall(".//gexf:node", _NS)
     mapping = []
-    for node in nodes:
-        idx = int(node.get("id")) - 1  # GEXF ids are 1-based, CSV columns are 0-based
-        label = node.get("label")
-        atts = {}
-        for av in node.findall(".//gexf:attvalue", _NS):
-            atts[av.get("for")] = av.get("value")
+    for kind, node_id, label, atts in iter_gexf(filepath):
+        if kind == "edge":
+            break
+        idx = int(node_id) - 1  # GEXF ids are 1-based, CSV columns are 0-based
         mapping.append({
             "index": idx,
             "icd_code": label,
@@ -51,6 +51,12 @@ def extract_icd_mapping() -> list[dict]:
     return mapping
 
 
+def save_mapping_artifact(mapping: list[dict], output_dir: Path | None = None):
+    """Write the ICD mapping as a typed Arrow artifact (int16 index column)."""
+    df = pd.DataFrame(mapping, columns=["index", "icd_code", "description"])
+    return write_table(df, "icd_mapping", output_dir or _OUTPUT_DIR, dtypes={"index": "int16"})
+
+
 def main():
     print("ICD Mapping Processor")
     print(f"  GEXF directory: {_GEXF_DIR}")
@@ -68,10 +74,11 @@ def main():
     output_path = _OUTPUT_DIR / "icd_mapping.json"
     with open(output_path, "w") as f:
         json.dump(mapping, f, indent=2)
+    arrow_path = save_mapping_artifact(mapping)
 
     print(f"Extracted {len(mapping)} ICD codes")
     print(f"Range: {mapping[0]['icd_code']} – {mapping[-1]['icd_code']}")
-    print(f"Output: {output_path}")
+    print(f"Output: {output_path}, {arrow_path}")
 
 
 if __name__ == "__main__":
@@ -2,65 +2,81 @@
 MEPS Data Loader
 
 Loads the pre-processed MEPS cost tables (generated by meps_processor.py)
-and provides query functions for the simulation engine.
+and provides query functions for the simulation engine. The stratified cost
+table is read from its Arrow artifact when one exists, else from CSV.
 
-Data is loaded once at module import and cached in memory.
+Data is loaded on first access and held by the current data snapshot
+(see snapshot.py), so it can be reloaded without restarting the worker.
 """
 
 import json
 import pandas as pd
 from pathlib import Path
-from functools import lru_cache
 
-_DATA_DIR = Path(__file__).resolve().parent / "processed"
-
-# ── Load processed data at import time ──
-
-_cost_table: pd.DataFrame | None = None
-_condition_summary: dict | None = None
-_comorbidity_costs: dict | None = None
-_drug_costs_by_condition: dict | None = None
-_intervention_drug_costs: dict | None = None
+from app.data import snapshot
+from app.data.artifacts import has_artifact, read_frame
 
+_DATA_DIR = Path(__file__).resolve().parent / "processed"
 
-def _ensure_loaded():
-    """Lazy-load processed data on first access."""
-    global _cost_table, _condition_summary, _comorbidity_costs
-    global _drug_costs_by_condition, _intervention_drug_costs
-
-    if _condition_summary is not None:
-        return
+_COSTS_PATH = _DATA_DIR / "condition_costs.csv"
+_SUMMARY_PATH = _DATA_DIR / "condition_summary.json"
+_COMORBIDITY_PATH = _DATA_DIR / "comorbidity_costs.json"
+_DRUG_COSTS_PATH = _DATA_DIR / "drug_costs_by_condition.json"
+_INTERVENTION_COSTS_PATH = _DATA_DIR / "intervention_drug_costs.json"
 
-    costs_path = _DATA_DIR / "condition_costs.csv"
-    summary_path = _DATA_DIR / "condition_summary.json"
-    comorbidity_path = _DATA_DIR / "comorbidity_costs.json"
-    drug_costs_path = _DATA_DIR / "drug_costs_by_condition.json"
-    intervention_costs_path = _DATA_DIR / "intervention_drug_costs.json"
 
-    if not summary_path.exists():
+def _load() -> dict:
+    """Load the processed MEPS tables into a fresh dict (one snapshot's worth)."""
+    if not _SUMMARY_PATH.exists():
         raise FileNotFoundError(
             f"Processed MEPS data not found at {_DATA_DIR}. "
             "Run: python -m app.data.meps_processor"
         )
 
-    _cost_table = pd.read_csv(costs_path)
-    with open(summary_path) as f:
-        _condition_summary = json.load(f)
-    with open(comorbidity_path) as f:
-        _comorbidity_costs = json.load(f)
+    # Prefer the typed Arrow artifact (memory-mapped, no text parsing). A
+    # version or hash mismatch raises rather than silently serving the CSV.
+    if has_artifact("condition_costs", _DATA_DIR):
+        cost_table = read_frame("condition_costs", _DATA_DIR)
+    else:
+        cost_table = pd.read_csv(_COSTS_PATH)
+    with open(_SUMMARY_PATH) as f:
+        condition_summary = json.load(f)
+    with open(_COMORBIDITY_PATH) as f:
+        comorbidity_costs = json.load(f)
 
     # Load H239 drug cost data (optional — generated by drug_cost_processor.py)
-    if drug_costs_path.exists():
-        with open(drug_costs_path) as f:
-            _drug_costs_by_condition = json.load(f)
-    else:
-        _drug_costs_by_condition = {}
+    drug_costs_by_condition = {}
+    if _DRUG_COSTS_PATH.exists():
+        with open(_DRUG_COSTS_PATH) as f:
+            drug_costs_by_condition = json.load(f)
+
+    intervention_drug_costs = {}
+    if _INTERVENTION_COSTS_PATH.exists():
+        with open(_INTERVENTION_COSTS_PATH) as f:
+            intervention_drug_costs = json.load(f)
+
+    return {
+        "cost_table": cost_table,
+        "condition_summary": condition_summary,
+        "comorbidity_costs": comorbidity_costs,
+        "drug_costs_by_condition": drug_costs_by_condition,
+        "intervention_drug_costs": intervention_drug_costs,
+    }
+
+
+def _sources() -> list[Path]:
+    return [
+        _COSTS_PATH, _DATA_DIR / "condition_costs.arrow", _SUMMARY_PATH,
+        _COMORBIDITY_PATH, _DRUG_COSTS_PATH, _INTERVENTION_COSTS_PATH,
+    ]
 
-    if intervention_costs_path.exists():
-        with open(intervention_costs_path) as f:
-            _intervention_drug_costs = json.load(f)
-    else:
-        _intervention_drug_costs = {}
+
+snapshot.register("meps", _load, _sources)
+
+
+def _data() -> dict:
+    """The MEPS tables of the current data snapshot (loaded on first access)."""
+    return snapshot.get("meps")
 
 
 def _age_to_group(age: int) -> str:
@@ -109,18 +125,19 @@ def query_cost(
 
     Falls back to unstratified summary if the stratified cell is too thin.
     """
-    _ensure_loaded()
+    data = _data()
+    cost_table = data["cost_table"]
 
     age_group = _age_to_group(age)
     sex_val = sex.upper()[:1]
     ins_type = _insurance_to_type(insurance_type)
 
     # Try stratified lookup first
-    match = _cost_table[
-        (_cost_table["condition"] == condition)
-        & (_cost_table["age_group"] == age_group)
-        & (_cost_table["sex"] == sex_val)
-        & (_cost_table["insurance_type"] == ins_type)
+    match = cost_table[
+        (cost_table["condition"] == condition)
+        & (cost_table["age_group"] == age_group)
+        & (cost_table["sex"] == sex_val)
+        & (cost_table["insurance_type"] == ins_type)
     ]
 
     if len(match) > 0 and match.iloc[0]["n"] >= 10:
@@ -136,10 +153,10 @@ def query_cost(
         }
 
     # Fallback: try relaxing sex
-    match = _cost_table[
-        (_cost_table["condition"] == condition)
-        & (_cost_table["age_group"] == age_group)
-        & (_cost_table["insurance_type"] == ins_type)
+    match = cost_table[
+        (cost_table["condition"] == condition)
+        & (cost_table["age_group"] == age_group)
+        & (cost_table["insurance_type"] == ins_type)
     ]
     if len(match) > 0:
         return {
@@ -153,8 +170,8 @@ def query_cost(
         }
 
     # Final fallback: unstratified summary
-    if condition in _condition_summary:
-        s = _condition_summary[condition]
+    if condition in data["condition_summary"]:
+        s = data["condition_summary"][condition]
         return {
             "mean_total_exp": s["mean_total_exp"],
             "median_total_exp": s["median_total_exp"],
@@ -170,8 +187,7 @@ def query_cost(
 
 def get_condition_summary(condition: str) -> dict | None:
     """Get the unstratified cost summary for a condition."""
-    _ensure_loaded()
-    return _condition_summary.get(condition)
+    return _data()["condition_summary"].get(condition)
 
 
 def get_comorbidity_cost(condition_a: str, condition_b: str) -> dict | None:
@@ -179,19 +195,18 @@ def get_comorbidity_cost(condition_a: str, condition_b: str) -> dict | None:
     Get the combined cost data for two co-occurring conditions.
     Order doesn't matter.
     """
-    _ensure_loaded()
+    comorbidity_costs = _data()["comorbidity_costs"]
 
     # Try both orderings of the pair key
     for key in [f"{condition_a}_{condition_b}", f"{condition_b}_{condition_a}"]:
-        if key in _comorbidity_costs:
-            return _comorbidity_costs[key]
+        if key in comorbidity_costs:
+            return comorbidity_costs[key]
     return None
 
 
 def get_all_conditions() -> list[str]:
     """Return list of all conditions we have MEPS data for."""
-    _ensure_loaded()
-    return list(_condition_summary.keys())
+    return list(_data()["condition_summary"].keys())
 
 
 def query_drug_cost(condition: str) -> dict | None:
@@ -201,8 +216,7 @@ def query_drug_cost(condition: str) -> dict | None:
     Returns dict with keys: mean_drug_cost, mean_drug_oop, median_drug_cost,
     n_persons — or None if no drug cost data exists for this condition.
     """
-    _ensure_loaded()
-    return _drug_costs_by_condition.get(condition)
+    return _data()["drug_costs_by_condition"].get(condition)
 
 
 def query_intervention_cost(intervention: str) -> dict | None:
@@ -212,5 +226,4 @@ def query_intervention_cost(intervention: str) -> dict | None:
     Returns dict with keys: mean_annual_cost, mean_annual_oop,
     median_annual_cost, n_persons — or None if not found.
     """
-    _ensure_loaded()
-    return _intervention_drug_costs.get(intervention)
+    return _data()["intervention_drug_costs"].get(intervention)
@@ -12,6 +12,7 @@ The MEPS Full Year Consolidated file contains:
 
 This processor builds two artifacts:
 1. Per-condition cost stats stratified by age_group × sex × insurance_type
+   (condition_costs.csv, plus a typed condition_costs.arrow for the loader)
 2. Comorbidity cost multipliers for common condition pairs
 
 Run directly to regenerate:
@@ -24,6 +25,8 @@ import numpy as np
 import json
 from pathlib import Path
 
+from app.data.artifacts import write_table
+
 # ── MEPS column name → our internal condition name ──
 # These are the "priority condition" diagnosis flags in HC-233.
 # Each is a binary: 1 = diagnosed, 2 = not diagnosed, negative = inapplicable.
@@ -212,6 +215,22 @@ def build_comorbidity_costs(df: pd.DataFrame) -> dict:
     return result
 
 
+def save_cost_table_artifact(cost_table: pd.DataFrame, output_dir: str | None = None):
+    """
+    Write the stratified cost table as a typed Arrow artifact.
+
+    condition, age_group, sex and insurance_type are dictionary-encoded;
+    meps_loader memory-maps this instead of re-parsing condition_costs.csv.
+    """
+    return write_table(
+        cost_table,
+        "condition_costs",
+        output_dir,
+        dictionary_columns=("condition", "age_group", "sex", "insurance_type"),
+        dtypes={"n": "int32"},
+    )
+
+
 def process_and_save(csv_path: str | None = None, output_dir: str | None = None):
     """Run the full pipeline and save processed data."""
     if output_dir is None:
@@ -228,6 +247,8 @@ def process_and_save(csv_path: str | None = None, output_dir: str | None = None)
     cost_path = os.path.join(output_dir, "condition_costs.csv")
     cost_table.to_csv(cost_path, index=False)
     print(f"  {len(cost_table)} rows → {cost_path}")
+    arrow_path = save_cost_table_artifact(cost_table, output_dir)
+    print(f"  {len(cost_table)} rows → {arrow_path}")
 
     print("Building condition summary...")
     summary = build_condition_summary(df)
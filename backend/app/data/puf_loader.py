@@ -4,18 +4,43 @@ CMS Marketplace PUF Data Loader
 Loads plan_attributes_PUF.csv and Rate_PUF.csv from data/,
 provides search and lookup functions for marketplace plan comparison.
 
-Data is lazy-loaded on first access and cached in memory.
+The aggregated (PlanId, StateCode, RatingArea, Age) → monthly premium
+index is cached as a compact Arrow artifact in data/puf_cache/ and rebuilt
+only when the content hash of Rate_PUF.csv changes. With the ZIP and
+rating-area files present (see geo_index.py), searches can be priced for
+the user's exact rating area instead of the state average.
+
+Every CSR variant (73/87/94% AV silver, Zero/Limited cost sharing) of every
+loaded plan year is indexed by (plan_id, year, variant); earlier years sit
+next to the current file as plan_attributes_PUF_<year>.csv. Premiums are
+for the latest year.
+
+Households are quoted with price_household(): member premiums are summed
+under the ACA family rating rules (or the plan's family-tier rate where a
+state uses them) and expected costs run against the family deductible and
+out-of-pocket limits.
+
+Data is lazy-loaded on first access and held by the current data snapshot
+(see snapshot.py), so a new plan year can be loaded without a restart.
 """
 
+import base64
+import hashlib
+import json
 import re
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Iterator
 
-_DATA_DIR = Path(__file__).resolve().parent.parent.parent.parent / "data"
+from app.data import snapshot
+from app.data.artifacts import ArtifactVersionError, has_artifact, read_table, table_metadata, write_table
+from app.data.geo_index import GeoIndex, load_geo_index
 
-# Module-level caches
-_plan_attrs: pd.DataFrame | None = None
-_rate_index: pd.DataFrame | None = None
+_DATA_DIR = Path(__file__).resolve().parent.parent.parent.parent / "data"
+_RATE_PATH = _DATA_DIR / "Rate_PUF.csv"
+_CACHE_DIR = _DATA_DIR / "puf_cache"
 
 
 def _parse_dollars(val: str) -> float | None:
@@ -38,54 +63,124 @@ def _parse_coinsurance(val: str) -> float | None:
     return None
 
 
-def _load_plan_attributes() -> pd.DataFrame:
-    """Load and parse plan_attributes_PUF.csv."""
-    cols = [
-        "StandardComponentId", "PlanMarketingName",
-        "IssuerMarketPlaceMarketingName", "MetalLevel", "PlanType",
+# CSR variants, in variant-index order. Silver plans are offered to
+# income-eligible enrollees at 94/87/73% actuarial value (100-150/150-200/
+# 200-250% FPL); Zero and Limited cost sharing are for AI/AN enrollees.
+VARIANTS = ["standard", "csr73", "csr87", "csr94", "zero", "limited"]
+_VARIANT_OF = {variant: i for i, variant in enumerate(VARIANTS)}
+
+
+def _variant_of(csr_type) -> str | None:
+    """CSRVariationType → VARIANTS key ('73% AV Level Silver Plan' → 'csr73'); None if unknown."""
+    if not isinstance(csr_type, str):
+        return None
+    if csr_type.startswith("Standard"):
+        return "standard"
+    if csr_type.startswith("Zero Cost"):
+        return "zero"
+    if csr_type.startswith("Limited Cost"):
+        return "limited"
+    m = re.search(r"(73|87|94)\s*(?:%|percent)", csr_type)
+    return f"csr{m.group(1)}" if m else None
+
+
+def csr_variant_for_income(income_fpl_pct: float | None) -> str:
+    """Silver CSR variant an enrollee qualifies for by household income (% of FPL)."""
+    if income_fpl_pct is None or income_fpl_pct > 250:
+        return "standard"
+    if income_fpl_pct <= 150:
+        return "csr94"
+    if income_fpl_pct <= 200:
+        return "csr87"
+    return "csr73"
+
+
+def _parse_category(values: pd.Series, parse) -> np.ndarray:
+    """Parse a categorical string column once per distinct value (NaN where unparseable)."""
+    parsed = [parse(text) for text in values.cat.categories]
+    lookup = np.array([np.nan if v is None else v for v in parsed] + [np.nan], dtype=np.float64)
+    return lookup[values.cat.codes.to_numpy()]
+
+
+def _plan_attribute_paths() -> list[Path]:
+    """The current plan_attributes_PUF.csv plus earlier years kept as plan_attributes_PUF_<year>.csv."""
+    return [_DATA_DIR / "plan_attributes_PUF.csv", *sorted(_DATA_DIR.glob("plan_attributes_PUF_*.csv"))]
+
+
+def _read_plan_attributes(path: Path) -> pd.DataFrame:
+    """Parse one plan_attributes_PUF file: every CSR variant of each medical individual plan."""
+    text_cols = ["StandardComponentId", "PlanMarketingName"]
+    coded_cols = [
+        "BusinessYear", "IssuerMarketPlaceMarketingName", "MetalLevel", "PlanType",
         "DentalOnlyPlan", "MarketCoverage", "CSRVariationType",
         "TEHBDedInnTier1Individual", "TEHBInnTier1IndividualMOOP",
         "TEHBDedInnTier1Coinsurance", "IsHSAEligible", "StateCode",
+        "IssuerId", "ServiceAreaId",
+        "TEHBDedInnTier1FamilyPerPerson", "TEHBDedInnTier1FamilyPerGroup",
+        "TEHBInnTier1FamilyPerPersonMOOP", "TEHBInnTier1FamilyPerGroupMOOP",
     ]
-    path = _DATA_DIR / "plan_attributes_PUF.csv"
-    df = pd.read_csv(path, usecols=cols, dtype=str, encoding="utf-8-sig")
+    # Every column but the ids repeats heavily: read them as categoricals so
+    # several years of all variants stay small, and parse each distinct value once
+    df = pd.read_csv(path, usecols=text_cols + coded_cols, encoding="utf-8-sig",
+                     dtype={**{c: str for c in text_cols}, **{c: "category" for c in coded_cols}})
 
-    # Filter: medical individual plans, standard (non-CSR) variants only
-    df = df[df["DentalOnlyPlan"] == "No"]
-    df = df[df["MarketCoverage"] == "Individual"]
-    df = df[df["CSRVariationType"].str.startswith("Standard", na=False)]
+    # Filter: medical individual plans
+    df = df[(df["DentalOnlyPlan"] == "No") & (df["MarketCoverage"] == "Individual")]
 
-    # Deduplicate: same plan appears as both On/Off Exchange variants
-    df = df.drop_duplicates(subset=["StandardComponentId"], keep="first")
+    variant = df["CSRVariationType"].map(_variant_of).astype(object)
+    df = df.assign(variant=variant.to_numpy())
+    df = df[df["variant"].notna()]
+    # Deduplicate: the standard variant appears as both On/Off Exchange plans
+    df = df.drop_duplicates(subset=["StandardComponentId", "BusinessYear", "variant"], keep="first")
 
     # Parse dollar / percentage fields
-    df["deductible"] = df["TEHBDedInnTier1Individual"].apply(_parse_dollars)
-    df["oop_max"] = df["TEHBInnTier1IndividualMOOP"].apply(_parse_dollars)
-    df["coinsurance"] = df["TEHBDedInnTier1Coinsurance"].apply(_parse_coinsurance)
+    out = pd.DataFrame({
+        "plan_id": df["StandardComponentId"].to_numpy(),
+        "year": pd.to_numeric(df["BusinessYear"].astype(str), errors="coerce").fillna(0).astype(np.int16).to_numpy(),
+        "variant": df["variant"].to_numpy(),
+        "plan_name": df["PlanMarketingName"].to_numpy(),
+        "issuer": df["IssuerMarketPlaceMarketingName"].astype(str).to_numpy(),
+        # Clean up metal level capitalization
+        "metal_level": df["MetalLevel"].astype(str).str.strip().str.title().to_numpy(),
+        "plan_type": df["PlanType"].astype(str).to_numpy(),
+        "state": df["StateCode"].astype(str).to_numpy(),
+        "deductible": _parse_category(df["TEHBDedInnTier1Individual"], _parse_dollars),
+        "oop_max": _parse_category(df["TEHBInnTier1IndividualMOOP"], _parse_dollars),
+        "coinsurance": _parse_category(df["TEHBDedInnTier1Coinsurance"], _parse_coinsurance),
+        "is_hsa_eligible": df["IsHSAEligible"].astype(str).to_numpy(),
+        "issuer_id": df["IssuerId"].astype(str).to_numpy(),
+        "service_area_id": df["ServiceAreaId"].astype(str).to_numpy(),
+        "family_deductible_per_person": _parse_category(df["TEHBDedInnTier1FamilyPerPerson"], _parse_dollars),
+        "family_deductible": _parse_category(df["TEHBDedInnTier1FamilyPerGroup"], _parse_dollars),
+        "family_oop_max_per_person": _parse_category(df["TEHBInnTier1FamilyPerPersonMOOP"], _parse_dollars),
+        "family_oop_max": _parse_category(df["TEHBInnTier1FamilyPerGroupMOOP"], _parse_dollars),
+    })
 
     # Defaults for missing values
-    df["deductible"] = df["deductible"].fillna(0.0)
-    df["oop_max"] = df["oop_max"].fillna(8700.0)
-    df["coinsurance"] = df["coinsurance"].fillna(0.20)
-
-    # Rename for cleaner access
-    df = df.rename(columns={
-        "StandardComponentId": "plan_id",
-        "PlanMarketingName": "plan_name",
-        "IssuerMarketPlaceMarketingName": "issuer",
-        "MetalLevel": "metal_level",
-        "PlanType": "plan_type",
-        "StateCode": "state",
-        "IsHSAEligible": "is_hsa_eligible",
-    })
+    out["deductible"] = out["deductible"].fillna(0.0)
+    out["oop_max"] = out["oop_max"].fillna(8700.0)
+    out["coinsurance"] = out["coinsurance"].fillna(0.20)
+    # Family limits default to the ACA norm: individual amount per person, twice that per family
+    out["family_deductible_per_person"] = out["family_deductible_per_person"].fillna(out["deductible"])
+    out["family_deductible"] = out["family_deductible"].fillna(2 * out["deductible"])
+    out["family_oop_max_per_person"] = out["family_oop_max_per_person"].fillna(out["oop_max"])
+    out["family_oop_max"] = out["family_oop_max"].fillna(2 * out["oop_max"])
 
-    # Clean up metal level capitalization
-    df["metal_level"] = df["metal_level"].str.strip().str.title()
+    for col in ("variant", "issuer", "metal_level", "plan_type", "state",
+                "is_hsa_eligible", "issuer_id", "service_area_id"):
+        out[col] = out[col].astype("category")
+    return out
 
-    df = df[["plan_id", "plan_name", "issuer", "metal_level", "plan_type",
-             "state", "deductible", "oop_max", "coinsurance", "is_hsa_eligible"]]
 
-    return df.reset_index(drop=True)
+def _load_plan_attributes() -> pd.DataFrame:
+    """Load every plan year and CSR variant; one row per (plan_id, year, variant)."""
+    frames = [_read_plan_attributes(path) for path in _plan_attribute_paths() if path.exists()]
+    df = pd.concat(frames, ignore_index=True)
+    for col in ("variant", "issuer", "metal_level", "plan_type", "state",
+                "is_hsa_eligible", "issuer_id", "service_area_id"):
+        df[col] = df[col].astype("category")
+    # A plan year present in two files: the current file (listed first) wins
+    return df.drop_duplicates(subset=["plan_id", "year", "variant"], keep="first").reset_index(drop=True)
 
 
 def _age_to_rate_age(age: int) -> str:
@@ -98,123 +193,992 @@ def _age_to_rate_age(age: int) -> str:
         return str(age)
 
 
-def _load_rate_index() -> pd.DataFrame:
-    """Load Rate_PUF.csv in chunks, average premiums per (PlanId, Age)."""
-    path = _DATA_DIR / "Rate_PUF.csv"
-    cols = ["PlanId", "StateCode", "Age", "Tobacco", "IndividualRate"]
+# Family-tier rate columns of the "Family Option" rows (states that rate by
+# household composition instead of per-member age), in tier order
+FAMILY_TIERS = [
+    "IndividualRate", "Couple",
+    "PrimarySubscriberAndOneDependent", "PrimarySubscriberAndTwoDependents",
+    "PrimarySubscriberAndThreeOrMoreDependents",
+    "CoupleAndOneDependent", "CoupleAndTwoDependents", "CoupleAndThreeOrMoreDependents",
+]
+
 
-    chunks = []
+def _aggregate_rates(path: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Stream Rate_PUF.csv in chunks and return two tables:
+
+    - age-rated premiums averaged per (PlanId, StateCode, rating area, Age);
+      `n` counts the source rows behind each mean (e.g. quarterly rate
+      filings), so state-level averages can be weighted exactly as before
+    - family-tier premiums ("Family Option" rows) averaged per
+      (PlanId, StateCode, rating area), one column per FAMILY_TIERS entry
+    """
+    cols = ["PlanId", "StateCode", "RatingAreaId", "Age", "Tobacco"] + FAMILY_TIERS
+
+    chunks, family_chunks = [], []
     for chunk in pd.read_csv(path, usecols=cols, dtype=str,
                              chunksize=200_000, encoding="utf-8-sig"):
-        # Filter out tobacco-specific rows and family option
+        # Filter out tobacco-specific rows
         chunk = chunk[chunk["Tobacco"] != "Tobacco User/Non-Tobacco User"]
+        # "Rating Area 12" → 12
+        chunk["rating_area"] = pd.to_numeric(
+            chunk["RatingAreaId"].str.extract(r"(\d+)", expand=False), errors="coerce"
+        ).fillna(0)
+
+        family = chunk[chunk["Age"] == "Family Option"]
+        family = family[["PlanId", "StateCode", "rating_area"] + FAMILY_TIERS].copy()
+        for col in FAMILY_TIERS:
+            family[col] = pd.to_numeric(family[col], errors="coerce")
+        family_chunks.append(family.dropna(subset=FAMILY_TIERS, how="all"))
+
         chunk = chunk[chunk["Age"] != "Family Option"]
         chunk["IndividualRate"] = pd.to_numeric(chunk["IndividualRate"],
                                                 errors="coerce")
         chunk = chunk.dropna(subset=["IndividualRate"])
-        chunks.append(chunk[["PlanId", "StateCode", "Age", "IndividualRate"]])
+        chunks.append(chunk[["PlanId", "StateCode", "rating_area", "Age", "IndividualRate"]])
 
     df = pd.concat(chunks, ignore_index=True)
+    df = df.groupby(["PlanId", "StateCode", "rating_area", "Age"], as_index=False).agg(
+        monthly_premium=("IndividualRate", "mean"),
+        n=("IndividualRate", "size"),
+    )
+
+    family = pd.concat(family_chunks, ignore_index=True)
+    family = family.groupby(["PlanId", "StateCode", "rating_area"], as_index=False)[FAMILY_TIERS].mean()
+
+    return df, family
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_info(path: Path, sha256: str | None = None) -> dict:
+    st = path.stat()
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": sha256 or _file_sha256(path),
+    }
+
+
+def _cache_matches(cached: dict, path: Path) -> bool:
+    """
+    Whether a cached index was built from the current source file.
+
+    An unchanged (size, mtime) is trusted without re-hashing the CSV; a
+    touched file is re-hashed and still matches if its content is the same.
+    """
+    st = path.stat()
+    if cached.get("size") == st.st_size and cached.get("mtime_ns") == st.st_mtime_ns:
+        return True
+    return cached.get("size") == st.st_size and cached.get("sha256") == _file_sha256(path)
 
-    # Average across rating areas per (PlanId, Age)
-    df = df.groupby(["PlanId", "StateCode", "Age"], as_index=False).agg(
-        monthly_premium=("IndividualRate", "mean")
+
+def build_rate_index(path: Path | None = None, cache_dir: Path | None = None) -> Path:
+    """
+    Aggregate Rate_PUF.csv and write the rate_index (categorical codes,
+    int16 areas, float32 premium) and family_rate_index artifacts.
+    """
+    path = Path(path or _RATE_PATH)
+    cache_dir = cache_dir or _CACHE_DIR
+    source = _source_info(path)
+    df, family = _aggregate_rates(path)
+    write_table(
+        family,
+        "family_rate_index",
+        cache_dir,
+        dictionary_columns=("PlanId", "StateCode"),
+        dtypes={"rating_area": "int16", **{col: "float32" for col in FAMILY_TIERS}},
+        metadata={"source": source},
+    )
+    # Written last: its source metadata marks the pair as complete
+    return write_table(
+        df,
+        "rate_index",
+        cache_dir,
+        dictionary_columns=("PlanId", "StateCode", "Age"),
+        dtypes={"rating_area": "int16", "monthly_premium": "float32", "n": "int16"},
+        metadata={"source": source},
     )
-    df["monthly_premium"] = df["monthly_premium"].round(2)
 
-    return df
 
+def _read_cached(name: str, source: Path | None = None) -> pd.DataFrame | None:
+    """
+    A cached PUF artifact built from the current `source` CSV (default
+    Rate_PUF.csv), or None if stale or missing.
+    """
+    if not has_artifact(name, _CACHE_DIR):
+        return None
+    try:
+        table = read_table(name, _CACHE_DIR)
+    except ArtifactVersionError:
+        return None
+    if not _cache_matches(table_metadata(table).get("source", {}), source or _RATE_PATH):
+        return None
+    return table.to_pandas()
+
+
+def _load_rate_index() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Load the premium indexes from their cached artifacts, rebuilding them if Rate_PUF.csv changed."""
+    rates, family = _read_cached("rate_index"), _read_cached("family_rate_index")
+    if rates is None or family is None:
+        build_rate_index()
+        rates, family = _read_cached("rate_index"), _read_cached("family_rate_index")
+    return rates, family
+
+
+# Rate PUF age bands, in premium-matrix column order
+RATE_AGES = ["0-14"] + [str(a) for a in range(15, 64)] + ["64 and over"]
+_RATE_AGE_BAND = {age: i for i, age in enumerate(RATE_AGES)}
 
-def _ensure_loaded():
-    """Lazy-load both PUF files on first access."""
-    global _plan_attrs, _rate_index
+# Key multiplier for (plan row, rating area) pairs; CMS rating areas are < 100 per state
+_AREA_KEY = 256
 
-    if _plan_attrs is not None:
-        return
+# Output fields of a plan dict, in order
+PLAN_FIELDS = [
+    "plan_id", "plan_name", "issuer", "metal_level", "plan_type",
+    "deductible", "oop_max", "coinsurance", "monthly_premium", "is_hsa_eligible",
+]
 
-    _plan_attrs = _load_plan_attributes()
-    _rate_index = _load_rate_index()
+
+class PlanIndex:
+    """
+    Array-backed plan and premium lookups, built once per snapshot.
+
+    Plans are stored column-wise, grouped by state, so a state is a
+    contiguous row range. State-average premiums live in a dense
+    (plan × age band) float32 matrix (NaN = not rated), and each state's
+    rows are pre-sorted by premium for every age band — a search is a
+    slice, a gather and a mask, with no DataFrame scans.
+
+    Rating-area premiums are kept sparse: a sorted int32 key per
+    (plan row, rating area) and a matching (key × age band) float32 matrix,
+    found by binary search. Family-tier rates use the same layout with one
+    column per FAMILY_TIERS entry; rating area 0 holds the state average.
+    """
+
+    def __init__(self, plan_attrs: pd.DataFrame, rate_index: pd.DataFrame,
+                 family_rates: pd.DataFrame, geo: GeoIndex | None = None):
+        plans = plan_attrs.sort_values("state", kind="stable", key=lambda s: s.astype(str))
+        plans = plans.reset_index(drop=True)
+        n = len(plans)
+
+        # Low-cardinality strings stay dictionary-encoded (pandas Categorical)
+        self.columns = {
+            "plan_id": plans["plan_id"].to_numpy(dtype=object),
+            "plan_name": plans["plan_name"].to_numpy(dtype=object),
+            "issuer": _categorical(plans["issuer"]),
+            "metal_level": _categorical(plans["metal_level"]),
+            "plan_type": _categorical(plans["plan_type"]),
+            "deductible": plans["deductible"].to_numpy(dtype=np.float64),
+            "oop_max": plans["oop_max"].to_numpy(dtype=np.float64),
+            "coinsurance": plans["coinsurance"].to_numpy(dtype=np.float64),
+            "is_hsa_eligible": (plans["is_hsa_eligible"] == "Yes").to_numpy(),
+        }
+        self.family = {
+            col: plans[col].to_numpy(dtype=np.float64)
+            for col in ("family_deductible_per_person", "family_deductible",
+                        "family_oop_max_per_person", "family_oop_max")
+        }
+        self.metal_lower = _categorical(plans["metal_level"].astype(str).str.lower())
+        self.state = plans["state"].to_numpy(dtype=object)
+
+        # plan_id → row (first occurrence wins, as with the old .iloc[0])
+        self.row_of: dict[str, int] = {}
+        for i, plan_id in enumerate(self.columns["plan_id"]):
+            self.row_of.setdefault(plan_id, i)
+
+        # state → (start, stop) row range
+        self.state_ranges: dict[str, tuple[int, int]] = {}
+        states, starts = np.unique(self.state.astype(str), return_index=True)
+        bounds = list(starts) + [n]
+        for k, st in enumerate(states):
+            self.state_ranges[st] = (int(bounds[k]), int(bounds[k + 1]))
+
+        # Only rates quoted in the plan's own state count
+        rows = rate_index["PlanId"].astype(object).map(self.row_of)
+        bands = rate_index["Age"].astype(object).map(_RATE_AGE_BAND)
+        valid = rows.notna() & bands.notna()
+        rates = rate_index[valid]
+        rows = rows[valid].to_numpy(dtype=np.int64)
+        bands = bands[valid].to_numpy(dtype=np.int64)
+        keep = self.state[rows] == rates["StateCode"].astype(object).to_numpy()
+        rows, bands, rates = rows[keep], bands[keep], rates[keep]
+        premium = rates["monthly_premium"].to_numpy(dtype=np.float64)
+        count = rates["n"].to_numpy(dtype=np.float64)
+        areas = rates["rating_area"].to_numpy(dtype=np.int64)
+
+        # State average: mean over every source row, across rating areas.
+        # mean × n is a sum of whole-cent rates, so rounding it undoes the
+        # float32 storage error and half-cent means round exactly as before.
+        sums = np.zeros((n, len(RATE_AGES)))
+        counts = np.zeros((n, len(RATE_AGES)))
+        np.add.at(sums, (rows, bands), np.round(premium * count, 2))
+        np.add.at(counts, (rows, bands), count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.premiums = np.round(sums / counts, 2).astype(np.float32)
+
+        # Exact premiums per (plan row, rating area)
+        keys = (rows * _AREA_KEY + areas).astype(np.int32)
+        self.area_keys, key_pos = np.unique(keys, return_inverse=True)
+        self.area_premiums = np.full((len(self.area_keys), len(RATE_AGES)), np.nan, dtype=np.float32)
+        self.area_premiums[key_pos, bands] = premium.astype(np.float32)
+
+        # Family-tier rates per (plan row, rating area), plus area 0 = state average
+        self.tier_keys, self.tier_rates = self._index_family_rates(family_rates)
+
+        # Geography: ZIP → rating area, and each plan's service area
+        self.geo = geo
+        self.service_area = (
+            geo.service_area_codes(plans["issuer_id"], plans["service_area_id"])
+            if geo is not None else None
+        )
+
+        # Per state and age band: row indices sorted by premium, unrated rows last
+        self.order = np.empty((n, len(RATE_AGES)), dtype=np.int32)
+        for start, stop in self.state_ranges.values():
+            block = self.premiums[start:stop]
+            self.order[start:stop] = np.argsort(block, axis=0, kind="stable") + start
+
+    def _index_family_rates(self, family_rates: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        rows = family_rates["PlanId"].astype(object).map(self.row_of)
+        family = family_rates[rows.notna()].copy()
+        family["row"] = rows[rows.notna()].astype(np.int64)
+        family = family[self.state[family["row"].to_numpy()] == family["StateCode"].astype(object).to_numpy()]
+
+        state_avg = family.groupby("row", as_index=False)[FAMILY_TIERS].mean()
+        state_avg["rating_area"] = 0
+        family = pd.concat([family[["row", "rating_area"] + FAMILY_TIERS], state_avg], ignore_index=True)
+
+        keys = (family["row"].to_numpy(dtype=np.int64) * _AREA_KEY
+                + family["rating_area"].to_numpy(dtype=np.int64)).astype(np.int32)
+        order = np.argsort(keys, kind="stable")
+        return keys[order], family[FAMILY_TIERS].to_numpy(dtype=np.float32)[order]
+
+    def __len__(self) -> int:
+        return len(self.state)
+
+    def states(self) -> list[str]:
+        return sorted(self.state_ranges)
+
+    def locate(self, zip_code: str) -> dict:
+        """ZIP → {"zip", "state", "county", "rating_area"}; ValueError if it cannot be rated."""
+        if self.geo is None:
+            raise ValueError("ZIP-level rating is unavailable: rating-area data is not loaded")
+        location = self.geo.resolve(zip_code)
+        if location is None:
+            raise ValueError(f"Unknown ZIP code: {zip_code}")
+        if location["rating_area"] is None:
+            raise ValueError(f"No rating area defined for ZIP {zip_code}")
+        return location
+
+    @staticmethod
+    def _find(sorted_keys: np.ndarray, rows: np.ndarray, area: int) -> tuple[np.ndarray, np.ndarray]:
+        """Binary-search (row, area) keys; returns (positions, found mask)."""
+        keys = rows.astype(np.int32) * _AREA_KEY + area
+        if not len(sorted_keys):
+            return np.zeros(len(rows), dtype=np.int64), np.zeros(len(rows), dtype=bool)
+        pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        return pos, sorted_keys[pos] == keys
+
+    def area_premium_gather(self, rows: np.ndarray, area: int, band) -> np.ndarray:
+        """
+        Premiums of `rows` in one rating area (NaN where not rated), by binary
+        search. `band` may be an array of bands, giving a (rows × bands) matrix.
+        """
+        pos, found = self._find(self.area_keys, rows, area)
+        if np.ndim(band):
+            return np.where(found[:, None], self.area_premiums[pos[:, None], band[None, :]], np.nan)
+        return np.where(found, self.area_premiums[pos, band], np.nan)
+
+    def household_premiums(self, rows: np.ndarray, ages: list[int],
+                           location: dict | None = None) -> np.ndarray:
+        """
+        Monthly premium of a household for each of `rows` (NaN if unrated).
+
+        Age-rated plans: one (plans × members) gather over the premium
+        matrix, charging at most the three oldest children under 21 (ACA
+        family rating rule). Plans rated by family tier instead ("Family
+        Option" states) take the rate of the household's tier.
+        """
+        bands = np.array([_RATE_AGE_BAND[_age_to_rate_age(a)] for a in ages])
+        if location is None:
+            member = self.premiums[rows[:, None], bands[None, :]]
+        else:
+            member = self.area_premium_gather(rows, location["rating_area"], bands)
+        charged = _charged_members(ages)
+        age_rated = np.where(charged[None, :], member, 0.0).sum(axis=1)
+
+        pos, found = self._find(self.tier_keys, rows, location["rating_area"] if location else 0)
+        tier_rate = (np.where(found, self.tier_rates[pos, _family_tier(ages)], np.nan)
+                     if len(self.tier_keys) else np.full(len(rows), np.nan))
+        return np.where(np.isnan(age_rated), tier_rate, age_rated)
+
+    def available_at(self, rows: np.ndarray, location: dict) -> np.ndarray:
+        """Which of `rows` are sold at `location` per the Service Area PUF."""
+        return self.geo.covers(self.service_area[rows], location)
+
+    def premium(self, row: int, band: int) -> float | None:
+        value = self.premiums[row, band]
+        return None if np.isnan(value) else round(float(value), 2)
+
+    def serialise(self, rows: np.ndarray, premiums: np.ndarray) -> list[dict]:
+        """Build plan dicts column-wise from row indices and their premiums."""
+        cols = [
+            self.columns[field][rows].tolist() if field != "monthly_premium"
+            else np.round(premiums.astype(np.float64), 2).tolist()
+            for field in PLAN_FIELDS
+        ]
+        return [dict(zip(PLAN_FIELDS, values)) for values in zip(*cols)]
+
+
+def _categorical(values: pd.Series) -> pd.Categorical:
+    """Dictionary-encode a column with only the categories it uses."""
+    return pd.Categorical(values.astype(str))
+
+
+class PlanVariants:
+    """
+    Cost sharing of every plan year and CSR variant, column-wise.
+
+    Rows are (plan_id, year, variant); strings are dictionary-encoded and
+    amounts float32, so several years of all variants cost little more
+    than one year did as a DataFrame. `slot` is a dense
+    (plan × year × variant) int32 table of row numbers (-1 = not offered),
+    making a lookup by plan, year and eligibility tier O(1).
+    """
+
+    FIELDS = [
+        "plan_id", "year", "variant", "plan_name", "issuer", "metal_level", "plan_type",
+        "deductible", "oop_max", "coinsurance", "is_hsa_eligible",
+        "family_deductible", "family_oop_max",
+    ]
+
+    def __init__(self, plan_attrs: pd.DataFrame):
+        self.years = sorted(int(y) for y in plan_attrs["year"].unique())
+        plan_codes, self.plan_ids = pd.factorize(plan_attrs["plan_id"])
+        self.code_of = {plan_id: i for i, plan_id in enumerate(self.plan_ids)}
+        year_pos = np.searchsorted(self.years, plan_attrs["year"].to_numpy())
+        variant_pos = plan_attrs["variant"].astype(str).map(_VARIANT_OF).to_numpy()
+
+        self.slot = np.full((len(self.plan_ids), len(self.years), len(VARIANTS)), -1, dtype=np.int32)
+        self.slot[plan_codes, year_pos, variant_pos] = np.arange(len(plan_attrs), dtype=np.int32)
+
+        self.columns = {
+            "plan_id": plan_codes.astype(np.int32),
+            "year": plan_attrs["year"].to_numpy(dtype=np.int16),
+            "variant": _categorical(plan_attrs["variant"]),
+            "plan_name": _categorical(plan_attrs["plan_name"]),
+            "issuer": _categorical(plan_attrs["issuer"]),
+            "metal_level": _categorical(plan_attrs["metal_level"]),
+            "plan_type": _categorical(plan_attrs["plan_type"]),
+            "is_hsa_eligible": (plan_attrs["is_hsa_eligible"] == "Yes").to_numpy(),
+        }
+        for field in ("deductible", "oop_max", "family_deductible", "family_oop_max"):
+            self.columns[field] = plan_attrs[field].to_numpy(dtype=np.float32)
+        self.columns["coinsurance"] = plan_attrs["coinsurance"].to_numpy(dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.columns["year"])
+
+    def row(self, plan_id: str, year: int, variant: str) -> int:
+        """Row of (plan_id, year, variant), or -1."""
+        code = self.code_of.get(plan_id)
+        if code is None or variant not in _VARIANT_OF or year not in self.years:
+            return -1
+        return int(self.slot[code, self.years.index(year), _VARIANT_OF[variant]])
+
+    def serialise(self, rows: np.ndarray) -> list[dict]:
+        """Variant dicts for `rows`, with float32 amounts rounded back to cents."""
+        values = {}
+        for field in self.FIELDS:
+            col = self.columns[field]
+            if field == "plan_id":
+                values[field] = self.plan_ids[col[rows]].tolist()
+            elif field == "coinsurance":
+                values[field] = np.round(col[rows].astype(np.float64), 4).tolist()
+            elif col.dtype == np.float32:
+                values[field] = np.round(col[rows].astype(np.float64), 2).tolist()
+            else:
+                values[field] = col[rows].tolist()
+        return [dict(zip(self.FIELDS, v)) for v in zip(*values.values())]
+
+
+def _charged_members(ages: list[int]) -> np.ndarray:
+    """Which members pay a premium: all adults, and only the three oldest children under 21."""
+    ages = np.asarray(ages)
+    charged = ages >= 21
+    children = np.flatnonzero(~charged)
+    charged[children[np.argsort(-ages[children], kind="stable")[:3]]] = True
+    return charged
+
+
+def _family_tier(ages: list[int]) -> int:
+    """FAMILY_TIERS column for a household: subscriber or couple, plus up to 3+ dependents."""
+    couple = sum(a >= 21 for a in ages) >= 2
+    dependents = min(len(ages) - (2 if couple else 1), 3)
+    return (1, 5, 6, 7)[dependents] if couple else (0, 2, 3, 4)[dependents]
+
+
+def _family_oop(costs: np.ndarray, deductible_pp: np.ndarray, deductible: np.ndarray,
+                oop_max_pp: np.ndarray, oop_max: np.ndarray, coinsurance: np.ndarray) -> np.ndarray:
+    """
+    Expected annual out-of-pocket cost of a household under each plan, with
+    embedded family limits, broadcast as one (plans × members) operation.
+
+    Each member pays toward their per-person deductible until the family
+    deductible is met (member shares are scaled down once it binds), then
+    coinsurance; each member's spend stops at the per-person OOP maximum
+    and the family's at the family OOP maximum.
+    """
+    costs = costs[None, :]
+    member_ded = np.minimum(costs, deductible_pp[:, None])
+    ded_total = member_ded.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.where(ded_total > deductible, deductible / ded_total, 1.0)
+    member_ded = member_ded * scale[:, None]
+    member_oop = member_ded + (costs - member_ded) * coinsurance[:, None]
+    member_oop = np.minimum(member_oop, oop_max_pp[:, None])
+    return np.minimum(member_oop.sum(axis=1), oop_max)
+
+
+def _load() -> dict:
+    """Load both PUF files into a fresh dict (one snapshot's worth)."""
+    geo = load_geo_index(_DATA_DIR)
+    rates, family_rates = _load_rate_index()
+    attrs = _load_plan_attributes()
+    # Premiums (Rate_PUF.csv) are for the latest plan year's standard variants
+    current = attrs[(attrs["year"] == attrs["year"].max()) & (attrs["variant"] == "standard")]
+    index, variants = PlanIndex(current, rates, family_rates, geo), PlanVariants(attrs)
+    return {
+        "index": index,
+        "variants": variants,
+        # PlanIndex row → PlanVariants plan code
+        "variant_codes": np.array([variants.code_of.get(plan_id, -1)
+                                   for plan_id in index.columns["plan_id"]], dtype=np.int64),
+    }
+
+
+def _sources() -> list[Path]:
+    return [
+        *_plan_attribute_paths(), _RATE_PATH,
+        _DATA_DIR / "zip_county.csv", _DATA_DIR / "rating_areas.csv",
+        _DATA_DIR / "ServiceArea_PUF.csv",
+    ]
+
+
+snapshot.register("puf", _load, _sources)
+
+
+def _data() -> dict:
+    return snapshot.get("puf")
+
+
+def _index() -> PlanIndex:
+    return _data()["index"]
+
+
+def _variants() -> PlanVariants:
+    return _data()["variants"]
 
 
 def get_available_states() -> list[str]:
     """Return sorted list of state codes with marketplace plans."""
-    _ensure_loaded()
-    return sorted(_plan_attrs["state"].unique().tolist())
+    return _index().states()
 
 
-def search_plans(state: str, metal_level: str | None = None,
-                 age: int = 45) -> list[dict]:
+def search_plans(state: str | None = None, metal_level: str | None = None,
+                 age: int = 45, zip_code: str | None = None,
+                 income_fpl: float | None = None) -> list[dict]:
     """Search marketplace plans for a state, optionally filtered by metal level.
 
-    Returns list of plan dicts with age-rated premium included.
+    Returns list of plan dicts with age-rated premium included, cheapest first.
+    With `zip_code`, only plans sold there are returned, priced for its
+    rating area rather than averaged across the state. Raises ValueError
+    for a ZIP that cannot be rated or that lies outside `state`. With
+    `income_fpl`, silver plans carry the CSR variant's cost sharing.
+    """
+    index = _index()
+    rows, premiums, _ = _priced_rows(index, state, zip_code, age)
+
+    # Plans without a rate for this age are dropped (inner join)
+    keep = ~np.isnan(premiums)
+    if metal_level and metal_level.lower() != "all":
+        keep &= index.metal_lower[rows] == metal_level.lower()
+
+    return _apply_csr(index.serialise(rows[keep], premiums[keep]), income_fpl)
+
+
+def _locate_in_state(index: PlanIndex, zip_code: str, state: str | None) -> dict:
+    """index.locate(zip_code), with a ValueError if `state` is given and the ZIP is elsewhere."""
+    location = index.locate(zip_code)
+    if state and state.upper() != location["state"]:
+        raise ValueError(f"ZIP {location['zip']} is in {location['state']}, not {state.upper()}")
+    return location
+
+
+def _priced_rows(index: PlanIndex, state: str | None, zip_code: str | None,
+                 age: int) -> tuple[np.ndarray, np.ndarray, dict | None]:
+    """
+    Rows of the plans sold in a state or ZIP, cheapest first for `age`, with
+    their premiums (NaN = not rated) and the resolved ZIP location.
+    """
+    band = _RATE_AGE_BAND[_age_to_rate_age(age)]
+
+    location = None
+    if zip_code:
+        location = _locate_in_state(index, zip_code, state)
+        state = location["state"]
+    if not state:
+        raise ValueError("Either state or zip_code is required")
+
+    bounds = index.state_ranges.get(state.upper())
+    if bounds is None:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), location
+
+    if location is None:
+        rows = index.order[bounds[0]:bounds[1], band]
+        premiums = index.premiums[rows, band]
+    else:
+        rows = np.arange(bounds[0], bounds[1])
+        rows = rows[index.available_at(rows, location)]
+        premiums = index.area_premium_gather(rows, location["rating_area"], band)
+        order = np.argsort(premiums, kind="stable")
+        rows, premiums = rows[order], premiums[order]
+    return rows, premiums, location
+
+
+def _category_mask(values: pd.Categorical, wanted: list[str] | None, rows: np.ndarray) -> np.ndarray:
+    """Rows whose value is one of `wanted` (case-insensitive); all rows if none or 'all'."""
+    if not wanted or any(w.lower() == "all" for w in wanted):
+        return np.ones(len(rows), dtype=bool)
+    lowered = {w.lower() for w in wanted}
+    matches = np.array([c.lower() in lowered for c in values.categories], dtype=bool)
+    return matches[values.codes[rows]]
+
+
+SORT_KEYS = ("premium", "deductible", "oop_max", "expected_total")
+
+# Fields query_plans() can return besides PLAN_FIELDS
+_QUERY_EXTRA_FIELDS = ("expected_annual_oop", "expected_annual_total", "csr_variant")
+
+
+def _encode_cursor(offset: int, fingerprint: str) -> str:
+    payload = json.dumps({"o": offset, "f": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, fingerprint: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        offset, cursor_fingerprint = int(payload["o"]), payload["f"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_fingerprint != fingerprint or offset < 0:
+        raise ValueError("Cursor does not match this query or data version; start from the first page")
+    return offset
+
+
+def query_plans(
+    state: str | None = None,
+    zip_code: str | None = None,
+    age: int = 45,
+    *,
+    metal_levels: list[str] | None = None,
+    issuers: list[str] | None = None,
+    plan_types: list[str] | None = None,
+    deductible_min: float | None = None,
+    deductible_max: float | None = None,
+    oop_max_min: float | None = None,
+    oop_max_max: float | None = None,
+    premium_max: float | None = None,
+    hsa_eligible: bool | None = None,
+    income_fpl: float | None = None,
+    annual_cost: float | None = None,
+    sort: str = "premium",
+    descending: bool = False,
+    limit: int | None = None,
+    cursor: str | None = None,
+    fields: list[str] | None = None,
+) -> dict:
+    """
+    Filtered, sorted, paginated plan search.
+
+    Every filter is a NumPy mask over the state's (or ZIP's) plan rows, and
+    only the requested page is serialised, with only the requested `fields`.
+    String filters match case-insensitively. With `income_fpl`, silver
+    plans are filtered and shown with their CSR variant's cost sharing.
+    `annual_cost` (expected medical spend for the user) adds expected
+    annual OOP and total (premiums + OOP) and enables sort="expected_total".
+
+    Sorting is stable with ties kept in premium order, so an offset cursor
+    is exact; a cursor is bound to the query and data snapshot that issued
+    it. Returns {"plans", "total", "next_cursor", "location"}. Raises
+    ValueError for bad arguments.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key {sort!r}; expected one of {', '.join(SORT_KEYS)}")
+    if sort == "expected_total" and annual_cost is None:
+        raise ValueError("sort=expected_total requires an expected annual cost")
+    if fields:
+        unknown = [f for f in fields if f not in PLAN_FIELDS and f not in _QUERY_EXTRA_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    variant = csr_variant_for_income(income_fpl)
+    if not fields:
+        fields = PLAN_FIELDS + (["csr_variant"] if variant != "standard" else []) + (
+            ["expected_annual_oop", "expected_annual_total"] if annual_cost is not None else [])
+
+    index = _index()
+    rows, premiums, location = _priced_rows(index, state, zip_code, age)
+    deductible = index.columns["deductible"][rows]
+    oop_max = index.columns["oop_max"][rows]
+    coinsurance = index.columns["coinsurance"][rows]
+    csr = np.zeros(len(rows), dtype=bool)
+    if variant != "standard":
+        csr_rows = _variant_rows(index, rows, variant)
+        csr = csr_rows >= 0
+        variants = _variants()
+        # float32 storage → the PUF's cents / four-place percentages
+        stored = {field: variants.columns[field][csr_rows].astype(np.float64)
+                  for field in ("deductible", "oop_max", "coinsurance")}
+        deductible = np.where(csr, np.round(stored["deductible"], 2), deductible)
+        oop_max = np.where(csr, np.round(stored["oop_max"], 2), oop_max)
+        coinsurance = np.where(csr, np.round(stored["coinsurance"], 4), coinsurance)
+
+    keep = ~np.isnan(premiums)
+    for values, wanted in ((index.metal_lower, metal_levels),
+                           (index.columns["issuer"], issuers),
+                           (index.columns["plan_type"], plan_types)):
+        keep &= _category_mask(values, wanted, rows)
+    for values, low, high in ((deductible, deductible_min, deductible_max),
+                              (oop_max, oop_max_min, oop_max_max),
+                              (premiums, None, premium_max)):
+        if low is not None:
+            keep &= values >= low
+        if high is not None:
+            keep &= values <= high
+    if hsa_eligible is not None:
+        keep &= index.columns["is_hsa_eligible"][rows] == hsa_eligible
+
+    rows, premiums, csr = rows[keep], premiums[keep].astype(np.float64), csr[keep]
+    deductible, oop_max, coinsurance = deductible[keep], oop_max[keep], coinsurance[keep]
+
+    extras = {}
+    if annual_cost is not None:
+        oop = _family_oop(np.array([annual_cost], dtype=np.float64),
+                          deductible, deductible, oop_max, oop_max, coinsurance)
+        extras["expected_annual_oop"] = np.round(oop, 2)
+        extras["expected_annual_total"] = np.round(np.round(premiums, 2) * 12 + oop, 2)
+
+    # Rows arrive cheapest first; a stable sort keeps that as the tie-break
+    if sort != "premium" or descending:
+        key = {"premium": premiums, "deductible": deductible, "oop_max": oop_max,
+               "expected_total": extras.get("expected_annual_total")}[sort]
+        order = np.argsort(-key if descending else key, kind="stable")
+        rows, premiums, csr = rows[order], premiums[order], csr[order]
+        deductible, oop_max, coinsurance = deductible[order], oop_max[order], coinsurance[order]
+        extras = {name: values[order] for name, values in extras.items()}
+
+    query = [state and state.upper(), zip_code, age, metal_levels, issuers, plan_types,
+             deductible_min, deductible_max, oop_max_min, oop_max_max, premium_max,
+             hsa_eligible, variant, annual_cost, sort, descending]
+    fingerprint = hashlib.sha256(
+        json.dumps([snapshot.current().version, query], default=str).encode()
+    ).hexdigest()[:16]
+    start = _decode_cursor(cursor, fingerprint) if cursor else 0
+    stop = len(rows) if limit is None else min(start + limit, len(rows))
+    page = slice(start, stop)
+
+    columns = {}
+    for field in fields:
+        if field == "monthly_premium":
+            columns[field] = np.round(premiums[page], 2).tolist()
+        elif field in ("deductible", "oop_max", "coinsurance"):
+            columns[field] = {"deductible": deductible, "oop_max": oop_max,
+                              "coinsurance": coinsurance}[field][page].tolist()
+        elif field == "csr_variant":
+            columns[field] = [variant if c else None for c in csr[page]]
+        elif field in _QUERY_EXTRA_FIELDS:
+            columns[field] = (extras[field][page].tolist() if field in extras
+                              else [None] * (stop - start))
+        else:
+            columns[field] = index.columns[field][rows[page]].tolist()
+
+    return {
+        "plans": [dict(zip(columns, values)) for values in zip(*columns.values())],
+        "total": len(rows),
+        "next_cursor": _encode_cursor(stop, fingerprint) if stop < len(rows) else None,
+        "location": location,
+    }
+
+
+def price_household(ages: list[int], annual_costs: list[float],
+                    state: str | None = None, metal_level: str | None = None,
+                    zip_code: str | None = None) -> list[dict]:
     """
-    _ensure_loaded()
+    Quote a household (one entry per member in `ages` / `annual_costs`)
+    against every plan in a state or ZIP, cheapest expected total first.
 
-    df = _plan_attrs[_plan_attrs["state"] == state.upper()]
+    `annual_costs` are the members' expected annual medical costs (e.g. from
+    simulated pathways). Each plan dict carries the household's monthly
+    premium, the family deductible / OOP maximum that applies, and the
+    expected annual OOP and total (premiums + OOP). A single member is
+    priced with the individual deductible and OOP maximum.
+    """
+    if not ages or len(ages) != len(annual_costs):
+        raise ValueError("ages and annual_costs must be non-empty and the same length")
 
+    index = _index()
+    location = None
+    if zip_code:
+        location = _locate_in_state(index, zip_code, state)
+        state = location["state"]
+    if not state:
+        raise ValueError("Either state or zip_code is required")
+    bounds = index.state_ranges.get(state.upper())
+    if bounds is None:
+        return []
+
+    rows = np.arange(bounds[0], bounds[1])
+    if location is not None:
+        rows = rows[index.available_at(rows, location)]
     if metal_level and metal_level.lower() != "all":
-        df = df[df["metal_level"].str.lower() == metal_level.lower()]
-
-    # Look up premiums for the given age
-    rate_age = _age_to_rate_age(age)
-    rates = _rate_index[
-        (_rate_index["StateCode"] == state.upper()) &
-        (_rate_index["Age"] == rate_age)
-    ][["PlanId", "monthly_premium"]]
-
-    # Join plans with rates
-    merged = df.merge(rates, left_on="plan_id", right_on="PlanId", how="inner")
-
-    # Sort by premium
-    merged = merged.sort_values("monthly_premium")
-
-    result = []
-    for _, row in merged.iterrows():
-        result.append({
-            "plan_id": row["plan_id"],
-            "plan_name": row["plan_name"],
-            "issuer": row["issuer"],
-            "metal_level": row["metal_level"],
-            "plan_type": row["plan_type"],
-            "deductible": row["deductible"],
-            "oop_max": row["oop_max"],
-            "coinsurance": row["coinsurance"],
-            "monthly_premium": row["monthly_premium"],
-            "is_hsa_eligible": row["is_hsa_eligible"] == "Yes",
-        })
+        rows = rows[index.metal_lower[rows] == metal_level.lower()]
+
+    premiums = index.household_premiums(rows, ages, location)
+    rated = ~np.isnan(premiums)
+    rows, premiums = rows[rated], np.round(premiums[rated].astype(np.float64), 2)
+
+    if len(ages) == 1:
+        limits = [index.columns[c][rows] for c in ("deductible", "deductible", "oop_max", "oop_max")]
+    else:
+        limits = [index.family[c][rows] for c in ("family_deductible_per_person", "family_deductible",
+                                                   "family_oop_max_per_person", "family_oop_max")]
+    oop = _family_oop(np.asarray(annual_costs, dtype=np.float64), *limits, index.columns["coinsurance"][rows])
+    total = premiums * 12 + oop
+
+    order = np.argsort(total, kind="stable")
+    rows, premiums, oop, total = rows[order], premiums[order], oop[order], total[order]
+    extra = {
+        "annual_premium": np.round(premiums * 12, 2).tolist(),
+        "household_deductible": limits[1][order].tolist(),
+        "household_oop_max": limits[3][order].tolist(),
+        "expected_annual_oop": np.round(oop, 2).tolist(),
+        "expected_annual_total": np.round(total, 2).tolist(),
+    }
+    plans = index.serialise(rows, premiums)
+    for i, plan in enumerate(plans):
+        for field, values in extra.items():
+            plan[field] = values[i]
+    return plans
 
-    return result
+
+def locate_zip(zip_code: str) -> dict:
+    """Resolve a ZIP to its state, county and rating area (ValueError if unknown)."""
+    return _index().locate(zip_code)
+
+
+def get_plans_with_premium(plan_ids: list[str], state: str,
+                           age: int, zip_code: str | None = None,
+                           income_fpl: float | None = None) -> list[dict]:
+    """Get plan dicts with age-rated premiums for many plans in one pass.
+
+    Results follow the order of `plan_ids`; unknown ids are skipped. A plan
+    with no rate for this state and age gets a premium of 0.0. With
+    `zip_code`, premiums are those of its rating area (ValueError if the
+    ZIP is not in `state`); with `income_fpl`, silver plans carry the CSR
+    variant's cost sharing.
+    """
+    index = _index()
+
+    rows = np.fromiter(
+        (index.row_of.get(plan_id, -1) for plan_id in plan_ids),
+        dtype=np.int64, count=len(plan_ids),
+    )
+    rows = rows[rows >= 0]
+
+    band = _RATE_AGE_BAND[_age_to_rate_age(age)]
+    if zip_code:
+        location = _locate_in_state(index, zip_code, state)
+        state = location["state"]
+        premiums = index.area_premium_gather(rows, location["rating_area"], band)
+    else:
+        premiums = index.premiums[rows, band]
+    premiums = np.where(
+        (index.state[rows] == state.upper()) & ~np.isnan(premiums), premiums, 0.0
+    )
+    return _apply_csr(index.serialise(rows, premiums), income_fpl)
 
 
 def get_plan_with_premium(plan_id: str, state: str,
-                          age: int) -> dict | None:
+                          age: int, zip_code: str | None = None,
+                          income_fpl: float | None = None) -> dict | None:
     """Get full plan dict with age-rated premium for a specific plan."""
-    _ensure_loaded()
+    plans = get_plans_with_premium([plan_id], state, age, zip_code, income_fpl)
+    return plans[0] if plans else None
 
-    plan_rows = _plan_attrs[_plan_attrs["plan_id"] == plan_id]
-    if plan_rows.empty:
-        return None
 
-    plan = plan_rows.iloc[0]
+def _apply_csr(plans: list[dict], income_fpl: float | None) -> list[dict]:
+    """Swap in the CSR variant's deductible, OOP max and coinsurance on silver plans."""
+    variant = csr_variant_for_income(income_fpl)
+    if variant == "standard":
+        return plans
+    variants = _variants()
+    year = variants.years[-1]
+    for plan in plans:
+        if plan["metal_level"] != "Silver":
+            continue
+        row = variants.row(plan["plan_id"], year, variant)
+        if row < 0:
+            continue
+        csr = variants.serialise(np.array([row]))[0]
+        plan.update(deductible=csr["deductible"], oop_max=csr["oop_max"],
+                    coinsurance=csr["coinsurance"], csr_variant=variant)
+    return plans
 
-    rate_age = _age_to_rate_age(age)
-    rate_rows = _rate_index[
-        (_rate_index["PlanId"] == plan_id) &
-        (_rate_index["StateCode"] == state.upper()) &
-        (_rate_index["Age"] == rate_age)
-    ]
 
-    premium = rate_rows.iloc[0]["monthly_premium"] if not rate_rows.empty else 0.0
+def _variant_rows(index: PlanIndex, rows: np.ndarray, variant: str) -> np.ndarray:
+    """PlanVariants rows of a CSR variant (latest year) for silver PlanIndex rows; -1 elsewhere."""
+    variants = _variants()
+    codes = _data()["variant_codes"][rows]
+    found = (codes >= 0) & (index.metal_lower[rows] == "silver")
+    result = np.full(len(rows), -1, dtype=np.int32)
+    result[found] = variants.slot[codes[found], len(variants.years) - 1, _VARIANT_OF[variant]]
+    return result
+
 
-    return {
-        "plan_id": plan["plan_id"],
-        "plan_name": plan["plan_name"],
-        "issuer": plan["issuer"],
-        "metal_level": plan["metal_level"],
-        "plan_type": plan["plan_type"],
-        "deductible": float(plan["deductible"]),
-        "oop_max": float(plan["oop_max"]),
-        "coinsurance": float(plan["coinsurance"]),
-        "monthly_premium": float(premium),
-        "is_hsa_eligible": plan["is_hsa_eligible"] == "Yes",
-    }
+def get_plan_variants(plan_id: str, year: int | None = None) -> list[dict]:
+    """
+    Every CSR variant of a plan across plan years (or one `year`), oldest
+    year first and in VARIANTS order within a year. Empty if unknown.
+    """
+    variants = _variants()
+    code = variants.code_of.get(plan_id)
+    if code is None:
+        return []
+    slots = variants.slot[code]
+    if year is not None:
+        if year not in variants.years:
+            return []
+        slots = slots[variants.years.index(year)][None, :]
+    rows = slots.ravel()
+    return variants.serialise(rows[rows >= 0])
+
+
+def get_plan_years() -> list[int]:
+    """Plan years loaded, oldest first."""
+    return list(_variants().years)
+
+
+# ── Nationwide aggregates ──
+
+def _state_chunks(index: PlanIndex, states: list[str] | None) -> list[tuple[str, int, int]]:
+    wanted = {st.upper() for st in states} if states else None
+    return [(st, start, stop) for st, (start, stop) in sorted(index.state_ranges.items())
+            if wanted is None or st in wanted]
+
+
+def _rated_rows(index: PlanIndex, start: int, stop: int, band: int,
+                metal_levels: list[str] | None) -> tuple[np.ndarray, np.ndarray]:
+    """One state's rows matching the metal filter that are rated for `band`, with premiums."""
+    rows = np.arange(start, stop)
+    premiums = index.premiums[start:stop, band]
+    keep = ~np.isnan(premiums) & _category_mask(index.metal_lower, metal_levels, rows)
+    return rows[keep], premiums[keep]
+
+
+def iter_top_plans(age: int = 45, k: int = 10, metal_levels: list[str] | None = None,
+                   states: list[str] | None = None, descending: bool = False,
+                   max_workers: int | None = None) -> Iterator[dict]:
+    """
+    The k cheapest (or, descending, most expensive) plans nationwide at
+    state-average premiums for `age`, as plan dicts with their state.
+
+    Each state is reduced to its own top k in a worker thread (argpartition
+    over the premium column releases the GIL), then the candidates are
+    merged. Ties keep state and premium-index order. Returns a generator
+    over an index captured now, so it is safe to consume after the request's
+    snapshot pin has gone.
+    """
+    index = _index()
+    band = _RATE_AGE_BAND[_age_to_rate_age(age)]
+    sign = -1.0 if descending else 1.0
+
+    def top_of_state(chunk: tuple[str, int, int]) -> tuple[np.ndarray, np.ndarray]:
+        rows, premiums = _rated_rows(index, chunk[1], chunk[2], band, metal_levels)
+        if len(rows) > k:
+            best = np.argpartition(sign * premiums, k - 1)[:k]
+            best.sort()
+            rows, premiums = rows[best], premiums[best]
+        return rows, premiums
+
+    def generate():
+        chunks = _state_chunks(index, states)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            parts = list(pool.map(top_of_state, chunks))
+        if not parts:
+            return
+        rows = np.concatenate([part[0] for part in parts])
+        premiums = np.concatenate([part[1] for part in parts])
+        order = np.argsort(sign * premiums, kind="stable")[:k]
+        for plan, state in zip(index.serialise(rows[order], premiums[order]),
+                               index.state[rows[order]]):
+            plan["state"] = state
+            yield plan
+
+    return generate()
+
+
+def iter_state_premium_stats(age: int = 45, metal_levels: list[str] | None = None,
+                             states: list[str] | None = None, by_metal: bool = False,
+                             max_workers: int | None = None) -> Iterator[dict]:
+    """
+    Premium distribution per state (or per state and metal level) for
+    `age`: plan count, min, quartiles, median, mean and max of the
+    state-average monthly premium.
+
+    States are computed in parallel worker threads and yielded in state
+    order as they become available, so callers can stream them. Like
+    iter_top_plans(), the index is captured when this is called.
+    """
+    index = _index()
+    band = _RATE_AGE_BAND[_age_to_rate_age(age)]
+
+    def stats(premiums: np.ndarray) -> dict:
+        q = np.percentile(premiums.astype(np.float64), [0, 25, 50, 75, 100])
+        return {
+            "plans": int(len(premiums)),
+            "min": round(float(q[0]), 2),
+            "p25": round(float(q[1]), 2),
+            "median": round(float(q[2]), 2),
+            "p75": round(float(q[3]), 2),
+            "max": round(float(q[4]), 2),
+            "mean": round(float(premiums.astype(np.float64).mean()), 2),
+        }
+
+    def state_stats(chunk: tuple[str, int, int]) -> list[dict]:
+        state = chunk[0]
+        rows, premiums = _rated_rows(index, chunk[1], chunk[2], band, metal_levels)
+        if not len(rows):
+            return []
+        if not by_metal:
+            return [{"state": state, **stats(premiums)}]
+        metal = index.columns["metal_level"]
+        codes = metal.codes[rows]
+        return [{"state": state, "metal_level": metal.categories[code], **stats(premiums[codes == code])}
+                for code in np.unique(codes)]
+
+    def generate():
+        chunks = _state_chunks(index, states)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for results in pool.map(state_stats, chunks):
+                yield from results
+
+    return generate()
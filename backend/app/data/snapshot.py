@@ -0,0 +1,277 @@
+"""
+Versioned Data Snapshots
+
+Every loader (meps_loader, comorbidity_loader, puf_loader) registers a
+component: a function that builds its in-memory tables from disk, plus the
+source files it reads. A Snapshot is one immutable set of built components;
+the app serves from a single module-level reference to the current one.
+
+Reloading builds a complete new snapshot in the background — every
+component the old snapshot had loaded is rebuilt and the manifest is
+re-validated — and only then swaps the reference. A failed reload leaves
+the old snapshot serving.
+
+Each request is pinned to the snapshot current when it arrived
+(SnapshotMiddleware), so in-flight requests finish on the data they started
+with, and the response carries the version in an X-Data-Snapshot header.
+
+Components load lazily on first use within a snapshot, one build per
+component even under concurrent first requests (single-flight, per-component
+locks). At startup the app warms every component in a thread pool
+(start_warm_up); requests that arrive meanwhile wait asynchronously instead
+of blocking the event loop, and readiness() reports when the worker is warm.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+from app.data.artifacts import _DATA_DIR, MANIFEST_NAME, check_manifest
+
+SNAPSHOT_HEADER = "X-Data-Snapshot"
+
+# name → (build function, callable returning source paths)
+_components: dict[str, tuple[Callable[[], object], Callable[[], list[Path]]]] = {}
+
+
+def register(name: str, build: Callable[[], object], sources: Callable[[], list[Path]]):
+    """Register a loader component. `build` must return a fresh, self-contained object."""
+    _components[name] = (build, sources)
+
+
+def _compute_version() -> str:
+    """
+    Short content fingerprint of everything the registered components read.
+
+    Uses (size, mtime) rather than content hashes so it is cheap to compute
+    per reload; artifact contents are covered by the manifest's hashes.
+    """
+    digest = hashlib.sha256()
+    manifest_path = _DATA_DIR / MANIFEST_NAME
+    if manifest_path.exists():
+        digest.update(manifest_path.read_bytes())
+    for name in sorted(_components):
+        for path in sorted(_components[name][1]()):
+            path = Path(path)
+            if path.exists():
+                st = path.stat()
+                digest.update(f"{path}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:12]
+
+
+class Snapshot:
+    """One immutable generation of loaded data."""
+
+    def __init__(self, version: str):
+        self.version = version
+        self.created_at = time.time()
+        self._data: dict[str, object] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _component_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str):
+        """
+        Return component `name`, building it on first access. Concurrent
+        first callers wait for the one build; other components are not held up.
+
+        The build runs pinned to this snapshot, so components it reads
+        through the module-level get() come from the same generation — a
+        reload's derived components are built from its new inputs.
+        """
+        data = self._data.get(name)
+        if data is not None:
+            return data
+        with self._component_lock(name):
+            if name not in self._data:
+                build, _ = _components[name]
+                token = _pinned.set(self)
+                try:
+                    self._data[name] = build()
+                finally:
+                    _pinned.reset(token)
+            return self._data[name]
+
+    def warm(self, names: list[str] | None = None) -> dict[str, dict]:
+        """
+        Build `names` (default: every registered component) concurrently,
+        one thread each. Returns name → {"status", "seconds"[, "error"]};
+        a component whose source files are not on this machine is
+        "unavailable", any other build error is "failed".
+        """
+        names = names or sorted(_components)
+
+        def build(name: str) -> dict:
+            start = time.perf_counter()
+            try:
+                self.get(name)
+                status = {"status": "loaded"}
+            except FileNotFoundError as e:
+                status = {"status": "unavailable", "error": str(e)}
+            except Exception as e:
+                status = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            status["seconds"] = round(time.perf_counter() - start, 3)
+            return status
+
+        with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="warmup") as pool:
+            return dict(zip(names, pool.map(build, names)))
+
+    def loaded(self) -> list[str]:
+        """Names of the components built so far."""
+        return sorted(self._data)
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "created_at": self.created_at,
+            "loaded": self.loaded(),
+        }
+
+
+_current: Snapshot | None = None
+_current_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_pinned: contextvars.ContextVar[Snapshot | None] = contextvars.ContextVar(
+    "data_snapshot", default=None
+)
+
+
+def latest() -> Snapshot:
+    """The most recently published snapshot (created on first use)."""
+    global _current
+    if _current is None:
+        with _current_lock:
+            if _current is None:
+                _current = Snapshot(_compute_version())
+    return _current
+
+
+def current() -> Snapshot:
+    """The snapshot pinned to this request, or the latest outside a request."""
+    return _pinned.get() or latest()
+
+
+def get(name: str):
+    """Shorthand for current().get(name) — what the loaders call."""
+    return current().get(name)
+
+
+_warmup_task: asyncio.Task | None = None
+_warmup_status: dict[str, dict] = {}
+
+# Answered while warming up, so probes and load balancers see the state
+_UNGATED_PATHS = {"/api/health", "/api/ready"}
+
+
+async def _warm_up(names: list[str] | None):
+    _warmup_status.update(await asyncio.to_thread(latest().warm, names))
+
+
+def start_warm_up(names: list[str] | None = None) -> asyncio.Task:
+    """Start warming the latest snapshot in the background (call from the app's lifespan)."""
+    global _warmup_task
+    _warmup_status.clear()
+    _warmup_task = asyncio.get_running_loop().create_task(_warm_up(names))
+    return _warmup_task
+
+
+def readiness() -> dict:
+    """
+    Whether this worker should receive traffic: the warm-up has finished
+    and no component failed to build (unavailable data does not count).
+    """
+    warming = _warmup_task is not None and not _warmup_task.done()
+    failed = [name for name, st in _warmup_status.items() if st["status"] == "failed"]
+    return {
+        "ready": _warmup_task is not None and not warming and not failed,
+        "warming": warming,
+        "version": latest().version,
+        "components": dict(_warmup_status),
+    }
+
+
+class ReloadInProgress(RuntimeError):
+    """A reload was requested while another one is still building."""
+
+
+def reload(components: list[str] | None = None) -> dict:
+    """
+    Build a new snapshot, validate it, and atomically make it current.
+
+    `components` defaults to every component loaded in the current snapshot,
+    so the first request after the swap does not pay a cold load. Raises
+    ReloadInProgress if another reload is running, and propagates any build
+    or validation error without touching the current snapshot.
+    """
+    global _current
+    if not _reload_lock.acquire(blocking=False):
+        raise ReloadInProgress("A data reload is already in progress")
+    try:
+        start = time.perf_counter()
+        old = latest()
+        names = components if components is not None else old.loaded()
+        unknown = [n for n in names if n not in _components]
+        if unknown:
+            raise KeyError(f"Unknown data component(s): {', '.join(unknown)}")
+
+        check_manifest()
+        new = Snapshot(_compute_version())
+        for name in names:
+            new.get(name)
+
+        with _current_lock:
+            _current = new
+        return {
+            "previous_version": old.version,
+            "version": new.version,
+            "loaded": new.loaded(),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+    finally:
+        _reload_lock.release()
+
+
+class SnapshotMiddleware:
+    """
+    ASGI middleware pinning each HTTP request to the current snapshot and
+    reporting its version in the X-Data-Snapshot response header.
+
+    Written as plain ASGI (not BaseHTTPMiddleware) so streaming responses
+    keep their pin for the whole body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Wait (without blocking the loop) for a warm-up in progress, so cold
+        # requests do not each start loading the same tables
+        if (_warmup_task is not None and not _warmup_task.done()
+                and scope.get("path") not in _UNGATED_PATHS):
+            await asyncio.shield(_warmup_task)
+
+        snapshot = latest()
+        token = _pinned.set(snapshot)
+        header = (SNAPSHOT_HEADER.lower().encode(), snapshot.version.encode())
+
+        async def send_with_version(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_version)
+        finally:
+            _pinned.reset(token)
@@ -0,0 +1,228 @@
+"""
+Fuzzy Text Index
+
+A small in-memory index for matching free text against short documents —
+condition synonyms, ICD-10 descriptions — without a search engine.
+
+Documents are split into words and stopwords dropped. Each query word is
+matched against the vocabulary three ways:
+- exactly;
+- by prefix, both for type-ahead ("diab" → "diabetes") and for stems
+  taken from regexes ("arteries" → "arter");
+- by character-trigram similarity, which tolerates typos
+  ("diabetis" → "diabetes").
+
+A document's score is the IDF-weighted share of query words it matches
+(each at its best similarity), scaled by how much of the document the
+query covers; generic words ("problem", "disease") carry little weight.
+Scores fall in 0..1, so callers can threshold them.
+"""
+
+import bisect
+import re
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Similarity of a vocabulary word found by prefix rather than exactly
+_STEM_SIMILARITY = 0.95      # vocabulary word is a stem of the query word
+_PREFIX_SIMILARITY = 0.9     # query word is an unfinished vocabulary word
+_MIN_PREFIX = 3
+_MIN_STEM = 5
+_MIN_TRIGRAM_SIMILARITY = 0.5
+_MATCH_CACHE_SIZE = 4096
+
+ENGLISH_STOPWORDS = frozenset("""
+a an and are as at be been but by for from had has have i i'm i've im in is it its
+me my of on or so that the their them they this to was were with
+""".split())
+
+
+def tokenize(text: str, stopwords: frozenset = ENGLISH_STOPWORDS) -> list[str]:
+    """Lowercased words of `text` without stopwords."""
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in stopwords]
+
+
+def _trigrams(word: str) -> set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class TextIndex:
+    """Inverted word index with prefix, stem and trigram matching."""
+
+    def __init__(self, docs: list[str], stopwords: frozenset = ENGLISH_STOPWORDS,
+                 generic_words: frozenset = frozenset(), generic_weight: float = 0.1):
+        self.docs = docs
+        self.stopwords = stopwords
+
+        vocab: dict[str, int] = {}
+        postings: list[list[int]] = []
+        doc_len = np.zeros(len(docs), dtype=np.float64)
+        for doc_id, doc in enumerate(docs):
+            words = set(tokenize(doc, stopwords))
+            doc_len[doc_id] = max(len(words - generic_words), 1)
+            for word in words:
+                word_id = vocab.setdefault(word, len(vocab))
+                if word_id == len(postings):
+                    postings.append([])
+                postings[word_id].append(doc_id)
+
+        self.vocab = vocab
+        self.words = list(vocab)
+        self.postings = [np.array(p, dtype=np.int32) for p in postings]
+        self.doc_len = doc_len
+        df = np.array([len(p) for p in postings], dtype=np.float64)
+        self.idf = np.log(1 + len(docs) / np.maximum(df, 1))
+        for word in generic_words:
+            if word in vocab:
+                self.idf[vocab[word]] *= generic_weight
+        self.max_idf = float(self.idf.max()) if len(self.idf) else 1.0
+
+        self.sorted_words = sorted(vocab)
+        self.word_trigrams = [_trigrams(w) for w in self.words]
+        self.trigram_words: dict[str, list[int]] = {}
+        for word_id, grams in enumerate(self.word_trigrams):
+            for gram in grams:
+                self.trigram_words.setdefault(gram, []).append(word_id)
+        self._match_cache: dict[str, dict[int, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def word_matches(self, word: str) -> dict[int, float]:
+        """
+        Vocabulary word id → similarity to `word` (exact, prefix, stem or
+        trigram). Cached, since type-ahead repeats the same words.
+        """
+        matches = self._match_cache.get(word)
+        if matches is None:
+            if len(self._match_cache) >= _MATCH_CACHE_SIZE:
+                self._match_cache.clear()
+            matches = self._match_cache[word] = self._find_matches(word)
+        return matches
+
+    def _find_matches(self, word: str) -> dict[int, float]:
+        matches: dict[int, float] = {}
+        exact = self.vocab.get(word)
+        if exact is not None:
+            matches[exact] = 1.0
+
+        if len(word) >= _MIN_PREFIX:
+            start = bisect.bisect_left(self.sorted_words, word)
+            for candidate in self.sorted_words[start:]:
+                if not candidate.startswith(word):
+                    break
+                matches.setdefault(self.vocab[candidate], _PREFIX_SIMILARITY)
+        for end in range(_MIN_STEM, len(word)):
+            stem = self.vocab.get(word[:end])
+            if stem is not None:
+                matches[stem] = max(matches.get(stem, 0.0), _STEM_SIMILARITY)
+
+        if len(word) >= 4:
+            grams = _trigrams(word)
+            shared: dict[int, int] = {}
+            for gram in grams:
+                for word_id in self.trigram_words.get(gram, ()):
+                    shared[word_id] = shared.get(word_id, 0) + 1
+            for word_id, n in shared.items():
+                similarity = 2 * n / (len(grams) + len(self.word_trigrams[word_id]))
+                if similarity < _MIN_TRIGRAM_SIMILARITY:
+                    continue
+                # One or two typos in a long word are closer than trigrams suggest
+                candidate = self.words[word_id]
+                similarity = max(similarity, 1 - _edit_distance(word, candidate) / max(len(word), len(candidate)))
+                if similarity > matches.get(word_id, 0.0):
+                    matches[word_id] = similarity
+        return matches
+
+    def _word_best(self, query: str) -> list[tuple[float, np.ndarray]]:
+        """Per distinct query word: (IDF weight, best similarity in each document)."""
+        result = []
+        for word in dict.fromkeys(tokenize(query, self.stopwords)):
+            matches = self.word_matches(word)
+            best = np.zeros(len(self.docs), dtype=np.float64)
+            # A word the index has never seen weighs as much as the rarest one
+            weight = self.max_idf
+            if matches:
+                weight = float(self.idf[max(matches, key=matches.get)])
+                for word_id, similarity in matches.items():
+                    docs = self.postings[word_id]
+                    best[docs] = np.maximum(best[docs], similarity)
+            result.append((weight, best))
+        return result
+
+    @staticmethod
+    def _combine(words: list[tuple[float, np.ndarray]]) -> tuple[np.ndarray, np.ndarray]:
+        """IDF-weighted share of query words matched, and count of words matched."""
+        share = sum(weight * best for weight, best in words) / sum(weight for weight, _ in words)
+        matched = sum((best > 0).astype(np.float64) for _, best in words)
+        return share, matched
+
+    def scores(self, query: str) -> np.ndarray:
+        """Score of every document for `query` (0 when nothing matches)."""
+        words = self._word_best(query)
+        if not words:
+            return np.zeros(len(self.docs), dtype=np.float64)
+        share, matched = self._combine(words)
+        coverage = np.minimum(matched / self.doc_len, 1.0)
+        return share * (0.5 + 0.5 * coverage)
+
+    def group_scores(self, query: str, groups: np.ndarray, n_groups: int) -> np.ndarray:
+        """
+        Score of `query` against groups of documents (`groups[doc]` is the
+        group id) taken as one bag of words: each query word counts at its
+        best match anywhere in the group. Lets "lung cancer" match a
+        condition whose label says "cancer" and whose ICD description says
+        "lung". A group's coverage is that of its best-covered document.
+        """
+        words = self._word_best(query)
+        if not words:
+            return np.zeros(n_groups, dtype=np.float64)
+        grouped = []
+        for weight, best in words:
+            group_best = np.zeros(n_groups, dtype=np.float64)
+            np.maximum.at(group_best, groups, best)
+            grouped.append((weight, group_best))
+        share, _ = self._combine(grouped)
+        _, matched = self._combine(words)
+        coverage = np.zeros(n_groups, dtype=np.float64)
+        np.maximum.at(coverage, groups, np.minimum(matched / self.doc_len, 1.0))
+        return share * (0.5 + 0.5 * coverage)
+
+    def matches_literally(self, query: str, doc_id: int) -> bool:
+        """
+        Whether `query` and a document name the same thing word for word:
+        every query word is a document word or a prefix/stem of one, and
+        every document word (generic ones included) is matched. No typo
+        tolerance, so "headache" does not literally match "chronic headache"
+        and "diabetis" does not match "diabetes".
+        """
+        def same(a: str, b: str) -> bool:
+            return (a == b or (len(a) >= _MIN_PREFIX and b.startswith(a))
+                    or (len(b) >= _MIN_STEM and a.startswith(b)))
+
+        query_words = set(tokenize(query, self.stopwords))
+        doc_words = set(tokenize(self.docs[doc_id], self.stopwords))
+        return (bool(query_words)
+                and all(any(same(q, d) for d in doc_words) for q in query_words)
+                and all(any(same(q, d) for q in query_words) for d in doc_words))
+
+    def search(self, query: str, limit: int = 10, min_score: float = 0.0) -> list[tuple[int, float]]:
+        """Top `limit` (doc id, score) pairs, best first."""
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores > min_score)
+        if not len(candidates):
+            return []
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:limit]
+        return [(int(i), float(scores[i])) for i in order]
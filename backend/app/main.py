@@ -1,24 +1,54 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from app.config import WARMUP_COMPONENTS
+from app.data.artifacts import check_manifest
+from app.data.snapshot import SNAPSHOT_HEADER, SnapshotMiddleware, readiness, start_warm_up
+from app.routers import voice, simulation, plans, drugs, icd, admin
+
 
-from app.routers import voice, simulation, plans, drugs
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Refuse to start on processed artifacts built for a different schema —
+    # better a failed deploy than a worker quoting wrong costs.
+    check_manifest()
+    # Load the data tables in a thread pool without holding up startup;
+    # /api/ready turns 200 once they are in memory.
+    warmup = start_warm_up(WARMUP_COMPONENTS or None)
+    yield
+    warmup.cancel()
 
-app = FastAPI(title="CareGraph API", version="0.1.0")
 
+app = FastAPI(title="CareGraph API", version="0.1.0", lifespan=lifespan)
+
+app.add_middleware(SnapshotMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[SNAPSHOT_HEADER],
 )
 
 app.include_router(voice.router, prefix="/api/voice", tags=["voice"])
 app.include_router(simulation.router, prefix="/api/simulation", tags=["simulation"])
 app.include_router(plans.router, prefix="/api/plans", tags=["plans"])
 app.include_router(drugs.router, prefix="/api/drugs", tags=["drugs"])
+app.include_router(icd.router, prefix="/api/icd", tags=["icd"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 
 @app.get("/api/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/api/ready")
+async def ready():
+    """Readiness probe: 503 until the data warm-up has finished."""
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
@@ -9,6 +9,7 @@ class PatientProfile(BaseModel):
     deductible: float = 2000.0
     coinsurance: float = 0.20
     oop_max: float = 8000.0
+    plan_id: str | None = None  # marketplace StandardComponentId, for per-service cost sharing
 
 
 class ScenarioRequest(BaseModel):
@@ -0,0 +1,72 @@
+import asyncio
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel
+
+from app.config import ADMIN_TOKEN
+from app.data import snapshot
+from app.services import demographics, llm_cache
+
+router = APIRouter()
+
+
+class ReloadRequest(BaseModel):
+    components: list[str] | None = None
+
+
+def _require_admin(token: str | None):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    # Constant time; bytes, since compare_digest rejects non-ASCII str
+    if not hmac.compare_digest((token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.get("/snapshot")
+async def get_snapshot(x_admin_token: str | None = Header(None)):
+    """Describe the data snapshot currently serving requests."""
+    _require_admin(x_admin_token)
+    return snapshot.latest().describe()
+
+
+@router.post("/reload")
+async def reload_data(
+    request: ReloadRequest | None = None,
+    x_admin_token: str | None = Header(None),
+):
+    """
+    Load a fresh data snapshot from disk and swap it in once it validates.
+    In-flight requests finish on the previous snapshot.
+    """
+    _require_admin(x_admin_token)
+    components = request.components if request else None
+    try:
+        return await asyncio.to_thread(snapshot.reload, components)
+    except snapshot.ReloadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+    except Exception as e:
+        # The previous snapshot keeps serving
+        raise HTTPException(status_code=500, detail=f"Reload failed: {e}")
+
+
+@router.get("/llm-cache")
+async def get_llm_cache(x_admin_token: str | None = Header(None)):
+    """
+    Size and per-function hit rates of the LLM response cache, and the
+    share of parsed requests whose demographics skipped the LLM (this
+    worker's counters).
+    """
+    _require_admin(x_admin_token)
+    stats = await asyncio.to_thread(llm_cache.cache.stats)
+    return {**stats, "demographics": demographics.stats()}
+
+
+@router.delete("/llm-cache")
+async def clear_llm_cache(x_admin_token: str | None = Header(None)):
+    """Drop every cached LLM response."""
+    _require_admin(x_admin_token)
+    await asyncio.to_thread(llm_cache.cache.clear)
+    return {"cleared": True}
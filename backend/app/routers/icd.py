@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Query
+
+from app.data.comorbidity_loader import search_icd
+
+router = APIRouter()
+
+
+@router.get("/search")
+async def icd_search(
+    q: str = Query(..., min_length=1, max_length=200, description="Free text or ICD-10 code prefix (e.g. 'diabetes', 'E11')"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """
+    Search ICD-10 codes by description or code prefix.
+    Each hit carries the engine condition key it maps to (null if none)
+    and its index in the comorbidity matrices.
+    """
+    results = search_icd(q, limit)
+    return {"query": q, "results": results, "count": len(results)}
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Query
-from pydantic import BaseModel
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from app.models.patient import PatientProfile
 from app.simulation.engine import simulate_pathway
-from app.data.puf_loader import get_available_states, search_plans, get_plan_with_premium
+from app.data.puf_loader import (
+    get_available_states, get_plans_with_premium,
+    price_household, get_plan_variants, query_plans,
+    iter_top_plans, iter_state_premium_stats,
+)
 
 router = APIRouter()
 
@@ -32,6 +40,31 @@ class MarketplacePlanCompareRequest(BaseModel):
     interventions: list[str] = []
     state: str
     plan_ids: list[str]
+    zip_code: str | None = None
+    income_fpl: float | None = None
+    time_horizon_years: int = 5
+
+
+class PlanBatchRequest(BaseModel):
+    state: str
+    age: int = 45
+    plan_ids: list[str] = Field(..., min_length=1, max_length=500)
+    zip_code: str | None = None
+    income_fpl: float | None = None
+
+
+class HouseholdMember(BaseModel):
+    age: int
+    sex: str
+    conditions: list[str] = []
+    interventions: list[str] = []
+
+
+class HouseholdQuoteRequest(BaseModel):
+    state: str | None = None
+    zip_code: str | None = None
+    metal_level: str | None = None
+    members: list[HouseholdMember] = Field(..., min_length=1, max_length=8)
     time_horizon_years: int = 5
 
 
@@ -74,26 +107,132 @@ async def list_states():
 
 @router.get("/search")
 async def search_marketplace_plans(
-    state: str = Query(..., description="Two-letter state code"),
-    metal_level: str | None = Query(None, description="Metal level filter"),
+    state: str | None = Query(None, description="Two-letter state code"),
+    metal_level: list[str] | None = Query(None, description="Metal level filter (repeatable)"),
+    age: int = Query(45, description="Age for premium rating"),
+    zip: str | None = Query(None, description="ZIP code for rating-area premiums"),
+    income_fpl: float | None = Query(None, description="Household income as % of FPL, for silver CSR variants"),
+    issuer: list[str] | None = Query(None, description="Issuer name filter (repeatable)"),
+    plan_type: list[str] | None = Query(None, description="HMO / PPO / EPO / POS (repeatable)"),
+    deductible_min: float | None = Query(None, ge=0),
+    deductible_max: float | None = Query(None, ge=0),
+    oop_max_min: float | None = Query(None, ge=0),
+    oop_max_max: float | None = Query(None, ge=0),
+    premium_max: float | None = Query(None, ge=0, description="Maximum monthly premium"),
+    hsa_eligible: bool | None = Query(None),
+    sort: str = Query("premium", description="premium, deductible, oop_max or expected_total"),
+    desc: bool = Query(False, description="Sort descending"),
+    limit: int | None = Query(None, ge=1, le=500, description="Page size (default: all)"),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    fields: str | None = Query(None, description="Comma-separated plan fields to return"),
+    annual_cost: float | None = Query(None, ge=0, description="Expected annual medical cost"),
+    sex: str = Query("M", description="Sex, for simulating expected cost"),
+    conditions: list[str] | None = Query(None, description="Conditions, for simulating expected cost"),
+):
+    """
+    Search marketplace plans for a state with server-side filters, sorting
+    and cursor pagination. With a ZIP, returns the plans sold there at its
+    rating area's premiums.
+
+    Expected annual OOP and total are included when `annual_cost` is given,
+    or when sorting by expected_total (the cost is then simulated from age,
+    sex and conditions).
+    """
+    if annual_cost is None and (sort == "expected_total" or conditions):
+        graph = await simulate_pathway(
+            profile=PatientProfile(age=age, sex=sex, conditions=conditions or [], insurance_type="PPO"),
+            time_horizon_years=5,
+        )
+        annual_cost = graph.total_5yr_cost / 5
+
+    try:
+        result = query_plans(
+            state=state, zip_code=zip, age=age,
+            metal_levels=metal_level, issuers=issuer, plan_types=plan_type,
+            deductible_min=deductible_min, deductible_max=deductible_max,
+            oop_max_min=oop_max_min, oop_max_max=oop_max_max,
+            premium_max=premium_max, hsa_eligible=hsa_eligible,
+            income_fpl=income_fpl, annual_cost=annual_cost,
+            sort=sort, descending=desc, limit=limit, cursor=cursor,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    location = result.pop("location")
+    result["count"] = len(result["plans"])
+    if location:
+        result["location"] = location
+    return result
+
+
+@router.get("/aggregate")
+async def aggregate_plans(
+    op: str = Query(..., description="top_k or state_stats"),
     age: int = Query(45, description="Age for premium rating"),
+    metal_level: list[str] | None = Query(None, description="Metal level filter (repeatable)"),
+    state: list[str] | None = Query(None, description="Restrict to these states (repeatable)"),
+    k: int = Query(10, ge=1, le=1000, description="top_k: number of plans"),
+    desc: bool = Query(False, description="top_k: most expensive first"),
+    by_metal: bool = Query(False, description="state_stats: group by state and metal level"),
+):
+    """
+    Nationwide plan queries over state-average premiums, streamed as NDJSON
+    (one JSON object per line): the top k plans across states, or premium
+    statistics per state.
+    """
+    if op == "top_k":
+        rows = iter_top_plans(age=age, k=k, metal_levels=metal_level, states=state, descending=desc)
+    elif op == "state_stats":
+        rows = iter_state_premium_stats(age=age, metal_levels=metal_level, states=state, by_metal=by_metal)
+    else:
+        raise HTTPException(status_code=400, detail="op must be top_k or state_stats")
+    return StreamingResponse(
+        (json.dumps(row) + "\n" for row in rows),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/variants/{plan_id}")
+async def list_plan_variants(
+    plan_id: str,
+    year: int | None = Query(None, description="Plan year (default: all loaded years)"),
 ):
-    """Search marketplace plans for a state with optional metal level filter."""
-    plans = search_plans(state=state, metal_level=metal_level, age=age)
-    return {"plans": plans, "count": len(plans)}
+    """Cost sharing of every CSR variant of a plan, across plan years."""
+    variants = get_plan_variants(plan_id, year)
+    if not variants:
+        raise HTTPException(status_code=404, detail=f"Plan {plan_id} not found")
+    return {"plan_id": plan_id, "variants": variants}
+
+
+@router.post("/batch")
+async def get_marketplace_plans(request: PlanBatchRequest):
+    """Look up many marketplace plans with age-rated premiums in one call."""
+    try:
+        plans = get_plans_with_premium(
+            plan_ids=request.plan_ids, state=request.state, age=request.age,
+            zip_code=request.zip_code, income_fpl=request.income_fpl,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    found = {plan["plan_id"] for plan in plans}
+    missing = [plan_id for plan_id in request.plan_ids if plan_id not in found]
+    return {"plans": plans, "count": len(plans), "missing": missing}
 
 
 @router.post("/marketplace-compare")
 async def compare_marketplace_plans(request: MarketplacePlanCompareRequest):
     """Compare real marketplace plans using PUF data + MEPS simulation."""
-    results = []
-    for plan_id in request.plan_ids:
-        plan_data = get_plan_with_premium(
-            plan_id=plan_id, state=request.state, age=request.age
+    try:
+        plans = get_plans_with_premium(
+            plan_ids=request.plan_ids, state=request.state, age=request.age,
+            zip_code=request.zip_code, income_fpl=request.income_fpl,
         )
-        if plan_data is None:
-            continue
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    results = []
+    for plan_data in plans:
         profile = PatientProfile(
             age=request.age,
             sex=request.sex,
@@ -102,6 +241,7 @@ async def compare_marketplace_plans(request: MarketplacePlanCompareRequest):
             deductible=plan_data["deductible"],
             coinsurance=plan_data["coinsurance"],
             oop_max=plan_data["oop_max"],
+            plan_id=plan_data["plan_id"],
         )
         graph = await simulate_pathway(
             profile=profile,
@@ -118,3 +258,44 @@ async def compare_marketplace_plans(request: MarketplacePlanCompareRequest):
         })
 
     return {"plan_comparisons": results}
+
+
+@router.post("/household")
+async def quote_household(request: HouseholdQuoteRequest):
+    """
+    Quote every plan in a state or ZIP for a whole household: summed
+    member premiums (or the family-tier rate), family deductible and OOP
+    limits, and expected OOP from each member's simulated annual costs.
+    """
+    graphs = await asyncio.gather(*(
+        simulate_pathway(
+            profile=PatientProfile(
+                age=member.age,
+                sex=member.sex,
+                conditions=member.conditions,
+                insurance_type="PPO",
+            ),
+            interventions=member.interventions,
+            time_horizon_years=request.time_horizon_years,
+        )
+        for member in request.members
+    ))
+    horizon = max(request.time_horizon_years, 1)
+    annual_costs = [graph.total_5yr_cost / horizon for graph in graphs]
+
+    try:
+        plans = price_household(
+            ages=[member.age for member in request.members],
+            annual_costs=annual_costs,
+            state=request.state,
+            metal_level=request.metal_level,
+            zip_code=request.zip_code,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "plans": plans,
+        "count": len(plans),
+        "member_annual_costs": [round(cost, 2) for cost in annual_costs],
+    }
@@ -1,4 +1,8 @@
+import json
+from typing import AsyncIterator
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.services.voice_agent import (
@@ -6,6 +10,8 @@ from app.services.voice_agent import (
     interpret_scenario,
     generate_explanation,
     chat_about_health,
+    stream_explanation,
+    stream_chat_about_health,
 )
 
 router = APIRouter()
@@ -19,6 +25,8 @@ class TextInput(BaseModel):
 class ExplanationRequest(BaseModel):
     graph_data: dict
     question: str
+    baseline_graph: dict | None = None  # graph before interventions, for their effect
+    time_horizon_years: int | None = None  # horizon the graph was simulated for; inferred if omitted
 
 
 class ChatRequest(BaseModel):
@@ -28,6 +36,38 @@ class ChatRequest(BaseModel):
     messages: list[dict] = []
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sentence_events(sentences: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Server-sent events for a reply streamed sentence by sentence:
+    "sentence" {"text"} per sentence, then "done" {"text": full reply},
+    or "error" {"detail"} if the upstream call fails. When the client
+    disconnects, Starlette cancels the generator and the Groq request is
+    closed with it.
+    """
+    async def events():
+        reply = []
+        try:
+            async for sentence in sentences:
+                reply.append(sentence)
+                yield _sse("sentence", {"text": sentence})
+        except Exception as e:
+            print(f"[voice stream] EXCEPTION: {e}")
+            yield _sse("error", {"detail": "The voice agent failed to respond."})
+            return
+        yield _sse("done", {"text": " ".join(reply)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/parse-profile")
 async def parse_profile(input: TextInput):
     """Parse natural language patient description into structured profile."""
@@ -45,10 +85,20 @@ async def parse_scenario(input: TextInput):
 @router.post("/explain")
 async def explain(request: ExplanationRequest):
     """Generate natural language explanation of simulation results."""
-    explanation = await generate_explanation(request.graph_data, request.question)
+    explanation = await generate_explanation(
+        request.graph_data, request.question, request.baseline_graph, request.time_horizon_years,
+    )
     return {"explanation": explanation}
 
 
+@router.post("/explain/stream")
+async def explain_stream(request: ExplanationRequest):
+    """/explain as server-sent events, one per sentence, for text-to-speech."""
+    return _sentence_events(stream_explanation(
+        request.graph_data, request.question, request.baseline_graph, request.time_horizon_years,
+    ))
+
+
 @router.post("/chat")
 async def chat(request: ChatRequest):
     """Conversational endpoint — answer any health/cost question with full patient context."""
@@ -59,3 +109,14 @@ async def chat(request: ChatRequest):
         conversation=request.messages,
     )
     return {"response": response}
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """/chat as server-sent events, one per sentence, for text-to-speech."""
+    return _sentence_events(stream_chat_about_health(
+        question=request.text,
+        profile=request.profile,
+        graph_summary=request.graph_summary,
+        conversation=request.messages,
+    ))
@@ -0,0 +1,145 @@
+"""
+Deterministic Demographics Extraction
+
+Most patient descriptions state age, sex and insurance plainly ("I'm a 52
+year old woman on a PPO"). extract_demographics() reads them with regexes
+built from the same vocabulary as DEMOGRAPHIC_TERM_RE — the filter
+simulate_pathway uses to keep demographics out of unmapped conditions —
+so parse_patient_input only asks the LLM when the age is not stated in a
+form these rules can read.
+"""
+
+import re
+
+# Shared vocabulary
+_AGE_UNITS = r"yo|y/?o|years?\s*old|yr|yrs"
+_SEX_TERMS = r"male|female|man|woman|boy|girl|m|f"
+_PLAN_TERMS = r"ppo|hmo|hdhp|medicare|medicaid|cobra|tricare"
+
+# A whole term that is a demographic rather than a condition ("55yo", "female", "PPO plan")
+DEMOGRAPHIC_TERM_RE = re.compile(
+    rf"^(\d{{1,3}}\s*(?:{_AGE_UNITS})?|"
+    r"age\s*\d{1,3}|"
+    rf"{_SEX_TERMS}|"
+    rf"(?:{_PLAN_TERMS})(?:\s*plan)?|"
+    r"insurance|plan|uninsured|insured)$",
+    re.IGNORECASE,
+)
+
+# An age stated in running text, in order of confidence
+_AGE_PATTERNS = [
+    # "55 years old", "55-year-old", "55yo", "55 y/o", "55 yrs"
+    re.compile(rf"\b(\d{{1,3}})[\s-]*(?:years?[\s-]*old|year|{_AGE_UNITS})\b"),
+    # "age 55", "aged 55", "age: 55"
+    re.compile(r"\baged?\s*:?\s*(\d{1,3})\b"),
+    # "55F", "32m" — two or three digits, so "5m" (a distance) is not an age
+    re.compile(r"\b(\d{2,3})(?:m|f)\b"),
+    # "I'm 45", "I am 45", "I'm a 45 year old" — only when the number ends
+    # the clause or is followed by an age or sex word, so any unit ("I'm 6
+    # months pregnant", "I'm 5 foot 2", "I'm 100 percent sure") rules it out
+    re.compile(r"\bi(?:'m|\s+am)\s+(?:a\s+)?(\d{1,3})"
+               r"(?=\s*(?:[,;!?]|\.(?!\d)|$)"
+               rf"|\s*(?:{_AGE_UNITS})\b"
+               r"|\s+(?:and|with|but|so|on)\b"
+               rf"|\s*(?:{_SEX_TERMS}|guy|lady)\b)"),
+]
+_MAX_AGE = 120
+
+# Keyword-to-approximate-age mapping (only if no numeric age found)
+_AGE_WORDS = {
+    "elderly": 75, "senior": 72, "old": 70,
+    "middle-aged": 50, "middle aged": 50,
+    "young adult": 25, "teenager": 16, "teen": 16,
+    "child": 8, "infant": 1, "baby": 1,
+    "young": 28,
+}
+_AGE_WORD_RE = {word: re.compile(r"\b" + re.escape(word) + r"\b") for word in _AGE_WORDS}
+
+_MALE_RE = re.compile(r"\b(male|man|boy|he|his)\b")
+_FEMALE_RE = re.compile(r"\b(female|woman|girl|she|her)\b")
+_FE_MALE_RE = re.compile(r"\bfe?male\b")
+_SEX_SUFFIX_RE = re.compile(r"\b\d{2,3}(m|f)\b")
+
+# Insurance keyword → type, first match wins
+_INSURANCE_PATTERNS = [
+    (re.compile(r"\bppo\b"), "PPO"),
+    (re.compile(r"\bhmo\b"), "HMO"),
+    (re.compile(r"\bhdhp\b"), "HDHP"),
+    (re.compile(r"\bmedicare\b"), "MEDICARE"),
+    (re.compile(r"\bmedicaid\b"), "MEDICAID"),
+    (re.compile(r"\buninsured\b"), "NONE"),
+    (re.compile(r"\b(poverty|poor|low[\s-]*income|can'?t\s*afford|no\s*(health\s*)?insurance|broke)\b"), "MEDICAID"),
+]
+
+# Requests parsed, and how many of them still needed the LLM for demographics
+_stats = {"requests": 0, "llm_calls": 0}
+
+
+def _extract_age(lower: str) -> int | None:
+    """A stated numeric age, else an approximation from age words."""
+    for pattern in _AGE_PATTERNS:
+        for m in pattern.finditer(lower):
+            age = int(m.group(1))
+            if 0 < age <= _MAX_AGE:
+                return age
+    for word, approx_age in _AGE_WORDS.items():
+        if _AGE_WORD_RE[word].search(lower):
+            return approx_age
+    return None
+
+
+def _extract_sex(lower: str) -> str | None:
+    suffix = _SEX_SUFFIX_RE.search(lower)
+    if suffix:
+        return suffix.group(1).upper()
+    if _MALE_RE.search(lower) and not _FE_MALE_RE.search(lower):
+        return "M"
+    if _FEMALE_RE.search(lower):
+        return "F"
+    return None
+
+
+def _extract_insurance(lower: str) -> str:
+    for pattern, insurance_type in _INSURANCE_PATTERNS:
+        if pattern.search(lower):
+            return insurance_type
+    return "unknown"
+
+
+def extract_demographics(text: str) -> dict:
+    """
+    Rule-based age, sex and insurance type.
+
+    Returns {"age", "sex", "insurance_type"}; missing fields are None
+    ("unknown" for insurance_type). Words like "elderly" give an
+    approximate age when no number is stated.
+    """
+    lower = text.lower()
+    return {
+        "age": _extract_age(lower),
+        "sex": _extract_sex(lower),
+        "insurance_type": _extract_insurance(lower),
+    }
+
+
+def needs_llm(demographics: dict) -> bool:
+    """
+    Whether the LLM should be asked for demographics: only when no age
+    could be read. The LLM cannot do better on sex or plan type than the
+    keywords above, so those alone never trigger a call.
+    """
+    return demographics["age"] is None
+
+
+def record(used_llm: bool):
+    _stats["requests"] += 1
+    _stats["llm_calls"] += used_llm
+
+
+def stats() -> dict:
+    """Share of parsed requests whose demographics were resolved without the LLM."""
+    requests = _stats["requests"]
+    return {
+        **_stats,
+        "skipped_llm": round(1 - _stats["llm_calls"] / requests, 4) if requests else None,
+    }
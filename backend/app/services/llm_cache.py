@@ -0,0 +1,233 @@
+"""
+Persistent LLM Response Cache
+
+The voice agent's classification calls (health gate, condition mapping,
+demographics, scenario parsing) run at temperature 0 in JSON mode, so the
+same prompt and input give the same answer. Their raw responses are kept
+in a small SQLite file (data/llm_cache.sqlite by default) shared by every
+worker, so a repeated utterance skips the Groq round-trip.
+
+Entries are keyed on (function, prompt version, normalised text). The
+prompt version is a fingerprint of the model and the full system prompt,
+so editing a prompt — or the context rendered into it — never serves an
+answer produced by the old one. Entries expire after LLM_CACHE_TTL_SECONDS;
+beyond LLM_CACHE_MAX_ENTRIES the least recently used are evicted.
+LLM_CACHE_MAX_ENTRIES=0 turns the cache off.
+
+Every call blocks on SQLite (and, with several workers, possibly on
+another worker's write lock), so async callers run get/put in a thread.
+Hits don't write: last-access times are batched and flushed every
+_TOUCH_BATCH hits or _TOUCH_INTERVAL seconds, which is precise enough for
+LRU eviction.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from app.config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent.parent.parent / "data" / "llm_cache.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    function TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+# Expired entries are swept, and the entry count re-read from disk, every
+# this many writes rather than on each one
+_SWEEP_EVERY = 100
+# Pending last-access times are written after this many hits or seconds
+_TOUCH_BATCH = 50
+_TOUCH_INTERVAL = 30.0
+# Eviction trims the cache to this share of max_entries, so it runs once
+# per few hundred writes at capacity instead of on every write
+_EVICT_TO = 0.9
+
+
+def normalise(text: str) -> str:
+    """Case- and whitespace-insensitive form of the user text used in keys."""
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def prompt_version(model: str, system_prompt: str) -> str:
+    """Short fingerprint of the model and system prompt."""
+    return hashlib.sha256(f"{model}\0{system_prompt}".encode()).hexdigest()[:12]
+
+
+class LLMCache:
+    """SQLite-backed response cache with TTL, LRU eviction and hit counters."""
+
+    def __init__(self, path: str | Path, ttl_seconds: float, max_entries: int):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._writes = 0
+        self._entries = 0           # row count, re-read every _SWEEP_EVERY writes
+        self._touched: dict[str, float] = {}    # key → last hit not yet written
+        self._touched_since = 0.0
+        # function → {"hits", "misses", "expired", "stores"}
+        self._counters: dict[str, dict[str, int]] = {}
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            # WAL lets several uvicorn workers read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _touch(self, conn: sqlite3.Connection, key: str, now: float):
+        """Record a hit; write the pending access times once enough have built up."""
+        if not self._touched:
+            self._touched_since = now
+        self._touched[key] = now
+        if len(self._touched) >= _TOUCH_BATCH or now - self._touched_since >= _TOUCH_INTERVAL:
+            self._flush_touched(conn)
+            conn.commit()
+
+    def _flush_touched(self, conn: sqlite3.Connection):
+        if self._touched:
+            conn.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                             [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def _count(self, function: str, event: str):
+        counters = self._counters.setdefault(
+            function, {"hits": 0, "misses": 0, "expired": 0, "stores": 0}
+        )
+        counters[event] += 1
+
+    @staticmethod
+    def _key(function: str, version: str, text: str) -> str:
+        return hashlib.sha256(f"{function}\0{version}\0{normalise(text)}".encode()).hexdigest()
+
+    def get(self, function: str, version: str, text: str) -> str | None:
+        """The cached response, or None on a miss or an expired entry."""
+        if not self.enabled:
+            return None
+        key = self._key(function, version, text)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self._count(function, "misses")
+                    return None
+                if now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    conn.commit()
+                    self._count(function, "expired")
+                    return None
+                self._touch(conn, key, now)
+            except sqlite3.Error as e:
+                # A broken cache must never break the request; treat it as a miss
+                print(f"[llm_cache] read failed: {e}")
+                self._count(function, "misses")
+                return None
+            self._count(function, "hits")
+            return row[0]
+
+    def put(self, function: str, version: str, text: str, response: str):
+        """Store a response, evicting the least recently used entries over the limit."""
+        if not self.enabled:
+            return
+        key = self._key(function, version, text)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, function, version, response, now, now),
+                )
+                self._writes += 1
+                self._entries += 1
+                if self._writes % _SWEEP_EVERY == 0:
+                    conn.execute("DELETE FROM responses WHERE created_at < ?",
+                                 (now - self.ttl_seconds,))
+                    # Other workers write to the same file, so our count drifts
+                    self._entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                if self._entries > self.max_entries:
+                    self._flush_touched(conn)
+                    keep = int(self.max_entries * _EVICT_TO)
+                    cursor = conn.execute(
+                        "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                        "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                        (keep,),
+                    )
+                    self.evictions += max(cursor.rowcount, 0)
+                    self._entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"[llm_cache] write failed: {e}")
+                return
+            self._count(function, "stores")
+
+    def stats(self) -> dict:
+        """Per-function hit/miss counters for this process plus the on-disk size."""
+        with self._lock:
+            functions = {}
+            for function, counters in sorted(self._counters.items()):
+                lookups = counters["hits"] + counters["misses"] + counters["expired"]
+                functions[function] = {
+                    **counters,
+                    "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+                }
+            entries = None
+            if self.enabled:
+                try:
+                    entries = self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            hits = sum(c["hits"] for c in self._counters.values())
+            lookups = sum(c["hits"] + c["misses"] + c["expired"] for c in self._counters.values())
+            return {
+                "enabled": self.enabled,
+                "path": str(self.path),
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / lookups, 4) if lookups else None,
+                "functions": functions,
+            }
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            if self.enabled:
+                conn = self._connect()
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+                self._entries = 0
+            self._touched.clear()
+            self._counters.clear()
+            self.evictions = 0
+
+
+cache = LLMCache(LLM_CACHE_PATH or _DEFAULT_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES)
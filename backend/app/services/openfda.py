@@ -6,10 +6,14 @@ for a given condition. Returns brand names, generic names, warnings,
 interactions, and common adverse reactions.
 
 Results are cached in-memory (LRU) since drug labels rarely change.
+Concurrent requests for the same search share one fetch, and failed
+fetches are not cached, so the next request retries.
 """
 
 import httpx
-from functools import lru_cache
+from collections import OrderedDict
+
+from app.services.single_flight import coalesce
 
 _BASE = "https://api.fda.gov/drug/label.json"
 
@@ -106,36 +110,51 @@ def _extract_drug(result: dict) -> dict | None:
     }
 
 
-@lru_cache(maxsize=128)
-def _cached_query(search_term: str, limit: int) -> tuple:
-    """Cached synchronous fetch (returns tuple for hashability)."""
+_CACHE_SIZE = 128
+_results: OrderedDict[tuple[str, int], tuple] = OrderedDict()
+
+
+@coalesce()
+async def _fetch(search_term: str, limit: int) -> tuple:
+    """
+    Fetch and deduplicate drug labels, caching successful responses (LRU).
+    Raises on network errors and non-200 responses so they are not cached.
+    """
+    key = (search_term, limit)
+    if key in _results:
+        _results.move_to_end(key)
+        return _results[key]
+
     params = {
         "search": f'indications_and_usage:"{search_term}" AND openfda.product_type:"HUMAN PRESCRIPTION DRUG"',
         "limit": limit,
     }
-    try:
-        resp = httpx.get(_BASE, params=params, timeout=8)
-        if resp.status_code != 200:
-            return ()
-        data = resp.json()
-        results = data.get("results", [])
-
-        drugs = []
-        seen_generics = set()
-        for r in results:
-            d = _extract_drug(r)
-            if d is None:
-                continue
-            # Deduplicate by generic name
-            key = (d["generic_name"] or "").lower()
-            if key in seen_generics:
-                continue
-            seen_generics.add(key)
-            drugs.append(d)
-
-        return tuple(drugs)
-    except Exception:
-        return ()
+    async with httpx.AsyncClient(timeout=8) as http:
+        resp = await http.get(_BASE, params=params)
+    if resp.status_code == 404:
+        # openFDA answers 404 when no label matches the search
+        results = []
+    else:
+        resp.raise_for_status()
+        results = resp.json().get("results", [])
+
+    drugs = []
+    seen_generics = set()
+    for r in results:
+        d = _extract_drug(r)
+        if d is None:
+            continue
+        # Deduplicate by generic name
+        generic = (d["generic_name"] or "").lower()
+        if generic in seen_generics:
+            continue
+        seen_generics.add(generic)
+        drugs.append(d)
+
+    _results[key] = tuple(drugs)
+    if len(_results) > _CACHE_SIZE:
+        _results.popitem(last=False)
+    return _results[key]
 
 
 async def get_drugs_for_condition(condition: str, limit: int = 5) -> list[dict]:
@@ -150,6 +169,8 @@ async def get_drugs_for_condition(condition: str, limit: int = 5) -> list[dict]:
     if not search_term:
         return []
 
-    # Use cached sync call (openFDA is fast, <1s typically)
-    results = _cached_query(search_term, min(limit * 2, 10))
+    try:
+        results = await _fetch(search_term, min(limit * 2, 10))
+    except Exception:
+        return []
     return list(results)[:limit]
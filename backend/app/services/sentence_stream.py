@@ -0,0 +1,65 @@
+"""
+Sentence Chunking for Streamed Replies
+
+Groq streams a reply a few characters at a time, but text-to-speech needs
+whole sentences. sentences() regroups a token stream into sentences as soon
+as each one is complete, so the first can be spoken while the rest are
+still being generated.
+
+A sentence ends at ., ! or ? (plus any closing quotes or brackets) followed
+by whitespace, or at a line break. Numbers ("$1,234.50"), abbreviations
+("Dr.", "e.g.") and initials don't end one, and very short fragments are
+held back so the voice doesn't stutter through "Yes." "Okay."
+"""
+
+import re
+from typing import AsyncIterator
+
+_BOUNDARY_RE = re.compile(r"""[.!?]+["')\]]*(?=\s)|\n+""")
+_LAST_WORD_RE = re.compile(r"([\w.]+)[.!?]*$")
+_ABBREVIATIONS = frozenset("""
+approx dr e.g etc i.e jr mr mrs ms no sr st vs
+""".split())
+
+# Shortest chunk worth handing to TTS on its own
+MIN_SENTENCE_CHARS = 20
+
+
+def _split_point(text: str, min_chars: int) -> int:
+    """End of the first complete sentence in `text` at least `min_chars` long, or 0."""
+    for m in _BOUNDARY_RE.finditer(text):
+        if m.end() < min_chars:
+            continue
+        if m.group().startswith("\n"):
+            return m.end()
+        last = _LAST_WORD_RE.search(text, 0, m.start() + 1)
+        word = last.group(1).lower().rstrip(".") if last else ""
+        if word in _ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+            continue
+        return m.end()
+    return 0
+
+
+async def sentences(tokens: AsyncIterator[str], min_chars: int = MIN_SENTENCE_CHARS) -> AsyncIterator[str]:
+    """
+    Regroup a stream of text fragments into sentences, stripped of
+    surrounding whitespace. Whatever is left when the stream ends is
+    yielded as the last sentence.
+
+    Closing this generator early (e.g. the client disconnected) closes
+    `tokens`, so the upstream request is released too.
+    """
+    buffer = ""
+    try:
+        async for token in tokens:
+            buffer += token
+            while (end := _split_point(buffer, min_chars)):
+                sentence, buffer = buffer[:end].strip(), buffer[end:].lstrip()
+                if sentence:
+                    yield sentence
+        if buffer.strip():
+            yield buffer.strip()
+    finally:
+        aclose = getattr(tokens, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,105 @@
+"""
+Single-Flight Request Coalescing
+
+When identical upstream calls (a retried chat message, several tabs
+opening the same patient) are in flight at once, only the first one goes
+to Groq or openFDA; the others await the same asyncio task and get its
+result. Nothing is remembered once the call finishes — an error reaches
+every waiting caller and the next call tries again — so this complements
+the caches rather than replacing them.
+
+    @coalesce()
+    async def fetch(term: str, limit: int) -> list[dict]: ...
+
+Callers that share a flight get their own deep copy of the result, so one
+caller mutating it cannot affect another.
+"""
+
+import asyncio
+import copy
+import functools
+from typing import Awaitable, Callable, Hashable
+
+
+class _Flight:
+    __slots__ = ("task", "waiters", "active")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0    # callers that joined
+        self.active = 0     # callers still awaiting
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key within one event loop."""
+
+    def __init__(self):
+        self._flights: dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """
+        Await fn(), or the call already in flight for `key`.
+
+        The upstream call runs in its own task, so a caller that is
+        cancelled (a client disconnect, a speculative stage no longer
+        needed) does not cancel it for the others still waiting; once
+        every caller has been cancelled, the call is cancelled too.
+        """
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(functools.partial(self._finish, key, flight))
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        flight.active += 1
+
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.active -= 1
+            if flight.active == 0:
+                flight.task.cancel()
+                # Don't let a caller arriving before _finish runs join a
+                # cancelled task; it starts a new flight instead
+                self._forget(key, flight)
+            raise
+        flight.active -= 1
+        return copy.deepcopy(result) if flight.waiters > 1 else result
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finish(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        self._forget(key, flight)
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+def coalesce(key: Callable[..., Hashable] | None = None):
+    """
+    Decorate an async function so concurrent calls with the same key share
+    one execution. `key` maps the call's arguments to a hashable key
+    (default: the positional and keyword arguments themselves).
+    """
+    def decorator(fn):
+        flights = SingleFlight()
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            k = key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+            return await flights.do(k, lambda: fn(*args, **kwargs))
+
+        wrapper.flights = flights
+        return wrapper
+
+    return decorator
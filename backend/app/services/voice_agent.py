@@ -7,14 +7,60 @@ the MEPS-backed condition list. When regex fails, an LLM fallback maps
 unrecognized terms to the closest condition key(s) from the 46.
 """
 
+import asyncio
 import json
 import re
+from typing import AsyncIterator
+import numpy as np
 from groq import AsyncGroq
+from pydantic import ValidationError
 from app.config import GROQ_API_KEY
-from app.data.comorbidity_loader import CONDITION_TO_ICD
+from app.data import snapshot
+from app.data.comorbidity_loader import _CONDITION_LABELS, _ICD_TO_CONDITION, CONDITION_TO_ICD
+from app.data.text_index import ENGLISH_STOPWORDS, TextIndex, tokenize
+from app.models.graph import CarePathwayGraph
+from app.services import demographics, llm_cache, sentence_stream
+from app.services.single_flight import coalesce
+from app.simulation.summary import DEFAULT_TOKEN_BUDGET, graph_prompt, truncate_to_tokens
 
 client = AsyncGroq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
 
+
+@coalesce(key=lambda function, system_prompt, text, model=None: (
+    function, system_prompt, model, llm_cache.normalise(text)))
+async def _cached_json_completion(function: str, system_prompt: str, text: str,
+                                  model: str = "llama-3.3-70b-versatile") -> str:
+    """
+    Temperature-0, JSON-mode completion of `text` under `system_prompt`.
+
+    Served from the persistent LLM cache when the same prompt has already
+    answered the same (normalised) text; only responses that parse as JSON
+    are stored, so a malformed answer is retried next time. Identical
+    calls in flight at the same time share one request (single-flight).
+    """
+    version = llm_cache.prompt_version(model, system_prompt)
+    cached = await asyncio.to_thread(llm_cache.cache.get, function, version, text)
+    if cached is not None:
+        return cached
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text},
+        ],
+        temperature=0,
+        response_format={"type": "json_object"},
+    )
+    content = response.choices[0].message.content
+    try:
+        json.loads(content)
+    except (TypeError, ValueError):
+        return content
+    await asyncio.to_thread(llm_cache.cache.put, function, version, text, content)
+    return content
+
+
 # Build condition key → label mapping for the LLM prompt
 _CONDITION_KEY_LIST = sorted(CONDITION_TO_ICD.keys())
 
@@ -426,19 +472,148 @@ CONDITION_PATTERNS: dict[str, list[str]] = {
 }
 
 
+# All condition patterns compiled once into a single automaton. Each
+# condition's patterns form one named alternative inside a zero-width
+# lookahead, so one finditer pass reports, at every position where any
+# pattern matches, the first condition (in CONDITION_PATTERNS order) that
+# matches there without consuming text other conditions might need.
+# Every pattern starts with \b and a letter, so only word starts are tried.
+_CONDITION_GROUPS = {f"c{i}": condition for i, condition in enumerate(CONDITION_PATTERNS)}
+_CONDITION_RE: dict[str, re.Pattern] = {
+    condition: re.compile("|".join(f"(?:{p})" for p in patterns))
+    for condition, patterns in CONDITION_PATTERNS.items()
+}
+assert all(p.startswith(r"\b") for patterns in CONDITION_PATTERNS.values() for p in patterns)
+_ANY_CONDITION_RE = re.compile(
+    r"\b(?=\w)(?=" + "|".join(
+        f"(?P<{group}>{_CONDITION_RE[condition].pattern})"
+        for group, condition in _CONDITION_GROUPS.items()
+    ) + ")"
+)
+
+
 def detect_conditions(text: str) -> list[str]:
     """
     Deterministic condition detection from user text.
     Uses regex keyword matching — same input always gives same output.
+
+    The text is scanned once by the combined automaton; conditions that
+    match only at a position already claimed by an earlier condition are
+    then confirmed with an anchored match at just those positions, so the
+    result equals searching every pattern separately.
     """
     lower = text.lower()
-    matched = []
-    for condition, patterns in CONDITION_PATTERNS.items():
-        for pattern in patterns:
-            if re.search(pattern, lower):
-                matched.append(condition)
-                break
-    return matched
+    found: set[str] = set()
+    positions = []
+    for m in _ANY_CONDITION_RE.finditer(lower):
+        found.add(_CONDITION_GROUPS[m.lastgroup])
+        positions.append(m.start())
+    for condition, pattern in _CONDITION_RE.items():
+        if condition not in found and any(pattern.match(lower, pos) for pos in positions):
+            found.add(condition)
+    return [condition for condition in CONDITION_PATTERNS if condition in found]
+
+
+# Phrasing patterns: common ways people describe health issues
+_HEALTH_PHRASING = [
+    r"\bi\s+(have|had|got|suffer|experience|was diagnosed|am diagnosed|'ve been diagnosed|live with|deal with|struggle with|developed|caught)\b",
+    r"\bdiagnosed\s+with\b",
+    r"\bsuffering\s+from\b",
+    r"\bmy\s+(doctor|physician|specialist|cardiologist|surgeon|nurse|therapist|psychiatrist)\b",
+    r"\btaking\s+(medication|medicine|pills|drugs|meds)\b",
+    r"\b(disease|disorder|syndrome|chronic|condition|diagnosis|infection)\b",
+    # "my [body part]" — people describe issues by referencing their body
+    r"\bmy\s+(heart|lung|kidney|liver|stomach|back|knee|hip|joint|bone|arteri|vein|blood|sugar|thyroid|prostate|bladder|brain|eye|ear|skin|chest|head|leg|arm|foot|feet|hand|neck|spine|pancrea|colon|intestin|gallbladder|throat)",
+    # "I feel" / "I'm" + symptom
+    r"\bi\s+(feel|am|'m)\s+(sick|ill|dizzy|nauseous|weak|tired|exhausted|depressed|anxious|bloated|short of breath|light\s*headed)",
+    r"\b(can\s*not|can'?t|cannot|couldn'?t|have\s+trouble|unable\s+to)\s+(breathe|sleep|walk|see|hear|move|swallow|eat|focus|remember)",
+    # "something hurts/aches/is wrong"
+    r"\b(hurts|aching|aches|swollen|swelling|sore|painful|stiff|numb|bleeding|burning|itching|cramping)\b",
+    # "I've been [symptom]ing" — progressive tense symptom descriptions
+    r"\bi'?ve\s+been\s+\w*(throw|cough|wheez|bleed|vomit|sneez|itch|ach|hurt|swell|cramp|faint|puk)\w*",
+    r"\bi\s+keep\s+\w*(throw|cough|wheez|bleed|vomit|sneez|itch|faint|puk)\w*",
+]
+
+# Body parts — if ANY body part is mentioned, this is likely health-related
+_BODY_PARTS = [
+    r"\b(heart|lungs?|kidneys?|liver|stomach|intestin|colon|pancrea|spleen|gallbladder)\b",
+    r"\b(arteri|arter\w+|vein|blood\s*vessel|capillar|aorta|vascular)\b",
+    r"\b(brain|spine|spinal|nerv|neural)\b",
+    r"\b(bone|joint|cartilage|tendon|ligament|muscle|skeletal)\b",
+    r"\b(knee|hip|shoulder|ankle|wrist|elbow|finger|toe)\b",
+    r"\b(eye|retina|cornea|ear|eardrum|sinus)\b",
+    r"\b(skin|scalp|nail|rash)\b",
+    r"\b(throat|esophag|trachea|larynx|vocal)\b",
+    r"\b(bladder|urethr|ureter|uterus|ovary|prostate|rectum)\b",
+    r"\b(thyroid|adrenal|pituitary|gland)\b",
+    r"\b(chest|abdomen|pelvis|groin)\b",
+]
+
+# Symptom descriptors — colloquial ways of describing health problems
+_SYMPTOM_WORDS = [
+    r"\b(clogged|blocked|narrow|hardened|inflamed|infected|damaged|failing|swollen|enlarged|bleeding|leaking)\b",
+    r"\b(pain|ache|sore|tender|stiff|numb|tingle|tingling|throb|cramp|spasm|burning|itchy|itching)\b",
+    r"\b(dizzy|faint|nausea|vomit|wheez|cough|sneez|fever|chills|sweat)\b",
+    r"\b(throw\w*\s*up|puk\w*|gag\w*|retch\w*|dry\s*heav\w*|sick\s*to\s*my\s*stomach)\b",
+    r"\b(fatigue|tired|exhausted|weak|letharg|drowsy|groggy)\b",
+    r"\b(worried|worrying|anxious|stressed|nervous|restless|panick|overwhelmed|scared)\b",
+    r"\b(depressed|hopeless|sad|empty|miserable|suicidal|worthless)\b",
+    r"\b(pee|urinat|peeing|urinating|constipat|diarrhea|bloat)\b",
+    r"\b(short\s*of\s*breath|breathless|can'?t\s*breathe|difficulty\s*breath|breathing\s*(problem|issue|trouble|difficult)\w*)\b",
+    r"\b(blurry|blind|deaf|ringing|hearing\s*loss)\b",
+    r"\b(overweight|obese|underweight|gained\s*weight|lost\s*weight)\b",
+    r"\b(diagnosed|surgery|operation|hospital|emergency|er\b|icu\b|urgent\s*care)\b",
+    r"\b(lump|bump|growth|mole|lesion|wound|scar|bruise)\b",
+    r"\b(snor\w*|apnea|sleep\w*)\b",
+    r"\b(seizure|convuls|faint|pass\w*\s*out|black\w*\s*out)\b",
+]
+
+# Medical/clinical keywords
+_HEALTH_KEYWORDS = [
+    r"\b(diabet|blood\s*sugar|a1c|insulin|glucose|sugar\s*level|sugar\s*is)\b",
+    r"\b(blood\s*pressure|hypertens|bp)\b",
+    r"\b(cholesterol|cholest|ldl|hdl|triglycerides?|triglycer|lipids?)\b",
+    r"\b(kidney|ckd|renal)\b",
+    r"\b(heart|cardiac|coronary|angina|arrhythmi|afib|valve)\b",
+    r"\b(neuropath|tingling|numbness|nerve)\b",
+    r"\b(retinopathy|eye\s*damage|vision|glaucoma|cataract)\b",
+    r"\b(pee|urinat|bathroom)\b.*\b(frequent|often|lot|every|always)\b",
+    r"\b(frequent|often|always)\b.*\b(pee|urinat|bathroom)\b",
+    r"\b(thirst|fatigue|tired|exhausted)\b",
+    r"\b(insurance|ppo|hmo|hdhp|deductible|copay|premium|medicare|medicaid|uninsured)\b",
+    r"\b(condition|diagnosis|symptom|doctor|medication|prescription|treatment|therapy|meds)\b",
+    r"\b(health|medical|clinical|hospital|clinic|pharmacy|ambulance)\b",
+    r"\b\d{1,3}\s*(year|yr)s?\s*old\b",
+    r"\b(male|female|man|woman)\b",
+    r"\b(obes|bmi|overweight)\b",
+    r"\b(depress|anxiety|anxious|panic|insomnia|sleep)\b",
+    r"\b(asthma|copd|emphysema|bronchit|wheezing)\b",
+    r"\b(arthrit|arthrosis|osteoarthrit)\b",
+    r"\b(gerd|reflux|heartburn|gastritis)\b",
+    r"\b(liver|hepat|cirrho|fatty\s*liver)\b",
+    r"\b(thyroid|hypothyroid|hyperthyroid)\b",
+    r"\b(gout|uric\s*acid)\b",
+    r"\b(osteoporo|bone\s*loss)\b",
+    r"\b(back\s*pain|lumbar|sciatica)\b",
+    r"\b(anemia|iron\s*deficien)\b",
+    r"\b(migraine|headache)s?\b",
+    r"\b(cancer|tumor|malignant|oncol|leukemia|lymphoma)\b",
+    r"\b(dementia|alzheimer|memory\s*loss)\b",
+    r"\b(parkinson|tremor)\b",
+    r"\b(allerg|hay\s*fever|eczema)\b",
+    r"\b(psoriasis|psoriatic)\b",
+    r"\b(stroke|tia|cerebrovascular)\b",
+    r"\b(prostate|bph)\b",
+    r"\b(incontinence|bladder)\b",
+    r"\b(smok|tobacco|nicotine)\b",
+]
+
+# The four lists compiled once into a single alternation: one search finds a
+# match exactly when any pattern would, so decisions are unchanged. Every
+# pattern opens with \b before a word character, hoisted out of the alternation.
+_HEALTH_PATTERNS = _HEALTH_PHRASING + _BODY_PARTS + _SYMPTOM_WORDS + _HEALTH_KEYWORDS
+assert all(p.startswith(r"\b") for p in _HEALTH_PATTERNS)
+_HEALTH_RE = re.compile(r"\b(?=\w)(?:" + "|".join(f"(?:{p[2:]})" for p in _HEALTH_PATTERNS) + ")")
 
 
 def _is_health_related(text: str) -> bool:
@@ -450,104 +625,7 @@ def _is_health_related(text: str) -> bool:
     People describe health in wildly different ways: "my arteries are clogged",
     "sugar's through the roof", "can't breathe", "knees are shot", etc.
     """
-    # Phrasing patterns: common ways people describe health issues
-    health_phrasing = [
-        r"\bi\s+(have|had|got|suffer|experience|was diagnosed|am diagnosed|'ve been diagnosed|live with|deal with|struggle with|developed|caught)\b",
-        r"\bdiagnosed\s+with\b",
-        r"\bsuffering\s+from\b",
-        r"\bmy\s+(doctor|physician|specialist|cardiologist|surgeon|nurse|therapist|psychiatrist)\b",
-        r"\btaking\s+(medication|medicine|pills|drugs|meds)\b",
-        r"\b(disease|disorder|syndrome|chronic|condition|diagnosis|infection)\b",
-        # "my [body part]" — people describe issues by referencing their body
-        r"\bmy\s+(heart|lung|kidney|liver|stomach|back|knee|hip|joint|bone|arteri|vein|blood|sugar|thyroid|prostate|bladder|brain|eye|ear|skin|chest|head|leg|arm|foot|feet|hand|neck|spine|pancrea|colon|intestin|gallbladder|throat)",
-        # "I feel" / "I'm" + symptom
-        r"\bi\s+(feel|am|'m)\s+(sick|ill|dizzy|nauseous|weak|tired|exhausted|depressed|anxious|bloated|short of breath|light\s*headed)",
-        r"\b(can\s*not|can'?t|cannot|couldn'?t|have\s+trouble|unable\s+to)\s+(breathe|sleep|walk|see|hear|move|swallow|eat|focus|remember)",
-        # "something hurts/aches/is wrong"
-        r"\b(hurts|aching|aches|swollen|swelling|sore|painful|stiff|numb|bleeding|burning|itching|cramping)\b",
-        # "I've been [symptom]ing" — progressive tense symptom descriptions
-        r"\bi'?ve\s+been\s+\w*(throw|cough|wheez|bleed|vomit|sneez|itch|ach|hurt|swell|cramp|faint|puk)\w*",
-        r"\bi\s+keep\s+\w*(throw|cough|wheez|bleed|vomit|sneez|itch|faint|puk)\w*",
-    ]
-
-    # Body parts — if ANY body part is mentioned, this is likely health-related
-    body_parts = [
-        r"\b(heart|lungs?|kidneys?|liver|stomach|intestin|colon|pancrea|spleen|gallbladder)\b",
-        r"\b(arteri|arter\w+|vein|blood\s*vessel|capillar|aorta|vascular)\b",
-        r"\b(brain|spine|spinal|nerv|neural)\b",
-        r"\b(bone|joint|cartilage|tendon|ligament|muscle|skeletal)\b",
-        r"\b(knee|hip|shoulder|ankle|wrist|elbow|finger|toe)\b",
-        r"\b(eye|retina|cornea|ear|eardrum|sinus)\b",
-        r"\b(skin|scalp|nail|rash)\b",
-        r"\b(throat|esophag|trachea|larynx|vocal)\b",
-        r"\b(bladder|urethr|ureter|uterus|ovary|prostate|rectum)\b",
-        r"\b(thyroid|adrenal|pituitary|gland)\b",
-        r"\b(chest|abdomen|pelvis|groin)\b",
-    ]
-
-    # Symptom descriptors — colloquial ways of describing health problems
-    symptom_words = [
-        r"\b(clogged|blocked|narrow|hardened|inflamed|infected|damaged|failing|swollen|enlarged|bleeding|leaking)\b",
-        r"\b(pain|ache|sore|tender|stiff|numb|tingle|tingling|throb|cramp|spasm|burning|itchy|itching)\b",
-        r"\b(dizzy|faint|nausea|vomit|wheez|cough|sneez|fever|chills|sweat)\b",
-        r"\b(throw\w*\s*up|puk\w*|gag\w*|retch\w*|dry\s*heav\w*|sick\s*to\s*my\s*stomach)\b",
-        r"\b(fatigue|tired|exhausted|weak|letharg|drowsy|groggy)\b",
-        r"\b(worried|worrying|anxious|stressed|nervous|restless|panick|overwhelmed|scared)\b",
-        r"\b(depressed|hopeless|sad|empty|miserable|suicidal|worthless)\b",
-        r"\b(pee|urinat|peeing|urinating|constipat|diarrhea|bloat)\b",
-        r"\b(short\s*of\s*breath|breathless|can'?t\s*breathe|difficulty\s*breath|breathing\s*(problem|issue|trouble|difficult)\w*)\b",
-        r"\b(blurry|blind|deaf|ringing|hearing\s*loss)\b",
-        r"\b(overweight|obese|underweight|gained\s*weight|lost\s*weight)\b",
-        r"\b(diagnosed|surgery|operation|hospital|emergency|er\b|icu\b|urgent\s*care)\b",
-        r"\b(lump|bump|growth|mole|lesion|wound|scar|bruise)\b",
-        r"\b(snor\w*|apnea|sleep\w*)\b",
-        r"\b(seizure|convuls|faint|pass\w*\s*out|black\w*\s*out)\b",
-    ]
-
-    # Medical/clinical keywords
-    health_keywords = [
-        r"\b(diabet|blood\s*sugar|a1c|insulin|glucose|sugar\s*level|sugar\s*is)\b",
-        r"\b(blood\s*pressure|hypertens|bp)\b",
-        r"\b(cholesterol|cholest|ldl|hdl|triglycerides?|triglycer|lipids?)\b",
-        r"\b(kidney|ckd|renal)\b",
-        r"\b(heart|cardiac|coronary|angina|arrhythmi|afib|valve)\b",
-        r"\b(neuropath|tingling|numbness|nerve)\b",
-        r"\b(retinopathy|eye\s*damage|vision|glaucoma|cataract)\b",
-        r"\b(pee|urinat|bathroom)\b.*\b(frequent|often|lot|every|always)\b",
-        r"\b(frequent|often|always)\b.*\b(pee|urinat|bathroom)\b",
-        r"\b(thirst|fatigue|tired|exhausted)\b",
-        r"\b(insurance|ppo|hmo|hdhp|deductible|copay|premium|medicare|medicaid|uninsured)\b",
-        r"\b(condition|diagnosis|symptom|doctor|medication|prescription|treatment|therapy|meds)\b",
-        r"\b(health|medical|clinical|hospital|clinic|pharmacy|ambulance)\b",
-        r"\b\d{1,3}\s*(year|yr)s?\s*old\b",
-        r"\b(male|female|man|woman)\b",
-        r"\b(obes|bmi|overweight)\b",
-        r"\b(depress|anxiety|anxious|panic|insomnia|sleep)\b",
-        r"\b(asthma|copd|emphysema|bronchit|wheezing)\b",
-        r"\b(arthrit|arthrosis|osteoarthrit)\b",
-        r"\b(gerd|reflux|heartburn|gastritis)\b",
-        r"\b(liver|hepat|cirrho|fatty\s*liver)\b",
-        r"\b(thyroid|hypothyroid|hyperthyroid)\b",
-        r"\b(gout|uric\s*acid)\b",
-        r"\b(osteoporo|bone\s*loss)\b",
-        r"\b(back\s*pain|lumbar|sciatica)\b",
-        r"\b(anemia|iron\s*deficien)\b",
-        r"\b(migraine|headache)s?\b",
-        r"\b(cancer|tumor|malignant|oncol|leukemia|lymphoma)\b",
-        r"\b(dementia|alzheimer|memory\s*loss)\b",
-        r"\b(parkinson|tremor)\b",
-        r"\b(allerg|hay\s*fever|eczema)\b",
-        r"\b(psoriasis|psoriatic)\b",
-        r"\b(stroke|tia|cerebrovascular)\b",
-        r"\b(prostate|bph)\b",
-        r"\b(incontinence|bladder)\b",
-        r"\b(smok|tobacco|nicotine)\b",
-    ]
-    lower = text.lower()
-    return (any(re.search(p, lower) for p in health_phrasing)
-            or any(re.search(p, lower) for p in body_parts)
-            or any(re.search(p, lower) for p in symptom_words)
-            or any(re.search(p, lower) for p in health_keywords))
+    return _HEALTH_RE.search(text.lower()) is not None
 
 
 async def _llm_is_health_related(text: str) -> bool:
@@ -555,26 +633,241 @@ async def _llm_is_health_related(text: str) -> bool:
     if client is None:
         return False
     try:
-        response = await client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": """Determine if the user's message describes a health symptom, medical condition, disease, physical complaint, or anything related to their body/health.
+        content = await _cached_json_completion("_llm_is_health_related", """Determine if the user's message describes a health symptom, medical condition, disease, physical complaint, or anything related to their body/health.
 Return JSON: {"health_related": true} or {"health_related": false}
 Be reasonable — the message should clearly relate to health, symptoms, or medical conditions.
 Do NOT return true for random words, objects, jokes, gibberish, or things that aren't medical.
 Examples that ARE health-related: "I've been throwing up", "my feet are weird", "I can't stop scratching", "something is wrong with my stomach", "I feel off", "I have a rash", "diagnosed with cancer"
-Examples that are NOT health-related: "hello", "what's the weather", "tell me a joke", "I have a black truck", "can dancer", random words, names of objects/animals, gibberish"""},
-                {"role": "user", "content": text},
-            ],
-            temperature=0,
-            response_format={"type": "json_object"},
-        )
-        result = json.loads(response.choices[0].message.content)
+Examples that are NOT health-related: "hello", "what's the weather", "tell me a joke", "I have a black truck", "can dancer", random words, names of objects/animals, gibberish""", text)
+        result = json.loads(content)
         return result.get("health_related", False)
     except Exception:
         return False
 
 
+# ── Local synonym index ──
+# Fuzzy matches the terms the regexes missed ("clogged arterys", "sugar
+# problems") against the CONDITION_PATTERNS keywords, the condition labels
+# and the ICD-10 descriptions of each condition's codes, so resolve_conditions
+# only needs the LLM for text none of them explain.
+
+_SPACE_TOKENS = (r"[\s-]*", r"[\s-]?", r"\s*", r"\s+", r"\s", ".*", ".+")
+_MAX_PHRASES = 32
+
+# Minimum score for a local match to stand in for the LLM
+LOCAL_MATCH_THRESHOLD = 0.8
+# Matching words spread over a condition's documents counts for a little
+# less than matching them in one document
+_GROUP_MATCH_DISCOUNT = 0.9
+
+# Filler in patient descriptions, ignored on both sides of the match
+_SYNONYM_STOPWORDS = ENGLISH_STOPWORDS | frozenset("""
+about also always am because bit diagnosed doctor does doing feel feeling feels get gets
+getting got just kind lately like little lot old plus pretty quite really recently
+said says some sometimes still think told very which who year years yo
+""".split())
+# Words that say little about which condition is meant
+_GENERIC_WORDS = frozenset("""
+chronic condition disease disorder disorders due elevated high issue issues low other
+problem problems unspecified
+""".split())
+
+# Clauses of a description, each of which should name one condition
+_SEGMENT_RE = re.compile(r"[,.;!?]|\b(?:and|with|plus|also|but)\b")
+
+
+def _split_alternatives(body: str) -> list[str]:
+    parts, depth, start, i = [], 0, 0, 0
+    while i < len(body):
+        ch = body[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            parts.append(body[start:i])
+            start = i + 1
+        i += 1
+    parts.append(body[start:])
+    return parts
+
+
+def _expand_pattern(pattern: str) -> list[str] | None:
+    """
+    Literal phrases a simple keyword regex matches ("\\bclogged\\s*arter" →
+    ["clogged arter"]), expanding groups, optional characters and [ck]
+    classes; None if the pattern uses any other syntax.
+    """
+    variants = [""]
+    i = 0
+    while i < len(pattern):
+        space = next((t for t in _SPACE_TOKENS if pattern.startswith(t, i)), None)
+        ch = pattern[i]
+        if space is not None:
+            variants = [v + " " for v in variants]
+            i += len(space)
+            continue
+        if pattern.startswith(r"\b", i):
+            i += 2
+            continue
+        if pattern.startswith(r"\w*", i) or pattern.startswith(r"\w+", i):
+            i += 3
+            continue
+        if ch in "([":
+            if ch == "[":
+                j = pattern.index("]", i)
+                options = list(pattern[i + 1:j])
+                if not all(o.isalpha() for o in options):
+                    return None
+            else:
+                depth, j = 0, i
+                while True:
+                    if pattern[j] == "\\":
+                        j += 2
+                        continue
+                    depth += (pattern[j] == "(") - (pattern[j] == ")")
+                    if depth == 0:
+                        break
+                    j += 1
+                body = pattern[i + 1:j]
+                options = []
+                for alternative in _split_alternatives(body[2:] if body.startswith("?:") else body):
+                    expanded = _expand_pattern(alternative)
+                    if expanded is None:
+                        return None
+                    options += expanded
+            i = j + 1
+            if pattern[i:i + 1] == "?":
+                options.append("")
+                i += 1
+            variants = [v + o for v in variants for o in options]
+        elif ch.isalnum() or ch in " '":
+            if pattern[i + 1:i + 2] == "?":
+                variants = [v + ch for v in variants] + variants
+                i += 2
+            else:
+                variants = [v + ch for v in variants]
+                i += 1
+        else:
+            return None
+        if len(variants) > _MAX_PHRASES:
+            return None
+    return variants
+
+
+def _build_condition_synonyms() -> dict:
+    """
+    TextIndex over condition keywords, labels and ICD descriptions, with
+    each document's condition id and whether it names the condition (a
+    keyword or label) rather than describing a code of it.
+    """
+    docs, conditions, names = [], [], []
+
+    def add(text: str, condition: str, is_name: bool):
+        docs.append(" ".join(text.split()))
+        conditions.append(condition)
+        names.append(is_name)
+
+    for condition, patterns in CONDITION_PATTERNS.items():
+        for pattern in patterns:
+            for phrase in _expand_pattern(pattern) or []:
+                add(phrase, condition, True)
+    for condition, label in _CONDITION_LABELS.items():
+        add(label.replace("/", " "), condition, True)
+        add(condition.replace("_", " ").replace("-", " "), condition, True)
+    for entry in snapshot.get("icd_mapping")["entries"]:
+        condition = _ICD_TO_CONDITION.get(entry["icd_code"])
+        if condition is not None:
+            add(entry["description"], condition, False)
+
+    keys = list(dict.fromkeys(conditions))
+    key_id = {key: i for i, key in enumerate(keys)}
+    return {
+        "index": TextIndex(docs, stopwords=_SYNONYM_STOPWORDS, generic_words=_GENERIC_WORDS),
+        "keys": keys,
+        "groups": np.array([key_id[c] for c in conditions], dtype=np.int32),
+        "names": np.array(names, dtype=bool),
+    }
+
+
+snapshot.register("condition_synonyms", _build_condition_synonyms, lambda: [])
+
+
+def match_condition(term: str) -> tuple[str | None, float]:
+    """
+    Best local (condition key, score) for a term: its best single document,
+    or all of the condition's documents together at a small discount.
+    (None, 0.0) if nothing matches.
+    """
+    data = snapshot.get("condition_synonyms")
+    index, keys, groups = data["index"], data["keys"], data["groups"]
+    by_condition = np.zeros(len(keys), dtype=np.float64)
+    np.maximum.at(by_condition, groups, index.scores(term))
+    by_condition = np.maximum(by_condition,
+                              _GROUP_MATCH_DISCOUNT * index.group_scores(term, groups, len(keys)))
+    best = int(np.argmax(by_condition))
+    if by_condition[best] <= 0:
+        return None, 0.0
+    return keys[best], float(by_condition[best])
+
+
+def names_condition(term: str, condition: str) -> bool:
+    """
+    Whether `term` literally names `condition` — word for word one of its
+    keywords or labels — rather than merely resembling it or one of its
+    ICD descriptions.
+    """
+    data = snapshot.get("condition_synonyms")
+    condition_id = data["keys"].index(condition)
+    candidates = np.flatnonzero((data["groups"] == condition_id) & data["names"])
+    return any(data["index"].matches_literally(term, int(doc_id)) for doc_id in candidates)
+
+
+def _content_words(segment: str) -> list[str]:
+    return [w for w in tokenize(segment, _SYNONYM_STOPWORDS)
+            if not demographics.DEMOGRAPHIC_TERM_RE.match(w)]
+
+
+def _resolve_locally(text: str, already_detected: list[str]) -> dict | None:
+    """
+    resolve_conditions without the LLM, when every clause of `text` is
+    either already caught by the regexes or matches a condition locally
+    with a score of at least LOCAL_MATCH_THRESHOLD. A clause that names a
+    condition word for word (names_condition) is a disease match, like a
+    regex match; one that only resembles it — a typo, part of a keyword
+    ("headache" for "chronic headache"), an ICD description — is a
+    symptom match with its score as relevance, as the LLM would report
+    it. None when any clause is left unexplained, or when nothing at all
+    was recognised.
+    """
+    disease, symptom_scores = [], {}
+    for segment in _SEGMENT_RE.split(text):
+        words = _content_words(segment)
+        if not words or detect_conditions(segment):
+            continue
+        term = " ".join(words)
+        try:
+            condition, score = match_condition(term)
+        except FileNotFoundError:
+            return None
+        if score < LOCAL_MATCH_THRESHOLD or condition not in CONDITION_TO_ICD:
+            return None
+        if names_condition(term, condition):
+            disease.append(condition)
+        else:
+            symptom_scores[condition] = max(symptom_scores.get(condition, 0.0), round(score, 2))
+
+    if not disease and not symptom_scores and not already_detected:
+        return None
+    disease = [c for c in dict.fromkeys(disease) if c not in already_detected]
+    symptom_scores = {c: s for c, s in symptom_scores.items() if c not in already_detected and c not in disease}
+    return {"disease_matches": disease, "symptom_matches": list(symptom_scores),
+            "symptom_scores": symptom_scores, "unmapped": []}
+
+
 async def resolve_conditions(text: str, already_detected: list[str]) -> dict:
     """
     LLM fallback: map unrecognized symptoms/diseases to the closest
@@ -588,17 +881,20 @@ async def resolve_conditions(text: str, already_detected: list[str]) -> dict:
     - "unmapped": truly doesn't fit any of the 46
 
     Returns {"disease_matches": [...], "symptom_matches": [...], "unmapped": [...]}
+
+    Descriptions the local synonym index fully explains are resolved
+    without the LLM.
     """
+    local = _resolve_locally(text, already_detected)
+    if local is not None:
+        return local
     if client is None:
         return {"disease_matches": [], "symptom_matches": [], "symptom_scores": {}, "unmapped": []}
 
     keys_str = ", ".join(_CONDITION_KEY_LIST)
 
     try:
-        response = await client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": f"""You are a medical condition mapper. The user will describe symptoms or diseases.
+        content = await _cached_json_completion("resolve_conditions", f"""You are a medical condition mapper. The user will describe symptoms or diseases.
 Your job: map each mentioned condition/symptom to the CLOSEST matching key(s) from this list of 46 condition keys:
 
 {keys_str}
@@ -622,15 +918,9 @@ Each symptom_match must include a "relevance" score (0.0 to 1.0):
   0.4-0.7 = moderate match (e.g. "clogged arteries" → heart_failure)
   0.1-0.3 = weak/indirect match (e.g. "clogged arteries" → stroke)
 
-Return JSON: {{"disease_matches": ["key1"], "symptom_matches": [{{"condition": "key2", "relevance": 0.85}}, {{"condition": "key3", "relevance": 0.4}}], "unmapped": ["term1"]}}"""},
-                {"role": "user", "content": text},
-            ],
-            temperature=0,
-            response_format={"type": "json_object"},
-        )
-        raw_content = response.choices[0].message.content
-        print(f"[resolve_conditions] raw LLM response: {raw_content}")
-        result = json.loads(raw_content)
+Return JSON: {{"disease_matches": ["key1"], "symptom_matches": [{{"condition": "key2", "relevance": 0.85}}, {{"condition": "key3", "relevance": 0.4}}], "unmapped": ["term1"]}}""", text)
+        print(f"[resolve_conditions] raw LLM response: {content}")
+        result = json.loads(content)
         disease = [c for c in result.get("disease_matches", [])
                    if c in CONDITION_TO_ICD and c not in already_detected]
 
@@ -698,103 +988,76 @@ Return JSON: {{"disease_matches": ["key1"], "symptom_matches": [{{"condition": "
         return {"disease_matches": [], "symptom_matches": [], "symptom_scores": {}, "unmapped": []}
 
 
+async def _llm_demographics(text: str) -> dict:
+    """LLM extraction of age, sex and insurance type; {} if unavailable."""
+    if client is None:
+        return {}
+    try:
+        content = await _cached_json_completion("parse_patient_input", """Extract ONLY the age, sex, and insurance type from the user's message.
+Return JSON: {"age": int or null, "sex": "M" or "F" or null, "insurance_type": "PPO"|"HMO"|"HDHP"|"unknown"}
+Do NOT extract or infer any medical conditions. Return ONLY valid JSON.""", text)
+        return json.loads(content)
+    except Exception:
+        return {}
+
+
 async def parse_patient_input(text: str) -> dict:
     """
     Parse natural language patient description into a structured profile.
     Conditions are detected deterministically via keyword matching.
     The LLM only extracts age, sex, and insurance type.
+
+    The LLM stages run concurrently: demographics and condition resolution
+    start right after the regex passes, alongside the LLM health gate when
+    the regex gate did not match. An off-topic verdict cancels them.
     """
+    # Regex didn't match — ask the LLM before rejecting, speculatively
+    # running the other stages in the meantime
+    gate = None
     if not _is_health_related(text):
-        # Regex didn't match — ask the LLM before rejecting
-        if not await _llm_is_health_related(text):
-            return {"off_topic": True}
+        gate = asyncio.ensure_future(_llm_is_health_related(text))
 
     # Detect conditions deterministically
     conditions = detect_conditions(text)
 
-    # Use LLM only for demographics (age, sex, insurance)
-    age = None
-    sex = None
-    insurance_type = "unknown"
-    lower = text.lower()
+    # Demographics from rules first; the LLM only for an age they couldn't read
+    local = demographics.extract_demographics(text)
+    age, sex, insurance_type = local["age"], local["sex"], local["insurance_type"]
 
-    # Try to extract age from text directly
-    age_match = re.search(r"\b(\d{1,3})\s*(?:year|yr|y/?o|years?\s*old)\b", lower)
-    if age_match:
-        age = int(age_match.group(1))
-
-    # Keyword-to-approximate-age mapping (only if no numeric age found)
-    if age is None:
-        age_words = {
-            "elderly": 75, "senior": 72, "old": 70,
-            "middle-aged": 50, "middle aged": 50,
-            "young adult": 25, "teenager": 16, "teen": 16,
-            "child": 8, "infant": 1, "baby": 1,
-            "young": 28,
-        }
-        for word, approx_age in age_words.items():
-            if re.search(r"\b" + re.escape(word) + r"\b", lower):
-                age = approx_age
-                break
-
-    # Try to extract sex from text directly
-    if re.search(r"\b(male|man|boy|he|his)\b", lower) and not re.search(r"\bfe?male\b", lower):
-        sex = "M"
-    elif re.search(r"\b(female|woman|girl|she|her)\b", lower):
-        sex = "F"
-
-    # Try to extract insurance from text directly
-    if re.search(r"\bppo\b", lower):
-        insurance_type = "PPO"
-    elif re.search(r"\bhmo\b", lower):
-        insurance_type = "HMO"
-    elif re.search(r"\bhdhp\b", lower):
-        insurance_type = "HDHP"
-    elif re.search(r"\bmedicare\b", lower):
-        insurance_type = "MEDICARE"
-    elif re.search(r"\bmedicaid\b", lower):
-        insurance_type = "MEDICAID"
-    elif re.search(r"\buninsured\b", lower):
-        insurance_type = "NONE"
-    elif re.search(r"\b(poverty|poor|low[\s-]*income|can'?t\s*afford|no\s*(health\s*)?insurance|broke)\b", lower):
-        insurance_type = "MEDICAID"
-
-    # Fall back to LLM only if we couldn't extract age
-    if age is None and client is not None:
-        try:
-            response = await client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": """Extract ONLY the age, sex, and insurance type from the user's message.
-Return JSON: {"age": int or null, "sex": "M" or "F" or null, "insurance_type": "PPO"|"HMO"|"HDHP"|"unknown"}
-Do NOT extract or infer any medical conditions. Return ONLY valid JSON."""},
-                    {"role": "user", "content": text},
-                ],
-                temperature=0,
-                response_format={"type": "json_object"},
-            )
-            demographics = json.loads(response.choices[0].message.content)
-            if age is None and demographics.get("age"):
-                age = demographics["age"]
-            if sex is None and demographics.get("sex"):
-                sex = demographics["sex"]
-            if insurance_type == "unknown" and demographics.get("insurance_type", "unknown") != "unknown":
-                insurance_type = demographics["insurance_type"]
-        except Exception:
-            pass
-
-    # LLM fallback: always try to resolve additional conditions the regex missed.
-    # People describe health in many ways that regex can't fully capture.
-    symptom_conditions = []
-    symptom_scores = {}
-    unmapped_conditions = []
-    if client is not None:
-        resolved = await resolve_conditions(text, conditions)
-        conditions.extend(resolved["disease_matches"])
-        symptom_conditions = resolved["symptom_matches"]
-        symptom_scores = resolved.get("symptom_scores", {})
-        unmapped_conditions = resolved["unmapped"]
-        print(f"[parse_patient_input] text={text!r} conditions={conditions} symptom_conditions={symptom_conditions} scores={symptom_scores} unmapped={unmapped_conditions}")
+    # LLM stages: demographics only if we couldn't extract age; condition
+    # resolution always, since people describe health in many ways that
+    # regex can't fully capture (it tries the local synonym index first)
+    demographics_task = None
+    if demographics.needs_llm(local) and client is not None:
+        demographics_task = asyncio.ensure_future(_llm_demographics(text))
+    resolve_task = asyncio.ensure_future(resolve_conditions(text, list(conditions)))
+    stages = [task for task in (demographics_task, resolve_task) if task is not None]
+
+    try:
+        if gate is not None and not await gate:
+            return {"off_topic": True}
+        await asyncio.gather(*stages)
+    finally:
+        for task in (gate, *stages):
+            if task is not None:
+                task.cancel()
+
+    demographics.record(used_llm=demographics_task is not None)
+    if demographics_task is not None:
+        extracted = demographics_task.result()
+        if age is None and extracted.get("age"):
+            age = extracted["age"]
+        if sex is None and extracted.get("sex"):
+            sex = extracted["sex"]
+        if insurance_type == "unknown" and extracted.get("insurance_type", "unknown") != "unknown":
+            insurance_type = extracted["insurance_type"]
+
+    resolved = resolve_task.result()
+    conditions.extend(resolved["disease_matches"])
+    symptom_conditions = resolved["symptom_matches"]
+    symptom_scores = resolved.get("symptom_scores", {})
+    unmapped_conditions = resolved["unmapped"]
+    print(f"[parse_patient_input] text={text!r} conditions={conditions} symptom_conditions={symptom_conditions} scores={symptom_scores} unmapped={unmapped_conditions}")
 
     return {
         "off_topic": False,
@@ -813,10 +1076,7 @@ async def interpret_scenario(text: str, current_conditions: list[str]) -> dict:
     if client is None:
         return {"error": "GROQ_API_KEY not configured"}
 
-    response = await client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT + f"""
+    content = await _cached_json_completion("interpret_scenario", SYSTEM_PROMPT + f"""
 
 The patient currently has: {', '.join(current_conditions)}
 
@@ -841,29 +1101,21 @@ Do NOT suggest ace_inhibitor unless the patient has hypertension, ckd, or heart_
 Do NOT suggest sglt2_inhibitor unless the patient has diabetes, ckd, or heart_failure.
 lifestyle_change is appropriate for any condition.
 
-Return ONLY valid JSON, no other text."""},
-            {"role": "user", "content": text},
-        ],
-        temperature=0,
-        response_format={"type": "json_object"},
-    )
+Return ONLY valid JSON, no other text.""", text)
 
-    return json.loads(response.choices[0].message.content)
+    return json.loads(content)
 
 
-async def chat_about_health(
+_NOT_CONFIGURED = "Voice agent not configured. Set GROQ_API_KEY."
+
+
+def _chat_messages(
     question: str,
     profile: dict,
     graph_summary: dict,
     conversation: list[dict],
-) -> str:
-    """
-    Conversational catch-all: answer any health/cost question using
-    the patient's profile and graph data as context.
-    """
-    if client is None:
-        return "Voice agent not configured. Set GROQ_API_KEY."
-
+) -> list[dict]:
+    """Messages for chat_about_health: patient context, recent history, the question."""
     # Build context block the LLM can reference
     context_parts = []
     if profile:
@@ -929,32 +1181,120 @@ RULES:
     # Add current question if not already the last message
     if not conversation or conversation[-1].get("text") != question:
         llm_messages.append({"role": "user", "content": question})
+    return llm_messages
+
+
+async def chat_about_health(
+    question: str,
+    profile: dict,
+    graph_summary: dict,
+    conversation: list[dict],
+) -> str:
+    """
+    Conversational catch-all: answer any health/cost question using
+    the patient's profile and graph data as context.
+    """
+    if client is None:
+        return _NOT_CONFIGURED
 
     response = await client.chat.completions.create(
         model="llama-3.3-70b-versatile",
-        messages=llm_messages,
+        messages=_chat_messages(question, profile, graph_summary, conversation),
         temperature=0.3,
     )
 
     return response.choices[0].message.content
 
 
-async def generate_explanation(graph_data: dict, question: str) -> str:
-    """Generate a natural language explanation of simulation results."""
-    if client is None:
-        return "Voice agent not configured. Set GROQ_API_KEY."
+def _simulation_context(graph_data: dict, baseline_data: dict | None,
+                        time_horizon_years: int | None = None) -> str:
+    """
+    A fixed-size summary of the pathway graph (and its change from the
+    baseline, if given) instead of the raw node/edge dump. Without
+    `time_horizon_years` the summary infers it from the graph's totals.
+    """
+    try:
+        graph = CarePathwayGraph.model_validate(graph_data)
+        baseline = CarePathwayGraph.model_validate(baseline_data) if baseline_data else None
+    except ValidationError:
+        # Not a pathway graph — pass it on, cut to the same budget
+        return truncate_to_tokens(json.dumps(graph_data, default=str), DEFAULT_TOKEN_BUDGET)
+    return graph_prompt(graph, baseline, time_horizon_years=time_horizon_years)
 
-    response = await client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT + """
+
+def _explanation_messages(graph_data: dict, question: str, baseline_data: dict | None = None,
+                          time_horizon_years: int | None = None) -> list[dict]:
+    context = _simulation_context(graph_data, baseline_data, time_horizon_years)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT + """
 
 Explain the simulation results to the patient. Use the provided data
 for all numbers. Keep it under 3 sentences for voice output.
 Be warm but clear."""},
-            {"role": "user", "content": f"Question: {question}\n\nSimulation data: {graph_data}"},
-        ],
+        {"role": "user", "content": f"Question: {question}\n\n"
+                                    f"Simulation data:\n{context}"},
+    ]
+
+
+async def generate_explanation(graph_data: dict, question: str, baseline_data: dict | None = None,
+                               time_horizon_years: int | None = None) -> str:
+    """
+    Generate a natural language explanation of simulation results.
+    `baseline_data` is the graph before interventions, if the patient
+    has added any; `time_horizon_years` the horizon it was simulated for.
+    """
+    if client is None:
+        return _NOT_CONFIGURED
+
+    response = await client.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=_explanation_messages(graph_data, question, baseline_data, time_horizon_years),
         temperature=0.3,
     )
 
     return response.choices[0].message.content
+
+
+# ── Streaming variants ──
+# Same prompts, but the reply arrives sentence by sentence so a voice UI
+# can start speaking after the first one instead of after the last.
+
+async def _stream_completion(messages: list[dict]) -> AsyncIterator[str]:
+    """
+    Text fragments of a streamed completion. Closing the generator (or
+    cancelling the task consuming it) closes the upstream HTTP request.
+    """
+    stream = await client.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=messages,
+        temperature=0.3,
+        stream=True,
+    )
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def _stream_sentences(messages: list[dict]) -> AsyncIterator[str]:
+    if client is None:
+        yield _NOT_CONFIGURED
+        return
+    async for sentence in sentence_stream.sentences(_stream_completion(messages)):
+        yield sentence
+
+
+def stream_chat_about_health(
+    question: str,
+    profile: dict,
+    graph_summary: dict,
+    conversation: list[dict],
+) -> AsyncIterator[str]:
+    """chat_about_health, yielding the reply one sentence at a time."""
+    return _stream_sentences(_chat_messages(question, profile, graph_summary, conversation))
+
+
+def stream_explanation(graph_data: dict, question: str, baseline_data: dict | None = None,
+                       time_horizon_years: int | None = None) -> AsyncIterator[str]:
+    """generate_explanation, yielding the reply one sentence at a time."""
+    return _stream_sentences(_explanation_messages(graph_data, question, baseline_data, time_horizon_years))
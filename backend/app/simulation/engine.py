@@ -11,13 +11,15 @@ standalone progression nodes (last resort only).
 """
 
 import json
-import re
 from groq import AsyncGroq
 from app.config import GROQ_API_KEY
 from app.models.patient import PatientProfile
 from app.models.graph import GraphNode, GraphEdge, CarePathwayGraph
 from app.data.meps_loader import query_cost, get_condition_summary, query_drug_cost, query_intervention_cost
 from app.data.comorbidity_loader import get_comorbid_conditions, get_condition_label
+from app.services.demographics import DEMOGRAPHIC_TERM_RE
+from app.services.single_flight import coalesce
+from app.data.benefits_loader import CONDITION_MIX, DRUG_MIX, HIGH_COST_MIX, estimate_service_oop
 
 _groq_client = AsyncGroq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
 
@@ -503,8 +505,25 @@ def _get_effective_prob(
     return prob
 
 
-def _estimate_oop(total_cost: float, profile: PatientProfile) -> float:
-    """Estimate out-of-pocket cost given insurance parameters."""
+def _estimate_oop(total_cost: float, profile: PatientProfile, mix=None) -> float:
+    """
+    Estimate out-of-pocket cost given insurance parameters.
+
+    For a marketplace plan (profile.plan_id) listed in the Benefits & Cost
+    Sharing PUF, the cost is split by service mix — `mix`, or a condition
+    mix weighted toward inpatient care for high-cost nodes — and priced
+    with the plan's per-service copays and coinsurance.
+    """
+    if profile.plan_id:
+        if mix is None:
+            mix = HIGH_COST_MIX if total_cost > 10000 else CONDITION_MIX
+        oop = estimate_service_oop(
+            profile.plan_id, total_cost, mix,
+            profile.deductible, profile.coinsurance, profile.oop_max,
+        )
+        if oop is not None:
+            return oop
+
     if total_cost <= profile.deductible:
         oop = total_cost
     else:
@@ -512,6 +531,37 @@ def _estimate_oop(total_cost: float, profile: PatientProfile) -> float:
     return min(oop, profile.oop_max)
 
 
+_PROGRESSION_PROMPT = """You are a medical progression modeler. Given a condition, generate a small set of likely disease progressions (max 3-4).
+
+For each progression, provide:
+- "name": short condition name
+- "probability": annual probability (0-1, be conservative)
+- "annual_cost": estimated US annual treatment cost in dollars
+
+Rules:
+- If the condition is terminal or has no meaningful progression, return {"progressions": []}
+- Be medically accurate and conservative with probabilities
+- Costs should reflect typical US healthcare costs
+- Return ONLY valid JSON
+
+Return JSON: {"progressions": [{"name": "...", "probability": 0.05, "annual_cost": 3000}, ...]}"""
+
+
+@coalesce()
+async def _progression_completion(user_content: str) -> str:
+    """Groq call behind _generate_llm_progression; identical concurrent calls share one request."""
+    response = await _groq_client.chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": _PROGRESSION_PROMPT},
+            {"role": "user", "content": user_content},
+        ],
+        temperature=0,
+        response_format={"type": "json_object"},
+    )
+    return response.choices[0].message.content
+
+
 async def _generate_llm_progression(
     condition_text: str, profile: PatientProfile
 ) -> tuple[list[GraphNode], list[GraphEdge]]:
@@ -526,29 +576,9 @@ async def _generate_llm_progression(
         return [], []
 
     try:
-        response = await _groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": """You are a medical progression modeler. Given a condition, generate a small set of likely disease progressions (max 3-4).
-
-For each progression, provide:
-- "name": short condition name
-- "probability": annual probability (0-1, be conservative)
-- "annual_cost": estimated US annual treatment cost in dollars
-
-Rules:
-- If the condition is terminal or has no meaningful progression, return {"progressions": []}
-- Be medically accurate and conservative with probabilities
-- Costs should reflect typical US healthcare costs
-- Return ONLY valid JSON
-
-Return JSON: {"progressions": [{"name": "...", "probability": 0.05, "annual_cost": 3000}, ...]}"""},
-                {"role": "user", "content": f"Condition: {condition_text}\nPatient: {profile.age}yo {profile.sex}"},
-            ],
-            temperature=0,
-            response_format={"type": "json_object"},
-        )
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(await _progression_completion(
+            f"Condition: {condition_text}\nPatient: {profile.age}yo {profile.sex}"
+        ))
         progressions = result.get("progressions", [])
 
         nodes = []
@@ -686,7 +716,7 @@ async def simulate_pathway(
             rx_oop = intervention_data["mean_annual_oop"]
         else:
             rx_cost = 600.0
-            rx_oop = _estimate_oop(rx_cost, profile)
+            rx_oop = _estimate_oop(rx_cost, profile, DRUG_MIX)
         nodes.append(GraphNode(
             id=node_id,
             label=intervention.replace("_", " ").title(),
@@ -810,18 +840,10 @@ async def simulate_pathway(
     # Process unmapped conditions (LLM last resort)
     # Skip any that overlap with confirmed conditions (e.g. "asthma" when "asthma_copd" is confirmed)
     # Also filter out demographics that may have leaked through
-    _demographic_re = re.compile(
-        r"^(\d{1,3}\s*(?:yo|y/?o|years?\s*old|yr|yrs)?|"
-        r"age\s*\d{1,3}|"
-        r"male|female|man|woman|boy|girl|m|f|"
-        r"(?:ppo|hmo|hdhp|medicare|medicaid|cobra|tricare)(?:\s*plan)?|"
-        r"insurance|plan|uninsured|insured)$",
-        re.IGNORECASE,
-    )
     for cond_text in unmapped_conditions:
         cond_key = cond_text.lower().replace(" ", "_")
         # Skip demographics / insurance terms
-        if _demographic_re.match(cond_text.strip()):
+        if DEMOGRAPHIC_TERM_RE.match(cond_text.strip()):
             continue
         # Check if this unmapped term overlaps with any confirmed condition
         if any(cond_key in c or c in cond_key for c in _confirmed_set):
@@ -0,0 +1,259 @@
+"""
+Care Pathway Summaries for LLM Prompts
+
+A CarePathwayGraph for a patient with a few conditions runs to dozens of
+nodes and hundreds of edges — over 10k tokens as raw JSON. The explanation
+prompt only needs the numbers the patient might ask about, so this module
+reduces a graph, deterministically, to:
+- the totals over the simulated horizon and current conditions;
+- the top risks by expected cost over the horizon;
+- expected cost per year;
+- what each intervention costs and, given the graph without it, what it
+  changes.
+
+render_summary() writes that as short plain-text lines, dropping the least
+important detail until it fits a token budget, so the prompt stays the same
+size however large the graph grows.
+"""
+
+from collections import defaultdict
+
+from app.models.graph import CarePathwayGraph
+
+_RISK_TYPES = ("future", "high_cost")
+
+# Rough tokens per character for English text and numbers (Llama 3 averages ~4 chars/token)
+_CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 512
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // _CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to about `max_tokens`, for prompt data that isn't a graph."""
+    limit = max_tokens * _CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _years_active(year: int, time_horizon_years: int) -> int:
+    """Years a node's cost is counted for, as in simulate_pathway's totals."""
+    return max(1, time_horizon_years - year + 1)
+
+
+def infer_time_horizon(graph: CarePathwayGraph) -> int:
+    """
+    The time_horizon_years a graph was simulated with, recovered from its
+    totals (total_5yr_cost holds the total over whatever horizon was
+    requested). simulate_pathway creates no node past the horizon, so
+    every node counts for (horizon - year + 1) years and the total is
+    linear in the horizon: total = horizon * A + B.
+    """
+    start = max(1, max((node.year for node in graph.nodes), default=0))
+    a = sum(node.annual_cost * node.probability for node in graph.nodes)
+    b = sum(node.annual_cost * node.probability * (1 - node.year) for node in graph.nodes)
+    if a <= 0:
+        return start
+    return max(start, round((graph.total_5yr_cost - b) / a))
+
+
+def _risks(graph: CarePathwayGraph, time_horizon_years: int) -> dict[str, dict]:
+    """
+    Future conditions by label: a condition reached by several paths or
+    in several years is one risk, with the highest probability, the
+    earliest year, and the summed expected cost.
+    """
+    risks: dict[str, dict] = {}
+    for node in graph.nodes:
+        if node.node_type not in _RISK_TYPES:
+            continue
+        expected = node.annual_cost * node.probability * _years_active(node.year, time_horizon_years)
+        risk = risks.setdefault(node.label, {
+            "label": node.label,
+            "probability": 0.0,
+            "year": node.year,
+            "annual_cost": node.annual_cost,
+            "expected_cost": 0.0,
+            "high_cost": False,
+        })
+        risk["probability"] = max(risk["probability"], node.probability)
+        risk["year"] = min(risk["year"], node.year)
+        risk["expected_cost"] += expected
+        risk["high_cost"] |= node.node_type == "high_cost"
+    return risks
+
+
+def _per_year(graph: CarePathwayGraph, time_horizon_years: int) -> list[dict]:
+    """Expected total and out-of-pocket cost in each year 0..horizon; these sum to the graph totals."""
+    cost = defaultdict(float)
+    oop = defaultdict(float)
+    for node in graph.nodes:
+        for year in range(node.year, node.year + _years_active(node.year, time_horizon_years)):
+            cost[year] += node.annual_cost * node.probability
+            oop[year] += node.oop_estimate * node.probability
+    return [
+        {"year": year, "cost": round(cost[year], 2), "oop": round(oop[year], 2)}
+        for year in sorted(cost)
+    ]
+
+
+def summarize_graph(
+    graph: CarePathwayGraph,
+    baseline: CarePathwayGraph | None = None,
+    top_k: int = 5,
+    time_horizon_years: int | None = None,
+) -> dict:
+    """
+    The figures an explanation needs from a care pathway graph.
+
+    `baseline` is the same patient's graph without the interventions; when
+    given, "deltas" holds the change in totals and the risks whose
+    expected cost moved most. `time_horizon_years` is the horizon the
+    graph was simulated with, inferred from its totals if not given.
+
+    Returns {"time_horizon_years", "totals", "current_conditions",
+    "top_risks", "per_year", "interventions", "deltas"} (deltas is None
+    without a baseline).
+    """
+    if time_horizon_years is None:
+        time_horizon_years = infer_time_horizon(graph)
+    risks = _risks(graph, time_horizon_years)
+    top_risks = sorted(risks.values(), key=lambda r: (-r["expected_cost"], r["label"]))[:top_k]
+
+    targets = defaultdict(list)
+    labels = {node.id: node.label for node in graph.nodes}
+    for edge in graph.edges:
+        if edge.edge_type == "intervention":
+            # One edge per affected progression, so the same target repeats
+            target = labels.get(edge.target, edge.target)
+            if target not in targets[edge.source]:
+                targets[edge.source].append(target)
+
+    summary = {
+        "time_horizon_years": time_horizon_years,
+        "totals": {
+            "cost": graph.total_5yr_cost,
+            "oop": graph.total_5yr_oop,
+            "drug_cost": graph.total_5yr_drug_cost,
+            "drug_oop": graph.total_5yr_drug_oop,
+        },
+        "current_conditions": [
+            {"label": node.label, "annual_cost": node.annual_cost, "oop": node.oop_estimate}
+            for node in graph.nodes if node.node_type == "current"
+        ],
+        "top_risks": [{**r, "expected_cost": round(r["expected_cost"], 2)} for r in top_risks],
+        "per_year": _per_year(graph, time_horizon_years),
+        "interventions": [
+            {"label": node.label, "annual_cost": node.annual_cost, "oop": node.oop_estimate,
+             "treats": targets.get(node.id, [])}
+            for node in graph.nodes if node.node_type == "intervention"
+        ],
+        "deltas": None,
+    }
+
+    if baseline is not None:
+        before = _risks(baseline, time_horizon_years)
+        changes = []
+        for label in before.keys() | risks.keys():
+            old, new = before.get(label), risks.get(label)
+            change = {
+                "label": label,
+                "probability_before": old["probability"] if old else 0.0,
+                "probability_after": new["probability"] if new else 0.0,
+                "expected_cost_change": round((new["expected_cost"] if new else 0.0)
+                                              - (old["expected_cost"] if old else 0.0), 2),
+            }
+            if change["expected_cost_change"]:
+                changes.append(change)
+        changes.sort(key=lambda c: (-abs(c["expected_cost_change"]), c["label"]))
+        summary["deltas"] = {
+            "cost": round(graph.total_5yr_cost - baseline.total_5yr_cost, 2),
+            "oop": round(graph.total_5yr_oop - baseline.total_5yr_oop, 2),
+            "risk_changes": changes[:top_k],
+        }
+    return summary
+
+
+def _money(value: float) -> str:
+    return f"-${-value:,.0f}" if value < 0 else f"${value:,.0f}"
+
+
+def _percent(probability: float) -> str:
+    # Small risks would all round to "1%"
+    return f"{probability:.1%}" if probability < 0.1 else f"{probability:.0%}"
+
+
+def render_summary(summary: dict, max_tokens: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """
+    Plain-text lines for a prompt, within `max_tokens` (estimated).
+
+    Sections are kept in order of importance: totals, intervention
+    effects, current conditions, top risks, then per-year costs. When the
+    text is over budget, list items are dropped from the end of the least
+    important section first.
+    """
+    totals = summary["totals"]
+    header = [
+        f"Projected {summary['time_horizon_years']}-year total cost: {_money(totals['cost'])} "
+        f"(out-of-pocket {_money(totals['oop'])}; drugs {_money(totals['drug_cost'])}, "
+        f"drug out-of-pocket {_money(totals['drug_oop'])})",
+    ]
+    deltas = summary.get("deltas")
+    if deltas:
+        header.append(f"Change vs. no interventions: total {_money(deltas['cost'])}, "
+                      f"out-of-pocket {_money(deltas['oop'])}")
+
+    # (title, lines) from most to least important
+    sections = [
+        ("Interventions", [
+            f"- {i['label']}: {_money(i['annual_cost'])}/yr ({_money(i['oop'])} out-of-pocket)"
+            + (f", treats {', '.join(i['treats'])}" if i["treats"] else "")
+            for i in summary["interventions"]
+        ]),
+        ("Biggest risk changes from interventions", [
+            f"- {c['label']}: {_percent(c['probability_before'])} → {_percent(c['probability_after'])} likelihood, "
+            f"expected cost {_money(c['expected_cost_change'])}"
+            for c in (deltas or {}).get("risk_changes", [])
+        ]),
+        ("Current conditions", [
+            f"- {c['label']}: {_money(c['annual_cost'])}/yr ({_money(c['oop'])} out-of-pocket)"
+            for c in summary["current_conditions"]
+        ]),
+        ("Top risks by expected cost", [
+            f"- {r['label']}: {_percent(r['probability'])} likelihood from year {r['year']}, "
+            f"{_money(r['annual_cost'])}/yr, expected {_money(r['expected_cost'])} in total"
+            + (" (high cost)" if r["high_cost"] else "")
+            for r in summary["top_risks"]
+        ]),
+        ("Expected cost by year", [
+            f"- Year {y['year']}: {_money(y['cost'])} ({_money(y['oop'])} out-of-pocket)"
+            for y in summary["per_year"]
+        ]),
+    ]
+
+    def render() -> str:
+        lines = list(header)
+        for title, items in sections:
+            if items:
+                lines.append(f"{title}:")
+                lines.extend(items)
+        return "\n".join(lines)
+
+    text = render()
+    for _title, items in reversed(sections):
+        while items and estimate_tokens(text) > max_tokens:
+            items.pop()
+            text = render()
+    return text
+
+
+def graph_prompt(
+    graph: CarePathwayGraph,
+    baseline: CarePathwayGraph | None = None,
+    max_tokens: int = DEFAULT_TOKEN_BUDGET,
+    time_horizon_years: int | None = None,
+) -> str:
+    """summarize_graph + render_summary: the graph as a fixed-size prompt block."""
+    summary = summarize_graph(graph, baseline, time_horizon_years=time_horizon_years)
+    return render_summary(summary, max_tokens)
@@ -0,0 +1,65 @@
+"""
+Geographic Index Benchmarks
+
+Builds a GeoIndex from a synthetic 40-state crosswalk and checks that
+every ZIP resolves to its rating area. States alternate between county
+and ZIP3 rating areas, so ZIP3-rated states fall at the end of the
+sorted state list as well as the start; their state codes reach past
+the int16 range once multiplied into a (state, zip3) key. Also times
+GeoIndex.resolve.
+
+Usage:
+    cd backend && python -m benchmarks.geo_index
+"""
+
+import timeit
+
+import pandas as pd
+
+from app.data.geo_index import GeoIndex
+
+_N_STATES = 40
+_ZIPS_PER_STATE = 200
+
+
+def _state_name(i: int) -> str:
+    return chr(ord("A") + i // 26) + chr(ord("A") + i % 26)
+
+
+def build_case() -> tuple[GeoIndex, dict[str, int]]:
+    """The index, and ZIP → expected rating area."""
+    zips, areas, expected = [], [], {}
+    for s in range(_N_STATES):
+        state, zip3_rated = _state_name(s), s % 2 == 1
+        for j in range(_ZIPS_PER_STATE):
+            z = s * 1000 + j
+            county = s * 1000 + j // 10
+            area = j // 100 + 1  # constant within a county and within a ZIP3 prefix
+            zips.append({"ZIP": z, "COUNTY": county, "USPS_ZIP_PREF_STATE": state, "RES_RATIO": 1.0})
+            expected[f"{z:05d}"] = area
+            if zip3_rated and j % 100 == 0:
+                areas.append({"StateCode": state, "County": None, "Zip3": z // 100,
+                              "RatingAreaId": f"Rating Area {area}"})
+            elif not zip3_rated and j % 10 == 0:
+                areas.append({"StateCode": state, "County": county, "Zip3": None,
+                              "RatingAreaId": f"Rating Area {area}"})
+    return GeoIndex(pd.DataFrame(zips), pd.DataFrame(areas)), expected
+
+
+def run() -> int:
+    geo, expected = build_case()
+    wrong = [z for z, area in expected.items() if (geo.resolve(z) or {}).get("rating_area") != area]
+    last_zip3 = _state_name(_N_STATES - 1)
+    print(f"{len(expected):,} ZIPs in {_N_STATES} states: {len(wrong)} resolved to the wrong rating area")
+    for z in wrong[:5]:
+        print(f"  WRONG: {z} → {geo.resolve(z)}, expected rating area {expected[z]}")
+
+    sample = list(expected)[::97]
+    seconds = min(timeit.repeat(lambda: [geo.resolve(z) for z in sample], repeat=5, number=5))
+    print(f"resolve: {seconds / (5 * len(sample)) * 1e6:.1f} µs per ZIP "
+          f"(ZIP3-rated states include {last_zip3}, code {_N_STATES - 1})")
+    return 0 if not wrong else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
@@ -0,0 +1,93 @@
+"""
+Graph Summary Benchmarks
+
+Compares the explanation prompt built from the raw graph dict (as
+generate_explanation used to send it) with the summary from
+app.simulation.summary, over pathways simulated for a few patient
+profiles: prompt size in estimated tokens, and the time to build it.
+
+With --live (and GROQ_API_KEY set), also times the Groq completion for
+both prompts and reports the prompt tokens Groq counted.
+
+Usage:
+    cd backend && python -m benchmarks.graph_summary [--live]
+"""
+
+import asyncio
+import sys
+import time
+import timeit
+
+from app.models.patient import PatientProfile
+from app.services import voice_agent
+from app.simulation.engine import simulate_pathway
+from app.simulation.summary import DEFAULT_TOKEN_BUDGET, estimate_tokens, graph_prompt
+
+# (profile, interventions)
+_CASES = [
+    (PatientProfile(age=34, sex="F", conditions=["migraine"], insurance_type="HMO"), []),
+    (PatientProfile(age=52, sex="M", conditions=["diabetes", "hypertension"], insurance_type="PPO"), ["metformin"]),
+    (PatientProfile(age=62, sex="M", conditions=["diabetes", "hypertension", "ckd", "high_cholesterol"],
+                    insurance_type="PPO"), ["metformin", "statin"]),
+    (PatientProfile(age=71, sex="F", conditions=["heart_failure", "arrhythmia", "asthma_copd", "depression",
+                                                 "osteoporosis", "obesity"], insurance_type="MEDICARE"),
+     ["beta_blocker", "anticoagulant", "lifestyle_change"]),
+]
+_QUESTION = "Why is my projected cost so high, and what would lower it?"
+
+
+def raw_prompt(graph_data: dict) -> str:
+    """The user message generate_explanation built before the summariser."""
+    return f"Question: {_QUESTION}\n\nSimulation data: {graph_data}"
+
+
+def _best_ms(fn, repeat: int = 5, number: int = 20) -> float:
+    return min(timeit.repeat(fn, repeat=repeat, number=number)) / number * 1e3
+
+
+async def _completion(prompt: str) -> tuple[float, int]:
+    """Seconds and prompt tokens for one Groq call with the explanation system prompt."""
+    messages = voice_agent._explanation_messages({}, _QUESTION)
+    messages[1]["content"] = prompt
+    start = time.perf_counter()
+    response = await voice_agent.client.chat.completions.create(
+        model="llama-3.3-70b-versatile", messages=messages, temperature=0.3,
+    )
+    return time.perf_counter() - start, response.usage.prompt_tokens
+
+
+async def run(live: bool) -> int:
+    ok = True
+    for profile, interventions in _CASES:
+        graph = await simulate_pathway(profile, interventions, 5)
+        baseline = await simulate_pathway(profile, [], 5) if interventions else None
+        graph_data = graph.model_dump()
+
+        raw = raw_prompt(graph_data)
+        summary = f"Question: {_QUESTION}\n\nSimulation data:\n{graph_prompt(graph, baseline)}"
+        raw_ms = _best_ms(lambda: raw_prompt(graph.model_dump()))
+        summary_ms = _best_ms(lambda: graph_prompt(graph, baseline))
+        print(f"{len(profile.conditions)} conditions, {len(interventions)} interventions "
+              f"({len(graph.nodes)} nodes, {len(graph.edges)} edges): "
+              f"~{estimate_tokens(raw):,} → ~{estimate_tokens(summary):,} prompt tokens, "
+              f"{raw_ms:.2f} ms → {summary_ms:.2f} ms to build")
+        ok &= estimate_tokens(summary) <= DEFAULT_TOKEN_BUDGET + estimate_tokens(_QUESTION) + 10
+
+        if live:
+            raw_s, raw_tokens = await _completion(raw)
+            summary_s, summary_tokens = await _completion(summary)
+            print(f"  Groq: {raw_tokens:,} → {summary_tokens:,} prompt tokens, "
+                  f"{raw_s:.2f} s → {summary_s:.2f} s")
+    return 0 if ok else 1
+
+
+def main() -> int:
+    live = "--live" in sys.argv[1:]
+    if live and voice_agent.client is None:
+        print("--live needs GROQ_API_KEY")
+        return 1
+    return asyncio.run(run(live))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
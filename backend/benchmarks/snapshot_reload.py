@@ -0,0 +1,64 @@
+"""
+Snapshot Reload Benchmarks
+
+Times snapshot.reload() for the ICD text components and checks that the
+components derived from icd_mapping (icd_search, condition_synonyms) are
+rebuilt from the new snapshot's mapping rather than the one being
+replaced: the ICD mapping is swapped for a copy with E11 renamed, and
+search_icd and match_condition must find the new name after the reload
+and not before it.
+
+Usage:
+    cd backend && python -m benchmarks.snapshot_reload
+"""
+
+import time
+
+from app.data import comorbidity_loader, snapshot
+from app.services import voice_agent
+
+_COMPONENTS = ["icd_mapping", "icd_search", "condition_synonyms"]
+_CODE = "E11"
+_NEW_DESCRIPTION = "Zorblax glycaemic syndrome"
+
+
+def _renamed_mapping() -> dict:
+    entries = [
+        {**e, "description": _NEW_DESCRIPTION} if e["icd_code"] == _CODE else e
+        for e in comorbidity_loader._read_icd_mapping()
+    ]
+    return {"entries": entries}
+
+
+def _sees_new_mapping() -> tuple[bool, bool]:
+    """Whether (search_icd, match_condition) find E11 / diabetes by its new name."""
+    found_code = any(hit["icd_code"] == _CODE for hit in comorbidity_loader.search_icd("zorblax"))
+    condition, _score = voice_agent.match_condition("zorblax glycaemic syndrome")
+    return found_code, condition == "diabetes"
+
+
+def run() -> int:
+    snapshot.latest().warm(_COMPONENTS)
+    before = _sees_new_mapping()
+
+    build, sources = snapshot._components["icd_mapping"]
+    snapshot.register("icd_mapping", _renamed_mapping, sources)
+    try:
+        start = time.perf_counter()
+        result = snapshot.reload(_COMPONENTS)
+        seconds = time.perf_counter() - start
+        after = _sees_new_mapping()
+    finally:
+        snapshot.register("icd_mapping", build, sources)
+
+    print(f"reload of {', '.join(result['loaded'])}: {seconds * 1e3:.0f} ms")
+    print(f"search_icd sees the new mapping: before {before[0]}, after {after[0]}")
+    print(f"match_condition sees the new mapping: before {before[1]}, after {after[1]}")
+    ok = before == (False, False) and after == (True, True)
+    if not ok:
+        print("STALE: derived components were not rebuilt from the reloaded mapping")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(run())
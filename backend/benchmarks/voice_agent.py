@@ -0,0 +1,177 @@
+"""
+Voice Agent Benchmarks
+
+Checks that the compiled regex gates in app.services.voice_agent give the
+same decisions as the straightforward per-pattern loops they replaced, and
+times both over benchmarks/utterances.txt. Also reports how often the
+rule-based stages let parse_patient_input skip an LLM call.
+
+Usage:
+    cd backend && python -m benchmarks.voice_agent
+"""
+
+import re
+import timeit
+from pathlib import Path
+
+from app.services.demographics import extract_demographics, needs_llm
+from app.services.voice_agent import (
+    CONDITION_PATTERNS, _HEALTH_PATTERNS, _is_health_related, _resolve_locally, detect_conditions,
+)
+
+_CORPUS_PATH = Path(__file__).resolve().parent / "utterances.txt"
+
+
+_NO_AGE_MARKER = "# no age:"
+
+
+def load_corpus() -> list[str]:
+    with open(_CORPUS_PATH) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def load_no_age_cases() -> list[str]:
+    """Utterances after the "# no age:" marker, up to the next comment."""
+    cases, in_section = [], False
+    with open(_CORPUS_PATH) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#"):
+                in_section = line.startswith(_NO_AGE_MARKER)
+            elif line and in_section:
+                cases.append(line)
+    return cases
+
+
+def detect_conditions_reference(text: str) -> list[str]:
+    """One re.search per pattern, as detect_conditions used to do."""
+    lower = text.lower()
+    matched = []
+    for condition, patterns in CONDITION_PATTERNS.items():
+        for pattern in patterns:
+            if re.search(pattern, lower):
+                matched.append(condition)
+                break
+    return matched
+
+
+def is_health_related_reference(text: str) -> bool:
+    """One re.search per gate pattern, as _is_health_related used to do."""
+    lower = text.lower()
+    return any(re.search(pattern, lower) for pattern in _HEALTH_PATTERNS)
+
+
+def extract_demographics_reference(text: str) -> dict:
+    """The inline regexes parse_patient_input used before extract_demographics."""
+    age = sex = None
+    insurance_type = "unknown"
+    lower = text.lower()
+    age_match = re.search(r"\b(\d{1,3})\s*(?:year|yr|y/?o|years?\s*old)\b", lower)
+    if age_match:
+        age = int(age_match.group(1))
+    if age is None:
+        age_words = {
+            "elderly": 75, "senior": 72, "old": 70,
+            "middle-aged": 50, "middle aged": 50,
+            "young adult": 25, "teenager": 16, "teen": 16,
+            "child": 8, "infant": 1, "baby": 1,
+            "young": 28,
+        }
+        for word, approx_age in age_words.items():
+            if re.search(r"\b" + re.escape(word) + r"\b", lower):
+                age = approx_age
+                break
+    if re.search(r"\b(male|man|boy|he|his)\b", lower) and not re.search(r"\bfe?male\b", lower):
+        sex = "M"
+    elif re.search(r"\b(female|woman|girl|she|her)\b", lower):
+        sex = "F"
+    for pattern, plan in [(r"\bppo\b", "PPO"), (r"\bhmo\b", "HMO"), (r"\bhdhp\b", "HDHP"),
+                          (r"\bmedicare\b", "MEDICARE"), (r"\bmedicaid\b", "MEDICAID"),
+                          (r"\buninsured\b", "NONE"),
+                          (r"\b(poverty|poor|low[\s-]*income|can'?t\s*afford|no\s*(health\s*)?insurance|broke)\b",
+                           "MEDICAID")]:
+        if re.search(pattern, lower):
+            insurance_type = plan
+            break
+    return {"age": age, "sex": sex, "insurance_type": insurance_type}
+
+
+def compare_demographics(corpus: list[str]) -> bool:
+    """
+    The extractor must agree with the old regexes wherever they found a
+    value; it may resolve more. Reports how many utterances skip the LLM.
+    """
+    disagreements = 0
+    for text in corpus:
+        new, old = extract_demographics(text), extract_demographics_reference(text)
+        for field, value in old.items():
+            if value not in (None, "unknown") and new[field] != value:
+                disagreements += 1
+                print(f"  DISAGREE {text!r}: {field} {new[field]!r} != {value!r}")
+    skipped = sum(not needs_llm(extract_demographics(text)) for text in corpus)
+    skipped_before = sum(extract_demographics_reference(text)["age"] is not None for text in corpus)
+    old_us = _per_call_us(extract_demographics_reference, corpus)
+    new_us = _per_call_us(extract_demographics, corpus)
+    print(f"extract_demographics: {len(corpus)} utterances, {disagreements} disagreements, "
+          f"{old_us:.1f} µs → {new_us:.1f} µs per call; demographics LLM skipped for "
+          f"{skipped / len(corpus):.1%} (previously {skipped_before / len(corpus):.1%})")
+
+    # A wrong age is worse than none: it also stops the LLM from being asked
+    misread = 0
+    for text in load_no_age_cases():
+        found = extract_demographics(text)
+        if found["age"] is not None or found["sex"] is not None:
+            misread += 1
+            print(f"  MISREAD {text!r}: {found}")
+    print(f"extract_demographics: {misread} misread ages in the no-age cases")
+    return not disagreements and not misread and skipped >= skipped_before
+
+
+def report_local_resolution(corpus: list[str]):
+    """How many health utterances resolve_conditions answers without the LLM."""
+    health = [text for text in corpus if _is_health_related(text)]
+    local = [text for text in health if _resolve_locally(text, detect_conditions(text)) is not None]
+    resolved = [_resolve_locally(text, detect_conditions(text)) for text in local]
+    disease = sum(bool(r["disease_matches"]) for r in resolved)
+    symptom = sum(bool(r["symptom_matches"]) for r in resolved)
+    us = _per_call_us(lambda text: _resolve_locally(text, detect_conditions(text)), health)
+    print(f"_resolve_locally: {len(local)}/{len(health)} health utterances ({len(local) / len(health):.1%}) "
+          f"resolved without the LLM; beyond the regexes, {disease} with disease matches and "
+          f"{symptom} with symptom matches; {us:.1f} µs per call")
+
+
+def _per_call_us(fn, corpus: list[str], repeat: int = 5, number: int = 20) -> float:
+    best = min(timeit.repeat(lambda: [fn(text) for text in corpus], repeat=repeat, number=number))
+    return best / (number * len(corpus)) * 1e6
+
+
+def compare(name: str, new, reference, corpus: list[str]) -> bool:
+    mismatches = [text for text in corpus if new(text) != reference(text)]
+    for text in mismatches:
+        print(f"  MISMATCH {text!r}: {new(text)} != {reference(text)}")
+    old_us, new_us = _per_call_us(reference, corpus), _per_call_us(new, corpus)
+    print(f"{name}: {len(corpus)} utterances, {len(mismatches)} mismatches, "
+          f"{old_us:.1f} µs → {new_us:.1f} µs per call ({old_us / new_us:.1f}×)")
+    return not mismatches
+
+
+def main() -> int:
+    corpus = load_corpus()
+    ok = compare("detect_conditions", detect_conditions, detect_conditions_reference, corpus)
+    ok &= compare("_is_health_related", _is_health_related, is_health_related_reference, corpus)
+
+    # Utterances the regex gate rejects go to the LLM; the hit rate must not drop
+    hits = sum(map(_is_health_related, corpus))
+    reference_hits = sum(map(is_health_related_reference, corpus))
+    print(f"_is_health_related: regex hit rate {hits / len(corpus):.1%} "
+          f"(reference {reference_hits / len(corpus):.1%}), "
+          f"{len(corpus) - hits} utterances fall through to the LLM")
+    ok &= hits >= reference_hits
+
+    ok &= compare_demographics(corpus)
+    report_local_resolution(corpus)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,7 +9,7 @@ import LandingPage from "./components/LandingPage";
 import TabBar from "./components/TabBar";
 import ComparePlans from "./components/ComparePlans";
 import ChatHistory from "./components/ChatHistory";
-import { generatePathway, parseProfile, parseScenario, chatAboutHealth } from "./services/api";
+import { generatePathway, parseProfile, parseScenario, streamChatAboutHealth } from "./services/api";
 import { useAuth } from "./contexts/AuthContext";
 import useChatStorage from "./hooks/useChatStorage";
 import "./App.css";
@@ -55,6 +55,8 @@ function App() {
   const [symptomCandidates, setSymptomCandidates] = useState([]);
   const messagesEndRef = useRef(null);
   const skipAutoSave = useRef(false);
+  // Aborts the chat reply being streamed, if any
+  const chatStreamRef = useRef(null);
 
   const { chatList, activeChatId, saveChat, deleteChat, updateChat, setActiveChatId, getChat } =
     useChatStorage(user?.id);
@@ -63,6 +65,9 @@ function App() {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   }, [messages, isProcessing]);
 
+  // Stop a streaming reply when the app unmounts
+  useEffect(() => () => chatStreamRef.current?.abort(), []);
+
   useEffect(() => {
     if (!loading && user && currentView === "landing") {
       setCurrentView("simulate");
@@ -119,6 +124,7 @@ function App() {
   };
 
   const resetChat = useCallback(() => {
+    chatStreamRef.current?.abort();
     setGraph(null);
     setBaselineGraph(null);
     setSelectedNode(null);
@@ -180,6 +186,7 @@ function App() {
   const restoreChat = useCallback((chatId) => {
     const chat = getChat(chatId);
     if (!chat) return;
+    chatStreamRef.current?.abort();
     skipAutoSave.current = true;
     setMessages(chat.messages || []);
     setProfile(chat.profile || null);
@@ -423,13 +430,35 @@ function App() {
               );
             } else {
               // Conversational catch-all — send to LLM with full context
+              // Streamed so the first sentence shows while the rest is generated
               const graphSummary = buildGraphSummary(graph);
-              const response = await chatAboutHealth(text, profile, graphSummary, messages);
-              addMessage("system", response);
+              const controller = new AbortController();
+              chatStreamRef.current = controller;
+              let reply = "";
+              const showReply = (next) => {
+                const started = reply !== "";
+                reply = next;
+                setMessages((prev) => [
+                  ...(started ? prev.slice(0, -1) : prev),
+                  { role: "system", text: next },
+                ]);
+              };
+              try {
+                const full = await streamChatAboutHealth(
+                  text, profile, graphSummary, messages,
+                  (sentence) => showReply(reply ? `${reply} ${sentence}` : sentence),
+                  controller.signal,
+                );
+                if (full) showReply(full);
+              } finally {
+                if (chatStreamRef.current === controller) chatStreamRef.current = null;
+              }
             }
           }
         }
       } catch (err) {
+        // Aborted by a reset, a restored chat or unmount; nothing to report
+        if (err.name === "AbortError") return;
         addMessage("system", `Error: ${err.message}`);
       }
 
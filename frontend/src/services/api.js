@@ -59,10 +59,11 @@ export async function parseScenario(text, currentConditions = []) {
   return data;
 }
 
-export async function getExplanation(graphData, question) {
+export async function getExplanation(graphData, question, baselineGraph = null) {
   const { data } = await api.post("/voice/explain", {
     graph_data: graphData,
     question,
+    baseline_graph: baselineGraph,
   });
   return data.explanation;
 }
@@ -77,6 +78,47 @@ export async function chatAboutHealth(text, profile, graphSummary, messages) {
   return data.response;
 }
 
+// POST to a server-sent-events endpoint and call onSentence(text) for each
+// sentence as it arrives. Resolves with the full reply. Pass an
+// AbortSignal to stop early; the server then cancels the LLM request.
+async function streamSentences(path, body, onSentence, signal) {
+  const response = await fetch(`${api.defaults.baseURL}${path}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+    signal,
+  });
+  if (!response.ok) throw new Error(`${path} failed: ${response.status}`);
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? "{}");
+      if (event === "sentence") onSentence(data.text);
+      else if (event === "done") return data.text;
+      else if (event === "error") throw new Error(data.detail);
+    }
+  }
+  throw new Error(`${path} ended without a reply`);
+}
+
+export function streamChatAboutHealth(text, profile, graphSummary, messages, onSentence, signal) {
+  return streamSentences("/voice/chat/stream", {
+    text,
+    profile,
+    graph_summary: graphSummary,
+    messages,
+  }, onSentence, signal);
+}
+
 export async function getDrugsForCondition(condition, limit = 3) {
   const { data } = await api.get("/drugs/by-condition", {
     params: { condition, limit },